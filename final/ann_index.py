@@ -0,0 +1,395 @@
+"""
+Pluggable nearest-neighbour backends for the recommender.
+
+Every backend is fitted on the feature matrix and answers cosine top-k
+queries with `query(rows, k)`, returning (positions, similarities) arrays of
+shape (n_queries, k), best first. `ExactIndex` scores every row and is the
+ground truth; `LSHIndex` only scores the rows that share a random-hyperplane
+bucket with the query, trading recall for latency.
+"""
+import copy
+
+import numpy as np
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import row_norms
+
+# Rows squared at a time by leading_column.
+LEADING_BLOCK_ROWS = 65536
+# Bytes of dense query rows / (query, candidate) pairs LSHIndex.query
+# handles at a time.
+QUERY_BLOCK_BYTES = 32 * 1024 * 1024
+
+
+def top_k(scores, k):
+    """
+    Column positions and values of the k largest entries in each row.
+    """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def unit_rows(X):
+    """
+    `X` as CSR with L2-normalised rows, without copying it if its rows are
+    already unit length (or empty).
+    """
+    X = X.tocsr()
+    norms = row_norms(X)
+    if np.all((np.abs(norms - 1) < 1e-4) | (norms == 0)):
+        return X
+    return normalize(X, norm='l2', copy=True)
+
+
+def leading_column(X):
+    """
+    Column 0 of unit-row CSR `X` in float64, or None unless that column is
+    set in every row and dominates it (|value| > 0.99).
+
+    Such a column (the raw release year in X_rec) puts every cosine within
+    about 1e-6 of 1, which float32 cannot resolve. Its value is therefore
+    recomputed from the rest of the row as sqrt(1 - |rest|^2), and
+    `cosine_scores` adds its share of each score in float64.
+    """
+    if X.shape[0] == 0 or not X.has_sorted_indices:
+        return None
+    first = X.indptr[:-1]
+    if np.any(np.diff(X.indptr) == 0) or np.any(X.indices[first] != 0):
+        return None
+    lead = X.data[first]
+    if np.min(np.abs(lead)) <= 0.99:
+        return None
+    # Squared in row blocks: X may be memory-mapped, and a float64 copy of
+    # all of its data would not fit in memory.
+    rest = np.empty(X.shape[0])
+    for start in range(0, X.shape[0], LEADING_BLOCK_ROWS):
+        stop = min(start + LEADING_BLOCK_ROWS, X.shape[0])
+        lo, hi = X.indptr[start], X.indptr[stop]
+        squares = np.square(X.data[lo:hi], dtype=np.float64)
+        squares[first[start:stop] - lo] = 0
+        rest[start:stop] = np.add.reduceat(squares, first[start:stop] - lo)
+    return np.copysign(np.sqrt(np.clip(1 - rest, 0, None)), lead)
+
+
+def rest_norms(X):
+    """
+    L2 norm of every row of CSR `X` without its column 0, computed in row
+    blocks like leading_column.
+    """
+    norms = np.empty(X.shape[0])
+    for start in range(0, X.shape[0], LEADING_BLOCK_ROWS):
+        stop = min(start + LEADING_BLOCK_ROWS, X.shape[0])
+        lo, hi = X.indptr[start], X.indptr[stop]
+        squares = np.square(X.data[lo:hi], dtype=np.float64)
+        squares[X.indices[lo:hi] == 0] = 0
+        row_of = np.repeat(np.arange(stop - start), np.diff(X.indptr[start:stop + 1]))
+        norms[start:stop] = np.sqrt(np.bincount(row_of, weights=squares, minlength=stop - start))
+    return norms
+
+
+def cosine_scores(rows, X, head=None):
+    """
+    Dense cosine similarities of `rows` against every row of unit-row `X`.
+
+    `head` is `leading_column(X)`; when given, column 0 is scored in float64
+    and only the other columns go through the (float32) sparse product.
+    """
+    if head is None:
+        return _product(normalize(rows, norm='l2').astype(X.dtype), X)
+    rows = normalize(rows.astype(np.float64), norm='l2')
+    lead = rows[:, 0].toarray().ravel()
+    rest = rows.tocsr(copy=True)
+    rest.data[rest.indices == 0] = 0
+    rest.eliminate_zeros()
+    rest_squares = row_norms(rest, squared=True)
+    lead = np.copysign(np.sqrt(np.clip(1 - rest_squares, 0, None)), lead) * (lead != 0)
+    scores = np.multiply.outer(lead, head)
+    scores += _product(rest.astype(X.dtype), X)
+    return scores
+
+
+def _product(rows, X):
+    # `rows @ X.T` would convert X.T to CSR, a copy of all of X per call;
+    # `X @ rows.T` only converts the query rows and sums in the same order.
+    return (X @ rows.T).T.toarray()
+
+
+class ExactIndex:
+    """
+    Brute-force cosine search over all rows.
+    """
+
+    def fit(self, X):
+        self._X = unit_rows(X)
+        self._head = leading_column(self._X)
+        self._removed = np.empty(0, dtype=np.int64)
+        return self
+
+    def extended(self, X):
+        """
+        Copy of the index fitted on unit-row `X`, whose leading rows are the
+        rows fitted so far; only the new rows are examined.
+        """
+        index = copy.copy(self)
+        start = self._X.shape[0]
+        if self._head is not None:
+            head = leading_column(X[start:])
+            if head is None:
+                return index.fit(X).without(self._removed)
+            index._head = np.concatenate([self._head, head])
+        index._X = X
+        return index
+
+    def without(self, positions):
+        """
+        Copy of the index that never returns the rows at `positions`.
+        """
+        index = copy.copy(self)
+        index._removed = np.union1d(self._removed, positions).astype(np.int64)
+        return index
+
+    def scores(self, rows, positions=None):
+        """
+        Cosine scores of `rows` against every fitted row, or only those at
+        `positions`. Removed rows score -inf.
+        """
+        if positions is None:
+            scores = cosine_scores(rows, self._X, self._head)
+            scores[:, self._removed] = -np.inf
+            return scores
+        head = None if self._head is None else self._head[positions]
+        scores = cosine_scores(rows, self._X[positions], head)
+        if len(self._removed):
+            scores[:, np.isin(positions, self._removed)] = -np.inf
+        return scores
+
+    def query(self, rows, k):
+        return top_k(self.scores(rows), k)
+
+    def pair_scores(self, rows, query_of, positions):
+        """
+        Cosine score of each `rows[query_of[i]]` against fitted row
+        `positions[i]`, the same values `scores` gives (in float64) at the
+        cost of the pairs' non-zeros rather than all of X.
+        """
+        X = self._X
+        rows = normalize(rows.astype(np.float64), norm='l2')
+        if self._head is not None:
+            lead = rows[:, 0].toarray().ravel()
+            rows = rows.tocsr(copy=True)
+            rows.data[rows.indices == 0] = 0
+            rows.eliminate_zeros()
+            lead = np.copysign(np.sqrt(np.clip(1 - row_norms(rows, squared=True), 0, None)), lead) * (lead != 0)
+        dense = rows.toarray().ravel()
+        pairs = X[positions]
+        lengths = np.diff(pairs.indptr)
+        products = pairs.data * dense[np.repeat(query_of, lengths) * X.shape[1] + pairs.indices]
+        scores = np.add.reduceat(np.append(products, 0), np.minimum(pairs.indptr[:-1], len(products)))
+        scores[lengths == 0] = 0
+        if self._head is not None:
+            scores += lead[query_of] * self._head[positions]
+        return scores
+
+
+def default_bits(n_rows):
+    """
+    LSH signature bits for `n_rows` rows, log2(n_rows) - 1: with 16 tables
+    this measured a recall@10 of 0.92 at 8.8k rows and 0.98 at 200k.
+    """
+    return int(np.clip(round(np.log2(max(n_rows, 2))) - 1, 8, 24))
+
+
+class LSHIndex:
+    """
+    Random-hyperplane LSH with multi-probe lookup and exact re-ranking.
+
+    Each of `n_tables` tables hashes a row to an `n_bits` signature (the
+    sides of `n_bits` random hyperplanes it falls on). A query collects the
+    rows sharing its bucket, plus buckets within `probe_radius` flipped bits
+    (0, 1 or 2), in every table and scores only those exactly. More tables
+    or probes raise recall; more bits make buckets smaller and queries faster.
+    `n_bits` defaults to default_bits(n_rows). Queries whose candidates
+    cannot fill k fall back to exact search.
+
+    It only pays off for single queries on large catalogues: at 200k rows a
+    query takes about 11 ms against 29 ms exact, at recall 0.98. At 8.8k
+    rows, or for batches of queries (which ExactIndex answers with one
+    sparse product), exact search is as fast or faster.
+
+    Rows are centred on the mean direction before hashing. The catalogue's
+    vectors all point roughly the same way, and uncentred hyperplanes would
+    put nearly every row in the same bucket.
+    """
+
+    def __init__(self, n_tables=16, n_bits=None, probe_radius=1, seed=0, chunk_rows=65536):
+        if n_bits is not None and not 1 <= n_bits <= 62:
+            raise ValueError("n_bits must be between 1 and 62.")
+        if probe_radius not in (0, 1, 2):
+            raise ValueError("probe_radius must be 0, 1 or 2.")
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.probe_radius = probe_radius
+        self.seed = seed
+        self.chunk_rows = chunk_rows
+
+    def fit(self, X):
+        self._exact = ExactIndex().fit(X)
+        Xn = self._exact._X
+        n_rows, n_features = Xn.shape
+        rng = np.random.default_rng(self.seed)
+        self._bits = self.n_bits or default_bits(n_rows)
+
+        self._planes = rng.standard_normal((n_features, self.n_tables * self._bits))
+        self._offset = np.asarray(Xn.mean(axis=0)).ravel() @ self._planes
+        self._weights = np.left_shift(np.int64(1), np.arange(self._bits, dtype=np.int64))
+
+        keys = np.empty((self.n_tables, n_rows), dtype=np.int64)
+        for start in range(0, n_rows, self.chunk_rows):
+            stop = min(start + self.chunk_rows, n_rows)
+            keys[:, start:stop] = self._signatures(Xn[start:stop]).T
+
+        self._order = np.argsort(keys, axis=1, kind='stable').astype(np.int32)
+        self._sorted_keys = np.take_along_axis(keys, self._order, axis=1)
+        self._probes = self._probe_masks()
+        return self
+
+    def extended(self, X):
+        """
+        Copy of the index with the rows of `X` past the fitted ones hashed
+        into every table. The hyperplanes and centring offset stay as
+        fitted.
+        """
+        index = copy.copy(self)
+        start = self._exact._X.shape[0]
+        index._exact = self._exact.extended(X)
+        keys = self._signatures(index._exact._X[start:])
+        rows = np.arange(start, X.shape[0], dtype=self._order.dtype)
+        order, sorted_keys = [], []
+        for table in range(self.n_tables):
+            by_key = np.argsort(keys[:, table], kind='stable')
+            table_keys = keys[by_key, table]
+            # New rows follow the old ones sharing their key, as in fit().
+            at = np.searchsorted(self._sorted_keys[table], table_keys, side='right')
+            sorted_keys.append(np.insert(self._sorted_keys[table], at, table_keys))
+            order.append(np.insert(self._order[table], at, rows[by_key]))
+        index._order = np.array(order)
+        index._sorted_keys = np.array(sorted_keys)
+        return index
+
+    def without(self, positions):
+        """
+        Copy of the index that never returns the rows at `positions`.
+        """
+        index = copy.copy(self)
+        index._exact = self._exact.without(positions)
+        return index
+
+    def _signatures(self, rows):
+        projected = np.asarray(rows @ self._planes) - self._offset
+        bits = (projected > 0).reshape(rows.shape[0], self.n_tables, self._bits)
+        return bits.astype(np.int64) @ self._weights
+
+    def _probe_masks(self):
+        masks = [0]
+        if self.probe_radius >= 1:
+            masks += [1 << i for i in range(self._bits)]
+        if self.probe_radius >= 2:
+            masks += [(1 << i) | (1 << j) for i in range(self._bits) for j in range(i + 1, self._bits)]
+        return np.array(masks, dtype=np.int64)
+
+    def candidates(self, row):
+        """
+        Row positions that share a probed bucket with `row` in any table.
+        """
+        _, positions = self._candidate_pairs(self._signatures(normalize(row, norm='l2')))
+        return positions
+
+    def _candidate_pairs(self, signatures):
+        """
+        (query, position) pairs, sorted and unique, of the rows sharing a
+        probed bucket with each query's `signatures` row in any table.
+        Duplicates are dropped with a queries x rows bitmap.
+        """
+        n_rows = self._order.shape[1]
+        owner = np.repeat(np.arange(len(signatures), dtype=np.int64) * n_rows, len(self._probes))
+        found = np.zeros(len(signatures) * n_rows, dtype=bool)
+        for table in range(self.n_tables):
+            probe_keys = (signatures[:, table, None] ^ self._probes).ravel()
+            sorted_keys = self._sorted_keys[table]
+            lo = np.searchsorted(sorted_keys, probe_keys, side='left')
+            counts = np.searchsorted(sorted_keys, probe_keys, side='right') - lo
+            slots = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            found[np.repeat(owner, counts) + self._order[table, slots]] = True
+        pairs = np.flatnonzero(found)
+        return pairs // n_rows, pairs % n_rows
+
+    def query(self, rows, k):
+        """
+        Top k by cosine among each row's candidates, in blocks of rows: the
+        candidates of a block are gathered and scored pair by pair with
+        array operations. Rows with fewer than k live candidates are
+        answered by exact search.
+        """
+        rows = rows.tocsr()
+        n_rows = self._order.shape[1]
+        k = min(k, n_rows)
+        positions = np.empty((rows.shape[0], k), dtype=np.int64)
+        similarities = np.empty((rows.shape[0], k))
+        removed = self._exact._removed
+        # Bounded by the dense query rows and the candidate bitmap.
+        step = max(1, QUERY_BLOCK_BYTES // (8 * rows.shape[1] + n_rows))
+        # Each pair costs about 24 bytes per non-zero of its candidate row.
+        X = self._exact._X
+        chunk = max(1, QUERY_BLOCK_BYTES // (24 * max(1, X.nnz // max(1, n_rows))))
+        for start in range(0, rows.shape[0], step):
+            block = rows[start:start + step]
+            query_of, cands = self._candidate_pairs(self._signatures(normalize(block, norm='l2')))
+            if len(removed):
+                live = ~np.isin(cands, removed)
+                query_of, cands = query_of[live], cands[live]
+            scores = np.empty(len(cands))
+            for i in range(0, len(cands), chunk):
+                scores[i:i + chunk] = self._exact.pair_scores(block, query_of[i:i + chunk], cands[i:i + chunk])
+            # Scores are within [-1, 1], so this orders by query, then score.
+            order = np.argsort(query_of * 4.0 - scores, kind='stable')
+            query_of, cands, scores = query_of[order], cands[order], scores[order]
+            first = np.searchsorted(query_of, np.arange(block.shape[0]))
+            rank = np.arange(len(query_of)) - first[query_of]
+            keep = rank < k
+            positions[start + query_of[keep], rank[keep]] = cands[keep]
+            similarities[start + query_of[keep], rank[keep]] = scores[keep]
+            short = np.flatnonzero(np.bincount(query_of, minlength=block.shape[0]) < k)
+            if len(short):
+                top, top_scores = self._exact.query(block[short], k)
+                positions[start + short], similarities[start + short] = top, top_scores
+        return positions, similarities
+
+
+BACKENDS = {
+    'exact': ExactIndex,
+    'lsh': LSHIndex,
+}
+
+
+def make_index(backend='exact', **params):
+    """
+    Instantiate the backend registered under `backend` with its tuning params.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown neighbour backend {backend!r}; choose from {sorted(BACKENDS)}.")
+    return BACKENDS[backend](**params)
+
+
+def recall_at_k(index, reference, rows, k):
+    """
+    Mean fraction of `reference`'s top-k that `index` also returns.
+    """
+    approx, _ = index.query(rows, k)
+    exact, _ = reference.query(rows, k)
+    hits = [len(np.intersect1d(a, e)) for a, e in zip(approx, exact)]
+    return float(np.mean(hits)) / k
@@ -0,0 +1,72 @@
+"""
+Run engine work off the Tk main thread.
+
+Tk widgets may only be touched from the thread running mainloop, so workers
+never call back into Tk. Finished jobs are put on a queue that the main
+thread drains with `after()`, and their callbacks run there.
+"""
+import itertools
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundRunner:
+    """
+    Thread pool whose results are delivered on the Tk main thread.
+
+    Jobs are submitted on a named channel ("filter", "search", ...). A newer
+    job on the same channel supersedes the older one: if the old job has not
+    started it is cancelled, otherwise its result is dropped when it arrives.
+    """
+
+    def __init__(self, widget, max_workers=2, poll_ms=30):
+        self._widget = widget
+        self._poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='engine')
+        self._done = queue.Queue()
+        self._tokens = itertools.count()
+        self._latest = {}
+        self._pending = {}
+        self._closed = False
+        self._widget.after(self._poll_ms, self._poll)
+
+    def submit(self, channel, fn, on_done, on_error=None):
+        """
+        Run `fn()` on a worker; call `on_done(result)` or `on_error(exc)` on
+        the main thread unless a newer job on `channel` arrived meanwhile.
+        """
+        token = next(self._tokens)
+        self._latest[channel] = token
+        previous = self._pending.get(channel)
+        if previous is not None:
+            previous.cancel()
+        future = self._executor.submit(fn)
+        self._pending[channel] = future
+        future.add_done_callback(lambda f: self._done.put((channel, token, f, on_done, on_error)))
+        return future
+
+    def _poll(self):
+        if self._closed:
+            return
+        try:
+            while True:
+                try:
+                    channel, token, future, on_done, on_error = self._done.get_nowait()
+                except queue.Empty:
+                    break
+                if future.cancelled() or self._latest.get(channel) != token:
+                    continue
+                self._pending.pop(channel, None)
+                error = future.exception()
+                if error is None:
+                    on_done(future.result())
+                elif on_error is not None:
+                    on_error(error)
+                else:
+                    self._widget.report_callback_exception(type(error), error, error.__traceback__)
+        finally:
+            self._widget.after(self._poll_ms, self._poll)
+
+    def shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,246 @@
+"""
+Headless performance benchmark for the recommender engine.
+
+For each catalogue size, a fresh process builds the engine from the CSV
+without a snapshot and reports:
+
+- cold start (empty snapshot directory) and warm start (from the snapshot
+  the cold start wrote), with the time of every build stage;
+- p50/p99 latency of filter_movies, find_exact_titles and
+  recommend_similar over random queries, with the result cache disabled;
+- peak RSS of the process.
+
+Sizes other than the bundled catalogue are synthetic catalogues learned
+from it (see synthetic_catalogue.py), generated once into
+`final/.bench_data/`. Results are written as JSON, and `--compare` checks
+them against an earlier run.
+
+Usage:
+    python benchmark.py --sizes 8807,100000 --output bench.json
+    python benchmark.py --sizes 8807,100000 --compare bench.json --threshold 0.25
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from load_test import percentile
+from synthetic_catalogue import write_catalogue
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.bench_data')
+DEFAULT_SIZES = (8807, 100000, 1000000)
+OPERATIONS = ('filter_movies', 'find_exact_titles', 'recommend_similar')
+
+# Differences below these are noise, whatever the relative change.
+MIN_DELTA_S = 0.001
+MIN_DELTA_MB = 16
+
+
+def catalogue_path(rows, source, seed=0):
+    """
+    CSV with `rows` rows: `source` itself at its own size, otherwise a
+    synthetic catalogue learned from it, generated on first use.
+    """
+    with open(source, newline='', encoding='utf-8') as f:
+        source_rows = sum(1 for _ in csv.DictReader(f))
+    if rows == source_rows:
+        return source
+    path = os.path.join(BENCH_DIR, f"catalogue_{rows}_seed{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        write_catalogue(path, rows, seed, source)
+    return path
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1024 * 1024)
+
+
+def latency_summary(latencies):
+    latencies = sorted(latencies)
+    return {
+        'n': len(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def run_size(data_path, queries, seed):
+    """
+    Benchmark one catalogue in this process; returns the result dict.
+    """
+    start = time.perf_counter()
+    from recommender_engine import RecommenderEngine
+    import_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        start = time.perf_counter()
+        engine = RecommenderEngine(data_path, snapshot_dir=snapshot_dir, cache_size=0)
+        engine.build()
+        cold_s = time.perf_counter() - start
+        stages = dict(engine.timings)
+
+        start = time.perf_counter()
+        warm = RecommenderEngine(data_path, snapshot_dir=snapshot_dir, cache_size=0)
+        warm.build()
+        warm_s = time.perf_counter() - start
+        warm_stages = dict(warm.timings)
+        del warm
+
+    rng = random.Random(seed)
+    df = engine.df
+    titles = df['title'].tolist()
+    ratings = sorted(df['rating'].unique())
+    genres = list(engine.filter_index.genre_names)
+    work = {
+        'filter_movies': lambda: engine.filter_movies(rng.sample(genres, 2), rng.choice(ratings),
+                                                      rng.randint(1990, 2015), None),
+        'find_exact_titles': lambda: engine.find_exact_titles(_fragment(rng.choice(titles), rng)),
+        'recommend_similar': lambda: engine.recommend_similar(rng.choice(titles)),
+    }
+    latency = {}
+    for name in OPERATIONS:
+        times = []
+        for _ in range(queries):
+            start = time.perf_counter()
+            work[name]()
+            times.append(time.perf_counter() - start)
+        latency[name] = latency_summary(times)
+
+    return {
+        'rows': len(df),
+        'import_s': import_s,
+        'cold_start_s': cold_s,
+        'warm_start_s': warm_s,
+        'stages_s': stages,
+        'warm_stages_s': warm_stages,
+        'latency': latency,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _fragment(title, rng):
+    start = rng.randrange(max(1, len(title) - 3))
+    return title[start:start + 4]
+
+
+def run_isolated(data_path, queries, seed):
+    """
+    run_size() in a fresh interpreter, so cold start and peak RSS are not
+    flattered by earlier sizes.
+    """
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', data_path,
+           '--queries', str(queries), '--seed', str(seed)]
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def metrics(result):
+    """
+    Flat {name: (value, kind)} of the figures checked for regressions.
+    """
+    flat = {
+        'cold_start_s': (result['cold_start_s'], 's'),
+        'warm_start_s': (result['warm_start_s'], 's'),
+        'peak_rss_mb': (result['peak_rss_mb'], 'mb'),
+    }
+    for stage, seconds in result['stages_s'].items():
+        flat[f"stage.{stage}_s"] = (seconds, 's')
+    for name, summary in result['latency'].items():
+        flat[f"{name}.p50_s"] = (summary['p50_ms'] / 1000, 's')
+        flat[f"{name}.p99_s"] = (summary['p99_ms'] / 1000, 's')
+    return flat
+
+
+def compare(baseline, current, threshold):
+    """
+    (size, metric, old, new) for every metric more than `threshold`
+    (a fraction) worse than in `baseline`.
+    """
+    regressions = []
+    for size, result in current['sizes'].items():
+        if size not in baseline['sizes']:
+            continue
+        old_metrics = metrics(baseline['sizes'][size])
+        for name, (new, kind) in metrics(result).items():
+            if name not in old_metrics:
+                continue
+            old = old_metrics[name][0]
+            floor = MIN_DELTA_MB if kind == 'mb' else MIN_DELTA_S
+            if new - old > max(old * threshold, floor):
+                regressions.append((size, name, old, new))
+    return regressions
+
+
+def print_result(result):
+    print(f"{result['rows']} rows: cold start {result['cold_start_s']:.2f}s, "
+          f"warm start {result['warm_start_s']:.2f}s, peak RSS {result['peak_rss_mb']:.0f} MB")
+    print("  stages: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in result['stages_s'].items()))
+    for name, summary in result['latency'].items():
+        print(f"  {name}: p50 {summary['p50_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms")
+
+
+def main():
+    from recommender_engine import DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Benchmark engine build and query latency at several sizes.")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated catalogue sizes in rows (default %(default)s)")
+    parser.add_argument('--queries', type=int, default=200, help="queries per operation (default 200)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data', default=DATA_PATH, help="catalogue CSV to scale up from")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="JSON file of an earlier run to check for regressions")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="relative slowdown counted as a regression (default 0.2 = 20%%)")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_size(args.worker, args.queries, args.seed)))
+        return
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'queries': args.queries,
+            'seed': args.seed,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'sizes': {},
+    }
+    for size in (int(s) for s in args.sizes.split(',') if s.strip()):
+        result = run_isolated(catalogue_path(size, args.data, args.seed), args.queries, args.seed)
+        report['sizes'][str(size)] = result
+        print_result(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        for size, name, old, new in regressions:
+            print(f"REGRESSION {size} rows {name}: {old:.4g} -> {new:.4g}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
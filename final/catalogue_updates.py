@@ -0,0 +1,173 @@
+"""
+Building blocks for adding and removing titles without refitting.
+
+`RecommenderEngine.add_titles` keeps the fitted vocabulary, IDF weights and
+genre classes frozen, so new rows are encoded exactly like the old ones and
+only the new rows are ever transformed:
+
+- the feature matrix, its row norms and the neighbour graph live in
+  over-allocated buffers (`GrowableArray`, `GrowableCSR`), so appending m
+  rows copies m rows, not the catalogue;
+- every index returns an updated copy from `extended()` / `without()`,
+  leaving the original untouched for queries already running on it, and the
+  engine swaps the copy in under its lock;
+- removed titles become tombstones: their rows stay in place so row
+  positions never move, and every index leaves them out of its results.
+
+Genres, terms and ratings first seen in an update are only picked up by a
+refit (`RecommenderEngine.refit`), which `AutoRefit` can run periodically
+in the background.
+"""
+import sys
+import threading
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from ann_index import top_k
+
+# Capacity added to a buffer when it fills up, as a fraction of its size.
+GROWTH = 0.25
+
+
+class GrowableArray:
+    """
+    Array that grows along its first axis in amortised O(appended) time.
+
+    The first append copies `array` into an over-allocated buffer (it may be
+    a read-only memory map); views handed out earlier stay valid, as appends
+    only write past their end.
+    """
+
+    def __init__(self, array):
+        array = np.asarray(array)
+        self._size = len(array)
+        self._buffer = np.empty((self._size + self._spare(self._size),) + array.shape[1:], dtype=array.dtype)
+        self._buffer[:self._size] = array
+
+    @staticmethod
+    def _spare(size):
+        return int(size * GROWTH) + 16
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def array(self):
+        return self._buffer[:self._size]
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self._buffer.dtype)
+        end = self._size + len(values)
+        if end > len(self._buffer):
+            buffer = np.empty((end + self._spare(end),) + self._buffer.shape[1:], dtype=self._buffer.dtype)
+            buffer[:self._size] = self._buffer[:self._size]
+            self._buffer = buffer
+        self._buffer[self._size:end] = values
+        self._size = end
+        return self.array
+
+
+class GrowableCSR:
+    """
+    CSR matrix that rows can be appended to, built on GrowableArrays.
+    """
+
+    def __init__(self, matrix):
+        self.shape = matrix.shape
+        self.dtype = matrix.dtype
+        self._data = GrowableArray(matrix.data)
+        self._indices = GrowableArray(matrix.indices)
+        self._indptr = GrowableArray(matrix.indptr)
+
+    def append(self, rows):
+        """
+        Append the rows of CSR `rows`; returns the whole matrix.
+        """
+        rows = rows.tocsr()
+        nnz = self._indptr.array[-1]
+        self._data.append(rows.data)
+        self._indices.append(rows.indices)
+        self._indptr.append(rows.indptr[1:] + nnz)
+        self.shape = (self.shape[0] + rows.shape[0], self.shape[1])
+        return self.matrix()
+
+    def matrix(self):
+        # Set the arrays directly: the constructor would check and possibly
+        # recast them, which costs a pass over the whole matrix.
+        matrix = csr_matrix(self.shape, dtype=self.dtype)
+        matrix.data, matrix.indices, matrix.indptr = self._data.array, self._indices.array, self._indptr.array
+        return matrix
+
+
+def genre_matrix(genres_list, classes):
+    """
+    0/1 CSR of each row's genres over the fitted genre `classes`; genres
+    outside them are left out.
+    """
+    column = {genre: i for i, genre in enumerate(classes)}
+    rows = [sorted({column[g] for g in genres if g in column}) for genres in genres_list]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(cols) for cols in rows], out=indptr[1:])
+    indices = np.fromiter((c for cols in rows for c in cols), dtype=np.int64, count=int(indptr[-1]))
+    return csr_matrix((np.ones(len(indices), dtype=np.int64), indices, indptr), shape=(len(rows), len(classes)))
+
+
+def merge_neighbors(indices, similarities, scores, start):
+    """
+    Fold new rows into a top-k neighbour graph.
+
+    `scores` holds the similarities of the new rows `start, start + 1, ...`
+    to every row, new ones included. Old rows that one of them beats are
+    updated in place in `indices` / `similarities` (the graph's first
+    `start` rows); the new rows' own top-k are returned.
+    """
+    n_new, k = scores.shape[0], indices.shape[1]
+    own = scores.copy()
+    own[np.arange(n_new), start + np.arange(n_new)] = -np.inf
+    top, top_scores = top_k(own, k)
+    for j in range(n_new):
+        column = scores[j, :start]
+        hit = np.flatnonzero(column > similarities[:start, -1])
+        if len(hit) == 0:
+            continue
+        candidates = np.column_stack([indices[hit], np.full(len(hit), start + j)])
+        candidate_scores = np.column_stack([similarities[hit], column[hit]])
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')[:, :k]
+        indices[hit] = np.take_along_axis(candidates, order, axis=1)
+        similarities[hit] = np.take_along_axis(candidate_scores, order, axis=1)
+    return top.astype(indices.dtype), top_scores.astype(similarities.dtype)
+
+
+class AutoRefit:
+    """
+    Daemon thread that calls `engine.refit()` every `interval` seconds, as
+    long as at least `min_changes` titles were added or removed since the
+    last fit. Each refit briefly holds the old and new models (see
+    RecommenderEngine.refit).
+    """
+
+    def __init__(self, engine, interval, min_changes=1):
+        self.engine = engine
+        self.interval = interval
+        self.min_changes = min_changes
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='refit', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self.engine.pending_changes < self.min_changes:
+                continue
+            try:
+                self.engine.refit()
+            except Exception as exc:
+                # Keep the thread alive; the next tick tries again.
+                print(f"Background refit failed: {exc}", file=sys.stderr)
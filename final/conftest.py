@@ -0,0 +1,14 @@
+import pandas as pd
+import pytest
+
+from recommender_engine import DATA_PATH
+
+
+@pytest.fixture
+def catalogue_csv(tmp_path):
+    """
+    The first 300 titles of the bundled catalogue, as a CSV of their own.
+    """
+    path = tmp_path / 'catalogue.csv'
+    pd.read_csv(DATA_PATH, nrows=300).to_csv(path, index=False)
+    return str(path)
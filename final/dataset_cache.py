@@ -0,0 +1,127 @@
+"""
+Typed columnar cache of the cleaned catalogue, so starts skip the CSV.
+
+The first start parses the CSV, drops incomplete rows and splits
+`listed_in` as before, then saves every column as .npy arrays next to the
+model snapshots (see model_snapshot.py), keyed by the CSV's hash:
+
+- `release_year` as int16;
+- `rating`, `type`, `country`, `duration` and `date_added` as categorical
+  codes, with the categories in the metadata;
+- the other text columns as one UTF-8 buffer plus character offsets and a
+  missing-value mask, decoded with one `bytes.decode` per column;
+- the genres of every row as codes into the sorted genre names, stored
+  back to back with an offsets array, so neither `genres_list` nor the
+  genre encoding has to split strings again.
+
+Later starts memory-map the arrays and assemble the dataframe from them.
+"""
+import numpy as np
+import pandas as pd
+
+from model_snapshot import load_snapshot, save_snapshot, snapshot_key
+
+# Bump when the stored layout or the cleaning steps change.
+DATASET_VERSION = 1
+
+CATEGORICAL_COLUMNS = ('rating', 'type', 'country', 'duration', 'date_added')
+
+
+def dataset_key(csv_hash):
+    return snapshot_key(csv_hash, {'dataset': DATASET_VERSION})
+
+
+def encode_text(values):
+    """
+    (utf8 bytes, character offsets, missing mask) of a column of strings.
+    """
+    missing = np.array([not isinstance(v, str) for v in values], dtype=bool)
+    strings = [v if isinstance(v, str) else '' for v in values]
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in strings], out=offsets[1:])
+    data = np.frombuffer(''.join(strings).encode('utf-8', 'surrogatepass'), dtype=np.uint8)
+    return data, offsets, missing
+
+
+def decode_text(data, offsets, missing):
+    """
+    Object array of the strings stored by encode_text (NaN where missing).
+    """
+    text = np.asarray(data).tobytes().decode('utf-8', 'surrogatepass')
+    bounds = np.asarray(offsets).tolist()
+    out = np.empty(len(bounds) - 1, dtype=object)
+    out[:] = [text[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+    out[np.asarray(missing)] = np.nan
+    return out
+
+
+def genre_rows(genres_list):
+    """
+    (codes, offsets, names): each row's genres as codes into the sorted
+    genre `names`, in listed order, duplicates dropped.
+    """
+    rows = [list(dict.fromkeys(genres)) for genres in genres_list]
+    names = sorted({g for genres in rows for g in genres})
+    code_of = {g: i for i, g in enumerate(names)}
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(genres) for genres in rows], out=offsets[1:])
+    dtype = np.int16 if len(names) < np.iinfo(np.int16).max else np.int32
+    codes = np.fromiter((code_of[g] for genres in rows for g in genres), dtype=dtype, count=int(offsets[-1]))
+    return codes, offsets, names
+
+
+def save_dataset(root, key, df, source=None):
+    """
+    Save the cleaned dataframe `df` (with `genres_list`) under `key`;
+    `source` is the CSV it came from (see save_snapshot).
+    """
+    arrays = {'row_index': df.index.to_numpy(np.int64)}
+    columns = []
+    categories = {}
+    for name in df.columns:
+        if name == 'genres_list':
+            continue
+        values = df[name]
+        if name == 'release_year':
+            arrays[name] = values.to_numpy(np.int16)
+            kind = 'int16'
+        elif name in CATEGORICAL_COLUMNS:
+            categorical = pd.Categorical(values)
+            arrays[name] = categorical.codes
+            categories[name] = [str(c) for c in categorical.categories]
+            kind = 'category'
+        else:
+            arrays[f"{name}.data"], arrays[f"{name}.offsets"], arrays[f"{name}.missing"] = \
+                encode_text(values.to_numpy())
+            kind = 'text'
+        columns.append([name, kind])
+    arrays['genre_codes'], arrays['genre_offsets'], genre_names = genre_rows(df['genres_list'])
+    meta = {'columns': columns, 'categories': categories, 'genres': genre_names}
+    return save_snapshot(root, key, arrays, meta, source)
+
+
+def load_dataset(root, key):
+    """
+    (df, (genre_codes, genre_offsets, genre_names)) from the cache, or None.
+    """
+    loaded = load_snapshot(root, key)
+    if loaded is None:
+        return None
+    arrays, meta = loaded
+    data = {}
+    for name, kind in meta['columns']:
+        if kind == 'int16':
+            data[name] = np.asarray(arrays[name])
+        elif kind == 'category':
+            data[name] = pd.Categorical.from_codes(arrays[name], meta['categories'][name])
+        else:
+            data[name] = decode_text(arrays[f"{name}.data"], arrays[f"{name}.offsets"], arrays[f"{name}.missing"])
+    df = pd.DataFrame(data, index=pd.Index(np.asarray(arrays['row_index'])))
+
+    codes = np.asarray(arrays['genre_codes'])
+    offsets = np.asarray(arrays['genre_offsets'])
+    names = np.array(meta['genres'], dtype=object)
+    bounds = offsets.tolist()
+    listed = names[codes].tolist()
+    df['genres_list'] = pd.Series([listed[a:b] for a, b in zip(bounds[:-1], bounds[1:])], index=df.index)
+    return df, (codes, offsets, meta['genres'])
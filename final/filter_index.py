@@ -0,0 +1,171 @@
+"""
+Bitset indexes behind filter_movies.
+
+Every filter (one genre, one rating, "released up to year Y") is kept as a
+packed bitset with one bit per catalogue row, so a query is a handful of
+AND/OR/NOT operations over n_rows / 8 bytes instead of a pass over the
+dataframe.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+
+class FilterIndex:
+    """
+    Packed bitsets for genres, ratings and cumulative release years.
+    """
+
+    def __init__(self, genre_ohe, genre_names, ratings, years):
+        self.n_rows = len(years)
+        self.genre_names = list(genre_names)
+        self._genre_pos = {g: i for i, g in enumerate(self.genre_names)}
+        self.genre_bits = _packed_columns(genre_ohe, self.n_rows)
+
+        categorical = pd.Categorical(ratings)
+        self.rating_categories = list(categorical.categories)
+        self.rating_codes = categorical.codes
+        self._rating_pos = {r: i for i, r in enumerate(self.rating_categories)}
+        self.rating_bits = np.packbits(
+            self.rating_codes[None, :] == np.arange(len(self.rating_categories))[:, None], axis=1)
+
+        # year_bits[i] holds every row released in years[i] or earlier, so
+        # any range is one AND NOT of two rows.
+        years = np.asarray(years)
+        self.years, year_codes = np.unique(years, return_inverse=True)
+        counts = np.bincount(year_codes, minlength=len(self.years))
+        order = np.argsort(year_codes, kind='stable')
+        self.year_bits = np.empty((len(self.years), self.genre_bits.shape[1]), dtype=np.uint8)
+        seen = np.zeros(self.n_rows, dtype=bool)
+        for i, end in enumerate(np.cumsum(counts)):
+            seen[order[end - counts[i]:end]] = True
+            self.year_bits[i] = np.packbits(seen)
+
+        self._all = np.packbits(np.ones(self.n_rows, dtype=bool))
+        self._none = np.zeros_like(self._all)
+
+    def extended(self, genre_ohe, ratings, years):
+        """
+        Copy of the index with rows appended: `genre_ohe` over the existing
+        genre names, and their ratings and release years.
+        """
+        index = copy.copy(self)
+        start = self.n_rows
+        index.n_rows = start + len(years)
+        n_bytes = (index.n_rows + 7) // 8
+        ratings = np.asarray(ratings, dtype=object)
+        years = np.asarray(years)
+
+        new_ratings = [r for r in dict.fromkeys(ratings.tolist()) if isinstance(r, str) and r not in self._rating_pos]
+        if new_ratings:
+            index.rating_categories = self.rating_categories + new_ratings
+            index._rating_pos = {r: i for i, r in enumerate(index.rating_categories)}
+        codes = np.array([index._rating_pos.get(r, -1) for r in ratings], dtype=self.rating_codes.dtype)
+        index.rating_codes = np.concatenate([self.rating_codes, codes])
+
+        # A year not seen before gets the cumulative bitset of the year below.
+        index.years = np.union1d(self.years, years)
+        below = np.searchsorted(self.years, index.years, side='right') - 1
+        year_bits = np.zeros((len(index.years), self.year_bits.shape[1]), dtype=np.uint8)
+        year_bits[below >= 0] = self.year_bits[below[below >= 0]]
+
+        genre_new = np.asarray(genre_ohe.todense() if hasattr(genre_ohe, 'todense') else genre_ohe).T != 0
+        rating_new = codes[None, :] == np.arange(len(index.rating_categories))[:, None]
+        rating_bits = np.vstack([self.rating_bits, np.zeros((len(new_ratings), self.rating_bits.shape[1]),
+                                                            dtype=np.uint8)])
+        year_new = index.years[:, None] >= years[None, :]
+
+        index.genre_bits = _append_bits(self.genre_bits, genre_new, start, n_bytes)
+        index.rating_bits = _append_bits(rating_bits, rating_new, start, n_bytes)
+        index.year_bits = _append_bits(year_bits, year_new, start, n_bytes)
+        index._all = _append_bits(self._all[None, :], np.ones((1, len(years)), dtype=bool), start, n_bytes)[0]
+        index._none = np.zeros_like(index._all)
+        return index
+
+    def without(self, positions):
+        """
+        Copy of the index that leaves out the rows at `positions`.
+        """
+        index = copy.copy(self)
+        positions = np.asarray(positions, dtype=np.int64)
+        index._all = self._all.copy()
+        np.bitwise_and.at(index._all, positions // 8, ~(0x80 >> (positions % 8)).astype(np.uint8))
+        return index
+
+    def mask(self, genres=None, rating=None, year_from=None, year_to=None, match='any'):
+        """
+        Packed bitset of the rows passing every given filter.
+
+        `match='any'` keeps rows with at least one of `genres`, `match='all'`
+        only rows that have every one of them.
+        """
+        if match not in ('any', 'all'):
+            raise ValueError("match must be 'any' or 'all'.")
+        bits = self._all.copy()
+
+        if genres:
+            known = [self._genre_pos[g] for g in genres if g in self._genre_pos]
+            if match == 'all' and len(known) < len(set(genres)):
+                return self._none.copy()
+            if not known:
+                return self._none.copy()
+            reduce = np.bitwise_or if match == 'any' else np.bitwise_and
+            bits &= reduce.reduce(self.genre_bits[known], axis=0)
+        if rating:
+            if rating not in self._rating_pos:
+                return self._none.copy()
+            bits &= self.rating_bits[self._rating_pos[rating]]
+        if year_to is not None:
+            i = np.searchsorted(self.years, year_to, side='right') - 1
+            if i < 0:
+                return self._none.copy()
+            bits &= self.year_bits[i]
+        if year_from is not None:
+            i = np.searchsorted(self.years, year_from, side='left') - 1
+            if i >= 0:
+                bits &= ~self.year_bits[i]
+        return bits
+
+    def positions(self, *args, **kwargs):
+        """
+        Row positions passing the filters; same arguments as `mask`.
+        """
+        return self.unpack(self.mask(*args, **kwargs)).nonzero()[0]
+
+    def unpack(self, bits):
+        """
+        Boolean row mask from a packed bitset.
+        """
+        return np.unpackbits(bits, count=self.n_rows).view(bool)
+
+
+def _append_bits(bits, new, start, n_bytes):
+    """
+    Packed bitsets `bits` widened to `n_bytes`, with the boolean columns
+    `new` set from bit `start` on. Only the bytes holding new rows are
+    unpacked.
+    """
+    widened = np.zeros((bits.shape[0], n_bytes), dtype=np.uint8)
+    widened[:, :bits.shape[1]] = bits
+    first = start // 8
+    tail = np.zeros((bits.shape[0], (n_bytes - first) * 8), dtype=bool)
+    tail[:, start - first * 8:start - first * 8 + new.shape[1]] = new
+    widened[:, first:] |= np.packbits(tail, axis=1)
+    return widened
+
+
+def _packed_columns(matrix, n_rows):
+    """
+    One packed bitset per column of a dense or sparse 0/1 matrix.
+    """
+    if not hasattr(matrix, 'tocsc'):
+        return np.packbits(np.asarray(matrix).T != 0, axis=1)
+    csc = matrix.tocsc()
+    packed = np.empty((csc.shape[1], (n_rows + 7) // 8), dtype=np.uint8)
+    column = np.zeros(n_rows, dtype=bool)
+    for j in range(csc.shape[1]):
+        column[:] = False
+        column[csc.indices[csc.indptr[j]:csc.indptr[j + 1]]] = True
+        packed[j] = np.packbits(column)
+    return packed
@@ -0,0 +1,125 @@
+"""
+Load test for recommend_server.py.
+
+Opens `--concurrency` keep-alive connections to a running server and sends
+`--requests` requests in total, then reports latency percentiles and
+throughput. Titles and search terms are drawn from the catalogue CSV.
+
+Usage:
+    python recommend_server.py &
+    python load_test.py --endpoint recommend --concurrency 32 --requests 5000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import random
+import time
+from urllib.parse import urlencode
+
+from recommend_server import DEFAULT_PORT
+
+ENDPOINTS = ('recommend', 'search', 'filter', 'mix')
+
+
+def percentile(sorted_values, q):
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return float('nan')
+    rank = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def load_catalogue(path):
+    titles, genres, ratings = [], set(), set()
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row['title']:
+                titles.append(row['title'])
+            genres.update(g.strip() for g in row['listed_in'].split(',') if g.strip())
+            if row['rating']:
+                ratings.add(row['rating'])
+    return titles, sorted(genres), sorted(ratings)
+
+
+def make_requests(endpoint, n, catalogue, seed):
+    titles, genres, ratings = catalogue
+    rng = random.Random(seed)
+    kinds = ['recommend'] * 8 + ['search', 'filter'] if endpoint == 'mix' else [endpoint]
+    paths = []
+    for _ in range(n):
+        kind = rng.choice(kinds)
+        if kind == 'recommend':
+            query = {'title': rng.choice(titles)}
+        elif kind == 'search':
+            title = rng.choice(titles)
+            start = rng.randrange(max(1, len(title) - 3))
+            query = {'q': title[start:start + 4]}
+        else:
+            query = {'genres': ','.join(rng.sample(genres, 2)), 'rating': rng.choice(ratings),
+                     'year_from': rng.randint(1990, 2015), 'limit': 20}
+        paths.append(f"/{kind}?{urlencode(query)}")
+    return paths
+
+
+async def client(host, port, paths, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            json.loads(await reader.readexactly(length))
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(host, port, paths, concurrency):
+    latencies, errors = [], {}
+    shares = [paths[i::concurrency] for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, share, latencies, errors) for share in shares if share))
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    from recommender_engine import DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Measure latency and throughput of recommend_server.py.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--endpoint', choices=ENDPOINTS, default='recommend',
+                        help="endpoint to hit; 'mix' is 80%% recommend, 10%% search, 10%% filter")
+    parser.add_argument('--concurrency', type=int, default=32, help="open connections (default 32)")
+    parser.add_argument('--requests', type=int, default=2000, help="requests in total (default 2000)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data', default=DATA_PATH, help="catalogue CSV to draw queries from")
+    args = parser.parse_args()
+
+    paths = make_requests(args.endpoint, args.requests, load_catalogue(args.data), args.seed)
+    latencies, errors, elapsed = asyncio.run(run(args.host, args.port, paths, args.concurrency))
+    latencies.sort()
+    print(f"{len(latencies)} requests to /{args.endpoint} over {args.concurrency} connections in {elapsed:.2f}s")
+    print(f"throughput: {len(latencies) / elapsed:.0f} req/s")
+    print(f"latency: p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    if errors:
+        print("non-200 responses: " + ", ".join(f"{status}: {n}" for status, n in sorted(errors.items())))
+
+
+if __name__ == "__main__":
+    main()
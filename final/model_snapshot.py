@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.model_cache')
+
+# Bump whenever the layout of a snapshot or the feature pipeline changes, so
+# older snapshots stop matching instead of being loaded with the wrong meaning.
+FORMAT_VERSION = 1
+
+META_FILE = 'meta.json'
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    SHA-256 of a file, read in chunks so large catalogues are not loaded whole.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_key(csv_hash, config):
+    """
+    Directory name for a snapshot of `csv_hash` built with `config`.
+    """
+    payload = json.dumps({'format': FORMAT_VERSION, 'config': config}, sort_keys=True)
+    config_hash = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return f"{csv_hash[:16]}-{config_hash[:12]}"
+
+
+def save_snapshot(root, key, arrays, meta, source=None):
+    """
+    Write `arrays` (name -> ndarray) as .npy files plus `meta` as JSON.
+
+    The snapshot is written to a private temporary directory and renamed into
+    place, so readers never see a half-written snapshot and concurrent writers
+    of the same key simply race to an identical result. With `source`, the
+    path of the CSV it was built from, snapshots of earlier versions of that
+    CSV are deleted (see prune_snapshots).
+    """
+    target = os.path.join(root, key)
+    if os.path.isdir(target):
+        return target
+    if source is not None:
+        meta = dict(meta, source=os.path.abspath(source))
+    os.makedirs(root, exist_ok=True)
+    tmp = os.path.join(root, f".{key}.{uuid.uuid4().hex}.tmp")
+    os.makedirs(tmp)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(tmp, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(dict(meta, format=FORMAT_VERSION), f)
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            if not os.path.isdir(target):
+                raise
+    finally:
+        if os.path.isdir(tmp):
+            shutil.rmtree(tmp, ignore_errors=True)
+    if source is not None:
+        prune_snapshots(root, key, source)
+    return target
+
+
+def prune_snapshots(root, key, source):
+    """
+    Delete the snapshots in `root` built from `source` whose CSV hash (the
+    first part of the key) differs from `key`'s, or in an older format.
+
+    Processes still mapping a deleted snapshot keep reading their copy; the
+    space is freed once they unmap it.
+    """
+    source = os.path.abspath(source)
+    csv_hash = key.split('-')[0]
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return
+    for name in names:
+        directory = os.path.join(root, name)
+        if name.startswith('.') or name == key:
+            continue
+        try:
+            with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if meta.get('source') != source:
+            continue
+        if name.split('-')[0] != csv_hash or meta.get('format') != FORMAT_VERSION:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def load_snapshot(root, key):
+    """
+    Memory-map the arrays of snapshot `key`.
+
+    Returns (arrays, meta), or None when there is no usable snapshot. Arrays
+    are opened read-only with mmap, so every process loading the same snapshot
+    shares one copy in the OS page cache.
+    """
+    directory = os.path.join(root, key)
+    meta_path = os.path.join(directory, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != FORMAT_VERSION:
+            return None
+        arrays = {}
+        for name in os.listdir(directory):
+            if name.endswith('.npy') and not name.startswith('.'):
+                arrays[name[:-4]] = np.load(os.path.join(directory, name), mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    return arrays, meta
+
+
+def save_array(root, key, name, array):
+    """
+    Add one array to an existing snapshot, replacing any previous version.
+    """
+    directory = os.path.join(root, key)
+    tmp = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp.npy")
+    try:
+        np.save(tmp, np.ascontiguousarray(array))
+        os.replace(tmp, os.path.join(directory, f"{name}.npy"))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_array(root, key, name):
+    """
+    Memory-map one array of snapshot `key`, or None if it was never saved.
+    """
+    path = os.path.join(root, key, f"{name}.npy")
+    try:
+        return np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
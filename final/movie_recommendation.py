@@ -1,82 +1,135 @@
+"""
+Tk desktop app for browsing the catalogue and getting recommendations.
+
+Importing this module imports tkinter, which needs a display. Scripts and
+servers on headless machines should import `recommender_engine` instead;
+the engine functions re-exported here are kept for older callers.
+"""
+import warnings
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-import json
-import os
 
-import pandas as pd
-from sklearn.preprocessing import MultiLabelBinarizer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.neighbors import NearestNeighbors
-from scipy.sparse import hstack, csr_matrix
+import numpy as np
+
+from background import BackgroundRunner
+from virtual_list import VirtualList
+from watchlist_store import WatchlistStore
+from recommender_engine import (
+    DATA_PATH,
+    RecommenderEngine,
+    get_engine,
+    filter_movies,
+    find_exact_titles,
+    recommend_similar,
+)
+
+__all__ = [
+    'DATA_PATH',
+    'RecommenderEngine',
+    'get_engine',
+    'filter_movies',
+    'find_exact_titles',
+    'recommend_similar',
+    'resolve_watchlist',
+    'load_watchlist',
+    'save_watchlist',
+    'list_columns',
+    'catalogue_stats',
+    'MovieRecommenderApp',
+]
+
+_ENGINE_ATTRIBUTES = ('df', 'mlb', 'genre_ohe', 'tfidf', 'desc_tfidf', 'X_rec', 'nn_model')
+
+
+def __getattr__(name):
+    # Keep `movie_recommendation.df` and friends working; they are now built
+    # on first access by the shared engine instead of at import time.
+    if name in _ENGINE_ATTRIBUTES:
+        return getattr(get_engine(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
 
-DATA_PATH = 'netflix_titles.csv'
-
-df = pd.read_csv(DATA_PATH)
-df = df.dropna(subset=['listed_in', 'description', 'rating'])
-df['genres_list'] = df['listed_in'].str.split(', ')
-
-mlb = MultiLabelBinarizer()
-genre_ohe = mlb.fit_transform(df['genres_list'])
-
-tfidf = TfidfVectorizer(max_features=500)
-desc_tfidf = tfidf.fit_transform(df['description'].fillna(''))
-
-year_values = df['release_year'].values.reshape(-1, 1)
-
-X_rec = hstack([csr_matrix(year_values), csr_matrix(genre_ohe), desc_tfidf])
-
-nn_model = NearestNeighbors(n_neighbors=6, metric='cosine')
-nn_model.fit(X_rec)
-
-def filter_movies(genres, rating, year_from, year_to):
+def load_watchlist():
     """
-    Filter by multi-genre list, rating, and year range.
+    Deprecated: the saved watchlist entries; use WatchlistStore.show_ids().
     """
-    mask = pd.Series(True, index=df.index)
-
-    if genres:
-        mask &= df['genres_list'].apply(lambda lst: any(g in lst for g in genres))
-    if rating:
-        mask &= (df['rating'] == rating)
-    if year_from is not None:
-        mask &= (df['release_year'] >= year_from)
-    if year_to is not None:
-        mask &= (df['release_year'] <= year_to)
-
-    return df[mask]
-
+    warnings.warn("load_watchlist() is deprecated; use watchlist_store.WatchlistStore",
+                  DeprecationWarning, stacklevel=2)
+    store = WatchlistStore()
+    try:
+        return store.show_ids()
+    finally:
+        store.close()
 
-def find_exact_titles(partial_title):
-    mask = df['title'].str.contains(partial_title, case=False, na=False)
-    return df[mask]
 
+def save_watchlist(watchlist):
+    """
+    Deprecated: replace the saved watchlist with `watchlist`; use
+    WatchlistStore.add() and remove().
+    """
+    warnings.warn("save_watchlist() is deprecated; use watchlist_store.WatchlistStore",
+                  DeprecationWarning, stacklevel=2)
+    store = WatchlistStore()
+    try:
+        store.replace(watchlist)
+    finally:
+        store.close()
 
-def recommend_similar(title):
-    matches = df.index[df['title'].str.lower() == title.lower()]
-    if len(matches) == 0:
-        return pd.DataFrame()
-    idx = matches[0]
-    distances, indices = nn_model.kneighbors(X_rec[idx], n_neighbors=6)
-    rec_indices = indices.flatten()[1:]
-    return df.iloc[rec_indices][['title', 'listed_in', 'release_year']].reset_index(drop=True)
 
+def resolve_watchlist(engine, entries):
+    """
+    show_ids and row positions for saved watchlist entries, plus the
+    {title: show_id} renames of legacy entries.
 
-def load_watchlist():
-    if not os.path.exists('watchlist.json'):
-        return []
-    with open('watchlist.json', 'r', encoding='utf-8') as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return []
+    Older watchlists stored titles; those are mapped to the show_id of the
+    matching row. Entries no longer in the catalogue are dropped.
+    """
+    show_ids, positions, renames = [], [], {}
+    show_id_column = engine.df['show_id']
+    for entry in entries:
+        pos = engine.show_id_position(entry)
+        if pos is None:
+            pos = engine.title_position(entry)
+        if pos is None:
+            continue
+        show_id = show_id_column.iat[pos]
+        if show_id != entry:
+            renames[entry] = show_id
+        if show_id not in show_ids:
+            show_ids.append(show_id)
+            positions.append(pos)
+    return show_ids, positions, renames
+
+
+LIST_COLUMNS = [('title', "Title", 360), ('release_year', "Year", 60), ('rating', "Rating", 70)]
+TEXT_RESULTS = 50
+
+
+def list_columns(engine, positions):
+    """
+    Column arrays for a VirtualList, plus the row position of every result.
+    """
+    if len(positions) == 0:
+        return {}
+    columns = {key: engine.column(key)[positions] for key, _, _ in LIST_COLUMNS}
+    columns['position'] = positions
+    return columns
 
 
-def save_watchlist(watchlist):
-    with open('watchlist.json', 'w', encoding='utf-8') as f:
-        json.dump(watchlist, f, indent=2)
+def catalogue_stats(engine):
+    """
+    Filter choices and the aggregates drawn on the Stats tab. Runs in the
+    background load job, so the Tk thread only draws them.
+    """
+    df = engine.df
+    ratings = sorted(r for r in df['rating'].unique() if isinstance(r, str) and "min" not in r.lower())
+    return {
+        'genres': sorted(engine.mlb.classes_),
+        'ratings': ratings,
+        'genre_counts': df['genres_list'].explode().value_counts().nlargest(10),
+        'rating_counts': df['rating'].value_counts().nlargest(10),
+        'year_histogram': np.histogram(df['release_year'], bins=20),
+    }
 
 
 
@@ -119,18 +172,73 @@ class MovieRecommenderApp(tk.Tk):
                   background=[('active', '#1565C0')],
                   foreground=[('active', 'white')])
 
+        # Result list styles
+        style.configure('Treeview', background='white', fieldbackground='white', foreground='#37474F',
+                        rowheight=22, font=('Segoe UI', 10))
+        style.configure('Treeview.Heading', font=('Segoe UI', 10, 'bold'))
+        style.map('Treeview', background=[('selected', '#90CAF9')], foreground=[('selected', 'white')])
+
         # Widgets variables
         self.selected_genres = []
         self.selected_rating = tk.StringVar()
         self.year_from = tk.IntVar(value=1900)
         self.year_to = tk.IntVar(value=2025)
         self.title_search_var = tk.StringVar()
+        self.recommend_filtered = tk.BooleanVar(value=False)
+
+        self.status_var = tk.StringVar(value="Loading catalogue...")
 
-        self.watchlist = load_watchlist()
+        self.engine = get_engine()
+        self.watchlist_store = WatchlistStore()
+        # show_ids of the watchlist and, in parallel, their row positions.
+        self.watchlist = []
+        self.watchlist_positions = []
+        self.watchlist_profile = None
 
         self.create_widgets()
 
+        # The model is built on a worker thread so the window shows at once.
+        self.runner = BackgroundRunner(self)
+        self.protocol('WM_DELETE_WINDOW', self.on_close)
+        self.runner.submit('load', self.load_engine, self.on_engine_ready, self.on_engine_error)
+
+    def load_engine(self):
+        # Runs on a worker thread: no Tk calls here.
+        timings = self.engine.build()
+        return timings, catalogue_stats(self.engine)
+
+    def on_engine_ready(self, result):
+        timings, stats = result
+        for g in stats['genres']:
+            self.genre_listbox.insert(tk.END, g)
+
+        all_ratings = stats['ratings']
+        self.rating_combo.config(values=all_ratings)
+        self.rating_combo.set(all_ratings[0])
+
+        stored = self.watchlist_store.show_ids()
+        self.watchlist, self.watchlist_positions, renames = resolve_watchlist(self.engine, stored)
+        if renames:
+            self.watchlist_store.rename(renames)
+        self.watchlist_profile = self.engine.profile(self.watchlist_positions)
+        self.update_watchlist_box()
+
+        self.draw_stats(stats)
+        self.status_var.set(f"Ready: {len(self.engine.df)} titles loaded in {sum(timings.values()):.2f}s")
+
+    def on_engine_error(self, error):
+        self.status_var.set("Failed to load the catalogue.")
+        messagebox.showerror("Load Error", f"Could not build the recommender:\n{error}")
+
+    def on_close(self):
+        self.runner.shutdown()
+        self.watchlist_store.close()
+        self.destroy()
+
     def create_widgets(self):
+        status_bar = ttk.Label(self, textvariable=self.status_var, anchor='w')
+        status_bar.pack(side='bottom', fill='x', padx=10, pady=(0, 5))
+
         notebook = ttk.Notebook(self)
         notebook.pack(fill='both', expand=True, padx=10, pady=10)
 
@@ -157,11 +265,11 @@ class MovieRecommenderApp(tk.Tk):
     def build_filter_tab(self, parent):
         for col in range(4):
             parent.columnconfigure(col, weight=[1, 2, 1, 2][col])
-        parent.rowconfigure(5, weight=1)  # make listbox expand
+        parent.rowconfigure(5, weight=1)  # make result list expand
 
         # Genres Label + Listbox (multi-select)
         ttk.Label(parent, text="Genres:").grid(row=0, column=0, sticky='e', padx=5, pady=5)
-        genre_listbox = tk.Listbox(parent,
+        self.genre_listbox = genre_listbox = tk.Listbox(parent,
                                    selectmode='extended',
                                    bg='white',
                                    fg='#37474F',
@@ -171,8 +279,6 @@ class MovieRecommenderApp(tk.Tk):
                                    font=('Segoe UI', 10),
                                    bd=1,
                                    relief='solid')
-        for g in sorted(mlb.classes_):
-            genre_listbox.insert(tk.END, g)
         genre_listbox.grid(row=0, column=1, rowspan=2, sticky='nsew', padx=5, pady=5)
 
         def on_genre_select(evt):
@@ -183,14 +289,11 @@ class MovieRecommenderApp(tk.Tk):
 
         # Rating Label + Combobox
         ttk.Label(parent, text="Rating:").grid(row=0, column=2, sticky='e', padx=5, pady=5)
-        all_ratings = sorted([r for r in df['rating'].unique() if isinstance(r, str) and "min" not in r.lower()])
-        rating_combo = ttk.Combobox(parent,
-                                    textvariable=self.selected_rating,
-                                    values=all_ratings,
-                                    state='readonly',
-                                    font=('Segoe UI', 10))
-        rating_combo.grid(row=0, column=3, sticky='ew', padx=5, pady=5)
-        rating_combo.set(all_ratings[0])
+        self.rating_combo = ttk.Combobox(parent,
+                                         textvariable=self.selected_rating,
+                                         state='readonly',
+                                         font=('Segoe UI', 10))
+        self.rating_combo.grid(row=0, column=3, sticky='ew', padx=5, pady=5)
 
         # Year From / To Spinboxes
         ttk.Label(parent, text="Year From:").grid(row=1, column=2, sticky='e', padx=5, pady=5)
@@ -224,18 +327,10 @@ class MovieRecommenderApp(tk.Tk):
                                 command=self.on_filter_search)
         search_btn.grid(row=3, column=0, columnspan=4, pady=10, sticky='ew')
 
-        # Filtered Listbox
-        self.filtered_listbox = tk.Listbox(parent,
-                                           bg='white',
-                                           fg='#37474F',
-                                           highlightbackground='#B0BEC5',
-                                           selectbackground='#90CAF9',
-                                           selectforeground='white',
-                                           font=('Segoe UI', 10),
-                                           bd=1,
-                                           relief='solid')
-        self.filtered_listbox.grid(row=5, column=0, columnspan=3, rowspan=2,
-                                   sticky='nsew', padx=5, pady=5)
+        # Filtered results (only the visible rows are rendered)
+        self.filtered_list = VirtualList(parent, LIST_COLUMNS, on_select=self.show_filtered_details)
+        self.filtered_list.grid(row=5, column=0, columnspan=3, rowspan=2,
+                                sticky='nsew', padx=5, pady=5)
 
         # Details Panel for Filtered Tab
         details_frame = ttk.LabelFrame(parent, text="Details")
@@ -253,34 +348,34 @@ class MovieRecommenderApp(tk.Tk):
                                                       relief='solid')
         self.details_text.grid(row=0, column=0, sticky='nsew')
 
-        self.filtered_listbox.bind('<<ListboxSelect>>', self.show_filtered_details)
-
     def on_filter_search(self):
         genres = self.selected_genres
         rating = self.selected_rating.get()
         y_from = self.year_from.get()
         y_to = self.year_to.get()
 
-        filtered = filter_movies(genres, rating, y_from, y_to)
-        self.filtered_listbox.delete(0, tk.END)
+        def search():
+            return list_columns(self.engine, self.engine.filter_positions(genres, rating, y_from, y_to))
+
+        self.status_var.set("Searching...")
+        self.runner.submit('filter', search, self.show_filter_results, self.on_query_error)
+
+    def show_filter_results(self, columns):
+        self.filtered_list.set_data(columns)
         self.details_text.config(state='normal')
         self.details_text.delete('1.0', tk.END)
         self.details_text.config(state='disabled')
+        self.status_var.set(f"{len(self.filtered_list)} titles found")
 
-        if filtered.empty:
+        if not columns:
             messagebox.showinfo("No Results", "No movies match the selected filters.")
-            return
 
-        for idx, row in filtered.iterrows():
-            self.filtered_listbox.insert(tk.END, f"{row['title']} ({row['release_year']})")
+    def on_query_error(self, error):
+        self.status_var.set("Query failed.")
+        messagebox.showerror("Error", str(error))
 
-    def show_filtered_details(self, event):
-        sel = self.filtered_listbox.curselection()
-        if not sel:
-            return
-        title_with_year = self.filtered_listbox.get(sel[0])
-        title = title_with_year.rsplit(" (", 1)[0]
-        movie_row = df[df['title'] == title].iloc[0]
+    def show_filtered_details(self, index):
+        movie_row = self.engine.df.iloc[self.filtered_list.row(index)['position']]
 
         details = (
             f"Title: {movie_row['title']}\n"
@@ -318,35 +413,31 @@ class MovieRecommenderApp(tk.Tk):
                               command=self.on_find_titles)
         find_btn.grid(row=0, column=2, sticky='w', padx=5, pady=5)
 
-        self.match_listbox = tk.Listbox(parent,
-                                        bg='white',
-                                        fg='#37474F',
-                                        highlightbackground='#B0BEC5',
-                                        selectbackground='#90CAF9',
-                                        selectforeground='white',
-                                        font=('Segoe UI', 10),
-                                        bd=1,
-                                        relief='solid')
-        self.match_listbox.grid(row=1, column=0, columnspan=3, sticky='nsew', padx=5, pady=5)
-        self.match_listbox.bind('<<ListboxSelect>>', self.show_match_details)
+        text_btn = ttk.Button(parent,
+                              text="Search Plot & Cast",
+                              command=self.on_find_text)
+        text_btn.grid(row=0, column=3, sticky='w', padx=5, pady=5)
+
+        self.match_list = VirtualList(parent, LIST_COLUMNS, on_select=self.show_match_details)
+        self.match_list.grid(row=1, column=0, columnspan=3, sticky='nsew', padx=5, pady=5)
 
         rec_btn = ttk.Button(parent,
                              text="Recommend Similar",
                              style='Accent.TButton',
                              command=self.on_recommend)
-        rec_btn.grid(row=2, column=0, columnspan=3, pady=10, sticky='ew')
-
-        self.recommend_listbox = tk.Listbox(parent,
-                                            bg='white',
-                                            fg='#37474F',
-                                            highlightbackground='#B0BEC5',
-                                            selectbackground='#90CAF9',
-                                            selectforeground='white',
-                                            font=('Segoe UI', 10),
-                                            bd=1,
-                                            relief='solid')
-        self.recommend_listbox.grid(row=3, column=0, columnspan=3, sticky='nsew', padx=5, pady=5)
-        self.recommend_listbox.bind('<<ListboxSelect>>', self.show_recommend_details)
+        rec_btn.grid(row=2, column=0, columnspan=2, pady=10, sticky='ew')
+
+        ttk.Checkbutton(parent,
+                        text="Only titles matching the filters",
+                        variable=self.recommend_filtered).grid(row=2, column=2, sticky='w', padx=5)
+
+        describe_btn = ttk.Button(parent,
+                                  text="Recommend from Description",
+                                  command=self.on_recommend_text)
+        describe_btn.grid(row=2, column=3, sticky='w', padx=5)
+
+        self.recommend_list = VirtualList(parent, LIST_COLUMNS, on_select=self.show_recommend_details)
+        self.recommend_list.grid(row=3, column=0, columnspan=3, sticky='nsew', padx=5, pady=5)
 
         # Details panel for Title tab
         details_frame2 = ttk.LabelFrame(parent, text="Details")
@@ -370,26 +461,56 @@ class MovieRecommenderApp(tk.Tk):
             messagebox.showwarning("Input Required", "Please enter part of a title.")
             return
 
-        matches = find_exact_titles(partial)
-        self.match_listbox.delete(0, tk.END)
-        self.recommend_listbox.delete(0, tk.END)
+        def search():
+            positions = self.engine.search_positions(partial)
+            fuzzy = len(positions) == 0
+            if fuzzy:
+                positions = self.engine.fuzzy_positions(partial)
+            return list_columns(self.engine, positions), fuzzy
+
+        self.status_var.set("Searching...")
+        self.runner.submit('search', search, lambda result: self.show_match_results(partial, *result),
+                           self.on_query_error)
+
+    def on_find_text(self):
+        query = self.title_search_var.get().strip()
+        if not query:
+            messagebox.showwarning("Input Required", "Please enter words from a plot, cast or director.")
+            return
+
+        def search():
+            return list_columns(self.engine, self.engine.text_search_positions(query, TEXT_RESULTS))
+
+        self.status_var.set("Searching...")
+        self.runner.submit('search', search, lambda columns: self.show_text_results(query, columns),
+                           self.on_query_error)
+
+    def show_text_results(self, query, columns):
+        self.set_matches(columns)
+        self.status_var.set(f"{len(self.match_list)} best matches in plot, cast and director")
+
+        if not self.match_list:
+            messagebox.showinfo("No Matches", f"No plot, cast or director mentions '{query}'.")
+
+    def set_matches(self, columns):
+        self.match_list.set_data(columns)
+        self.recommend_list.clear()
         self.details_text2.config(state='normal')
         self.details_text2.delete('1.0', tk.END)
         self.details_text2.config(state='disabled')
 
-        if matches.empty:
-            messagebox.showinfo("No Matches", f"No titles containing '{partial}'.")
-            return
+    def show_match_results(self, partial, columns, fuzzy=False):
+        self.set_matches(columns)
+        if fuzzy and self.match_list:
+            self.status_var.set(f"No titles contain '{partial}'; showing the closest spellings")
+        else:
+            self.status_var.set(f"{len(self.match_list)} titles found")
 
-        for _, row in matches.iterrows():
-            self.match_listbox.insert(tk.END, row['title'])
+        if not self.match_list:
+            messagebox.showinfo("No Matches", f"No titles containing '{partial}'.")
 
-    def show_match_details(self, event):
-        sel = self.match_listbox.curselection()
-        if not sel:
-            return
-        title = self.match_listbox.get(sel[0])
-        movie_row = df[df['title'] == title].iloc[0]
+    def show_match_details(self, index):
+        movie_row = self.engine.df.iloc[self.match_list.row(index)['position']]
 
         details = (
             f"Title: {movie_row['title']}\n"
@@ -408,33 +529,48 @@ class MovieRecommenderApp(tk.Tk):
         self.details_text2.config(state='disabled')
 
     def on_recommend(self):
-        sel = self.match_listbox.curselection()
-        if not sel:
+        sel = self.match_list.selection()
+        if sel is None:
             messagebox.showwarning("No Title Selected", "Please select a title first.")
             return
 
-        selected_title = self.match_listbox.get(sel[0])
-        recs = recommend_similar(selected_title)
+        selected_pos = self.match_list.row(sel)['position']
+        filters = {}
+        if self.recommend_filtered.get():
+            # Same constraints as the Browse by Filters tab.
+            filters = dict(genres=self.selected_genres, rating=self.selected_rating.get(),
+                           year_from=self.year_from.get(), year_to=self.year_to.get())
 
-        self.recommend_listbox.delete(0, tk.END)
+        def recommend():
+            return list_columns(self.engine, self.engine.similar_positions(selected_pos, **filters))
+
+        self.status_var.set("Finding similar titles...")
+        self.runner.submit('recommend', recommend, self.show_recommend_results, self.on_query_error)
+
+    def on_recommend_text(self):
+        text = self.title_search_var.get().strip()
+        if not text:
+            messagebox.showwarning("Input Required", "Describe what you want to watch, e.g. 'heist thriller'.")
+            return
+
+        def recommend():
+            return list_columns(self.engine, self.engine.describe_positions(text, TEXT_RESULTS))
+
+        self.status_var.set("Finding titles for your description...")
+        self.runner.submit('recommend', recommend, self.show_recommend_results, self.on_query_error)
+
+    def show_recommend_results(self, columns):
+        self.recommend_list.set_data(columns)
         self.details_text2.config(state='normal')
         self.details_text2.delete('1.0', tk.END)
         self.details_text2.config(state='disabled')
+        self.status_var.set(f"{len(self.recommend_list)} recommendations")
 
-        if recs.empty:
+        if not columns:
             messagebox.showinfo("No Recommendations", "Could not find similar movies.")
-            return
-
-        for _, row in recs.iterrows():
-            self.recommend_listbox.insert(tk.END, f"{row['title']} ({row['release_year']})")
 
-    def show_recommend_details(self, event):
-        sel = self.recommend_listbox.curselection()
-        if not sel:
-            return
-        title_with_year = self.recommend_listbox.get(sel[0])
-        title = title_with_year.rsplit(" (", 1)[0]
-        movie_row = df[df['title'] == title].iloc[0]
+    def show_recommend_details(self, index):
+        movie_row = self.engine.df.iloc[self.recommend_list.row(index)['position']]
 
         details = (
             f"Title: {movie_row['title']}\n"
@@ -456,6 +592,7 @@ class MovieRecommenderApp(tk.Tk):
         parent.columnconfigure(0, weight=3)
         parent.columnconfigure(1, weight=1)
         parent.rowconfigure(0, weight=1)
+        parent.rowconfigure(2, weight=1)
 
         # Watchlist Listbox
         self.watchlist_box = tk.Listbox(parent,
@@ -486,30 +623,41 @@ class MovieRecommenderApp(tk.Tk):
                                 command=self.export_watchlist)
         export_btn.pack(pady=10, fill='x')
 
+        for_you_btn = ttk.Button(btn_frame, text="Recommend for Watchlist", style='Accent.TButton',
+                                 command=self.on_recommend_watchlist)
+        for_you_btn.pack(pady=10, fill='x')
+
+        ttk.Label(parent, text="Recommended for your watchlist:").grid(
+            row=1, column=0, sticky='w', padx=5)
+        self.for_you_list = VirtualList(parent, LIST_COLUMNS)
+        self.for_you_list.grid(row=2, column=0, columnspan=2, sticky='nsew', padx=5, pady=5)
+
     def update_watchlist_box(self):
         self.watchlist_box.delete(0, tk.END)
-        for movie in self.watchlist:
-            self.watchlist_box.insert(tk.END, movie)
+        if self.watchlist_positions:
+            titles = self.engine.column('title')[self.watchlist_positions]
+            self.watchlist_box.insert(tk.END, *titles)
 
     def add_to_watchlist(self):
-        sel_filtered = self.filtered_listbox.curselection()
-        sel_recommended = self.recommend_listbox.curselection()
-        if sel_filtered:
-            title_with_year = self.filtered_listbox.get(sel_filtered[0])
-            title = title_with_year.rsplit(" (", 1)[0]
-        elif sel_recommended:
-            title_with_year = self.recommend_listbox.get(sel_recommended[0])
-            title = title_with_year.rsplit(" (", 1)[0]
+        sel_filtered = self.filtered_list.selection()
+        sel_recommended = self.recommend_list.selection()
+        if sel_filtered is not None:
+            pos = self.filtered_list.row(sel_filtered)['position']
+        elif sel_recommended is not None:
+            pos = self.recommend_list.row(sel_recommended)['position']
         else:
             messagebox.showwarning("No Selection", "Please select a movie from either the Filter or Recommendation list to add.")
             return
 
-        if title in self.watchlist:
+        movie_row = self.engine.df.iloc[pos]
+        title = movie_row['title']
+        if not self.watchlist_store.add(movie_row['show_id']):
             messagebox.showinfo("Already in Watchlist", f"'{title}' is already in your watchlist.")
             return
 
-        self.watchlist.append(title)
-        save_watchlist(self.watchlist)
+        self.watchlist.append(movie_row['show_id'])
+        self.watchlist_positions.append(int(pos))
+        self.watchlist_profile.add(pos)
         self.update_watchlist_box()
         messagebox.showinfo("Added", f"'{title}' has been added to your watchlist.")
 
@@ -519,16 +667,35 @@ class MovieRecommenderApp(tk.Tk):
             messagebox.showwarning("No Selection", "Please select a movie in your watchlist to remove.")
             return
         title = self.watchlist_box.get(sel[0])
-        self.watchlist.remove(title)
-        save_watchlist(self.watchlist)
-        self.update_watchlist_box()
+        self.watchlist_store.remove(self.watchlist.pop(sel[0]))
+        self.watchlist_profile.remove(self.watchlist_positions.pop(sel[0]))
+        self.watchlist_box.delete(sel[0])
         messagebox.showinfo("Removed", f"'{title}' has been removed from your watchlist.")
 
+    def on_recommend_watchlist(self):
+        if not self.watchlist_profile:
+            messagebox.showinfo("Empty Watchlist", "Add titles to your watchlist to get recommendations.")
+            return
+
+        # Snapshot the profile here; the worker must not see later edits.
+        centroid = self.watchlist_profile.centroid()
+        exclude = list(self.watchlist_profile.positions)
+
+        def recommend():
+            return list_columns(self.engine, self.engine.profile_positions(centroid, 10, exclude))
+
+        self.status_var.set("Finding titles for your watchlist...")
+        self.runner.submit('for_you', recommend, self.show_watchlist_recommendations, self.on_query_error)
+
+    def show_watchlist_recommendations(self, columns):
+        self.for_you_list.set_data(columns)
+        self.status_var.set(f"{len(self.for_you_list)} recommendations for your watchlist")
+
     def export_watchlist(self):
         if not self.watchlist:
             messagebox.showinfo("Empty Watchlist", "Your watchlist is empty.")
             return
-        export_df = df[df['title'].isin(self.watchlist)][
+        export_df = self.engine.df.iloc[self.watchlist_positions][
             ['title', 'release_year', 'listed_in', 'rating', 'director', 'cast', 'country', 'duration', 'description']
         ]
         export_df.to_csv('watchlist_export.csv', index=False)
@@ -538,29 +705,37 @@ class MovieRecommenderApp(tk.Tk):
         parent.columnconfigure(0, weight=1)
         parent.rowconfigure(0, weight=1)
 
-        stats_frame = ttk.Frame(parent)
-        stats_frame.grid(row=0, column=0, sticky='nsew', padx=5, pady=5)
+        self.stats_frame = ttk.Frame(parent)
+        self.stats_frame.grid(row=0, column=0, sticky='nsew', padx=5, pady=5)
+        ttk.Label(self.stats_frame, text="Loading...").pack(expand=True)
+
+    def draw_stats(self, stats):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        import matplotlib.pyplot as plt
 
         fig, axes = plt.subplots(1, 3, figsize=(12, 4))
 
         # Genre distribution (top 10)
-        genre_counts = df['genres_list'].explode().value_counts().nlargest(10)
+        genre_counts = stats['genre_counts']
         axes[0].pie(genre_counts, labels=genre_counts.index, autopct='%1.1f%%', startangle=140)
         axes[0].set_title("Top 10 Genres", fontsize=10, fontname='Segoe UI')
 
         # Rating distribution
-        rating_counts = df['rating'].value_counts().nlargest(10)
+        rating_counts = stats['rating_counts']
         axes[1].bar(rating_counts.index, rating_counts.values, color='#1E88E5')
         axes[1].set_title("Top 10 Ratings", fontsize=10, fontname='Segoe UI')
         axes[1].tick_params(axis='x', rotation=45, labelsize=8)
 
         # Release year histogram
-        axes[2].hist(df['release_year'], bins=20, color='#1E88E5')
+        counts, edges = stats['year_histogram']
+        axes[2].hist(edges[:-1], bins=edges, weights=counts, color='#1E88E5')
         axes[2].set_title("Release Year Distribution", fontsize=10, fontname='Segoe UI')
 
         plt.tight_layout()
 
-        canvas = FigureCanvasTkAgg(fig, master=stats_frame)
+        for child in self.stats_frame.winfo_children():
+            child.destroy()
+        canvas = FigureCanvasTkAgg(fig, master=self.stats_frame)
         canvas.draw()
         canvas.get_tk_widget().pack(fill='both', expand=True)
 
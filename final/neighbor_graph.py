@@ -0,0 +1,127 @@
+"""
+Offline build of the all-titles top-k neighbour graph.
+
+For every row of the feature matrix the k most cosine-similar other rows are
+computed once and stored as two (n_rows, k) arrays: int32 row positions and
+float32 similarities, best first. A recommendation is then a row lookup.
+
+Usage:
+    python neighbor_graph.py --k 20 --max-memory-mb 512
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from ann_index import cosine_scores, leading_column, unit_rows
+
+DEFAULT_K = 20
+DEFAULT_MAX_MEMORY_MB = 256
+
+# Peak scratch per cell of a block: the sparse product (float32 data plus
+# int32 column index), its dense float32 copy and the float64 scores, which
+# are later replaced by the int64 argpartition result.
+_BYTES_PER_CELL = 4 + 4 + 4 + 8
+
+_worker_matrix = None
+_worker_head = None
+
+
+def block_rows(n_rows, max_memory_mb, n_jobs):
+    """
+    Rows per block so that `n_jobs` blocks in flight stay under the budget.
+    """
+    budget = max_memory_mb * 1024 * 1024 // max(n_jobs, 1)
+    return int(max(1, min(n_rows, budget // (n_rows * _BYTES_PER_CELL))))
+
+
+def _top_k_block(X, head, start, stop, k):
+    sims = cosine_scores(X[start:stop], X, head)
+    rows = np.arange(stop - start)
+    # Negate in place so argpartition's smallest are the most similar.
+    np.negative(sims, out=sims)
+    sims[rows, rows + start] = np.inf
+
+    top = np.argpartition(sims, k - 1, axis=1)[:, :k]
+    top_sims = -sims[rows[:, None], top]
+    # Best first; ties broken by row position so builds are reproducible.
+    order = np.lexsort((top, -top_sims), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_sims = np.take_along_axis(top_sims, order, axis=1)
+    return start, top.astype(np.int32), top_sims.astype(np.float32)
+
+
+def _init_worker(X, head):
+    global _worker_matrix, _worker_head
+    _worker_matrix = X
+    _worker_head = head
+
+
+def _worker_block(args):
+    start, stop, k = args
+    return _top_k_block(_worker_matrix, _worker_head, start, stop, k)
+
+
+def build_neighbor_graph(X, k=DEFAULT_K, max_memory_mb=DEFAULT_MAX_MEMORY_MB, n_jobs=None):
+    """
+    Top-k cosine neighbours (excluding the row itself) of every row of X.
+
+    Rows are processed in blocks of sparse matrix products sized so that the
+    dense scratch of all workers together stays within `max_memory_mb`.
+    Blocks are spread over `n_jobs` processes (default: all cores).
+    Returns (indices, similarities) with shapes (n_rows, k).
+    """
+    n_rows = X.shape[0]
+    k = min(k, n_rows - 1)
+    if k < 1:
+        raise ValueError("Need at least two rows to build a neighbour graph.")
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    Xn = unit_rows(X)
+    head = leading_column(Xn)
+    step = block_rows(n_rows, max_memory_mb, n_jobs)
+    blocks = [(start, min(start + step, n_rows), k) for start in range(0, n_rows, step)]
+
+    indices = np.empty((n_rows, k), dtype=np.int32)
+    similarities = np.empty((n_rows, k), dtype=np.float32)
+
+    if n_jobs == 1 or len(blocks) == 1:
+        results = (_top_k_block(Xn, head, *block) for block in blocks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(Xn, head))
+        results = pool.map(_worker_block, blocks)
+    try:
+        for start, top, top_sims in results:
+            indices[start:start + len(top)] = top
+            similarities[start:start + len(top)] = top_sims
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return indices, similarities
+
+
+def main():
+    from recommender_engine import DATA_PATH, RecommenderEngine
+
+    parser = argparse.ArgumentParser(description="Precompute the top-k neighbour graph for every title.")
+    parser.add_argument('--k', type=int, default=DEFAULT_K,
+                        help=f"neighbours stored per title (default {DEFAULT_K})")
+    parser.add_argument('--max-memory-mb', type=int, default=DEFAULT_MAX_MEMORY_MB,
+                        help=f"bound on scratch memory across all workers (default {DEFAULT_MAX_MEMORY_MB})")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="worker processes (default: all cores)")
+    parser.add_argument('--data', default=DATA_PATH, help="catalogue CSV")
+    args = parser.parse_args()
+
+    engine = RecommenderEngine(data_path=args.data)
+    start = time.perf_counter()
+    indices, _ = engine.build_neighbor_graph(k=args.k, max_memory_mb=args.max_memory_mb, n_jobs=args.jobs)
+    print(f"Built {indices.shape[1]}-NN graph for {indices.shape[0]} titles "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
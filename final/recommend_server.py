@@ -0,0 +1,442 @@
+"""
+Headless JSON-over-HTTP service for the recommender.
+
+One warm engine answers many clients, instead of every user building a
+private model in the Tk app. Built on asyncio and the standard library only.
+
+Endpoints (GET with query parameters, or POST with a JSON object body):
+
+    /health                                  engine and batching counters
+    /filter     genres, rating, year_from, year_to, match, limit
+    /search     q, limit, fuzzy
+    /text       q, k, boosts
+    /describe   q, k
+    /recommend  title, k, and optionally the /filter constraints
+
+`genres` is a list, or a comma-separated string in a query parameter.
+/search falls back to the closest titles by spelling when no title contains
+`q`; `fuzzy=1` always ranks by spelling. /text ranks titles by BM25 over
+description, cast, director and country; `boosts` is an object, or
+'field:weight' pairs such as `cast:3,country:0` in a query parameter.
+/describe recommends titles for a free-text description, no seed title.
+Concurrent /recommend requests arriving within `--batch-window-ms` of each
+other are answered by one batched similarity query.
+
+Usage:
+    python recommend_server.py --port 8765
+    python recommend_server.py --port 8765 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+DEFAULT_PORT = 8765
+DEFAULT_LIMIT = 100
+MAX_K = 100
+RECORD_COLUMNS = ['show_id', 'title', 'listed_in', 'release_year', 'rating']
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 414: 'URI Too Long', 500: 'Internal Server Error'}
+_MAX_BODY = 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RecommendBatcher:
+    """
+    Coalesces recommend requests into batched engine calls.
+
+    The first request of a batch starts a `window_ms` timer; everything that
+    arrives before it fires (or until `max_batch` requests are waiting) is
+    answered by one `similar_positions_batch` call per distinct k.
+    """
+
+    def __init__(self, engine, window_ms=2.0, max_batch=256):
+        self.engine = engine
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+        self._pending = []
+        self._timer = None
+
+    async def similar(self, pos, k):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((pos, k, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.requests += len(batch)
+        by_k = {}
+        for pos, k, future in batch:
+            by_k.setdefault(k, []).append((pos, future))
+        loop = asyncio.get_running_loop()
+        for k, items in by_k.items():
+            try:
+                results = await loop.run_in_executor(
+                    None, self.engine.similar_positions_batch, [pos for pos, _ in items], k)
+            except Exception as exc:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for (_, future), rows in zip(items, results):
+                if not future.done():
+                    future.set_result(rows)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch': self.requests / self.batches if self.batches else 0.0,
+        }
+
+
+class RecommendServer:
+    """
+    Routes HTTP requests to a built `RecommenderEngine`.
+    """
+
+    def __init__(self, engine, batch_window_ms=2.0, max_batch=256):
+        self.engine = engine
+        self.batcher = RecommendBatcher(engine, batch_window_ms, max_batch)
+        self.started = time.time()
+        self.routes = {
+            '/health': self.health,
+            '/filter': self.filter,
+            '/search': self.search,
+            '/text': self.text,
+            '/describe': self.describe,
+            '/recommend': self.recommend,
+        }
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT, sock=None):
+        """
+        Start listening, on `sock` if given (e.g. inherited from a parent).
+        """
+        if sock is not None:
+            return await asyncio.start_server(self.handle, sock=sock)
+        return await asyncio.start_server(self.handle, host, port)
+
+    def records(self, positions, limit=None):
+        """
+        JSON-ready dicts of RECORD_COLUMNS for the rows at `positions`.
+        """
+        positions = np.asarray(positions)[:limit]
+        # Column arrays rather than df.iloc: far cheaper for a few rows, and
+        # a SharedEngine has no dataframe to index.
+        values = [self.engine.column(c)[positions].tolist() for c in RECORD_COLUMNS]
+        return [dict(zip(RECORD_COLUMNS, row)) for row in zip(*values)]
+
+    # Endpoints
+
+    async def health(self, params):
+        return {
+            'status': 'ok',
+            'titles': self.engine.X_rec.shape[0],
+            'uptime': time.time() - self.started,
+            'cache': self.engine.cache.stats(),
+            'batching': self.batcher.stats(),
+        }
+
+    async def filter(self, params):
+        limit = _int_param(params, 'limit', DEFAULT_LIMIT, minimum=0)
+        positions = await _in_executor(self.engine.filter_positions, *_filter_params(params))
+        return {'total': len(positions), 'results': self.records(positions, limit)}
+
+    async def search(self, params):
+        query = params.get('q')
+        if not query:
+            raise HTTPError(400, "Missing parameter 'q'.")
+        limit = _int_param(params, 'limit', DEFAULT_LIMIT, minimum=0)
+        fuzzy = str(params.get('fuzzy', '')).lower() in ('1', 'true', 'yes')
+        positions = [] if fuzzy else await _in_executor(self.engine.search_positions, str(query))
+        if len(positions) == 0:
+            fuzzy = True
+            positions = await _in_executor(self.engine.fuzzy_positions, str(query), max(limit, 1))
+        return {'total': len(positions), 'fuzzy': fuzzy, 'results': self.records(positions, limit)}
+
+    async def text(self, params):
+        query = params.get('q')
+        if not query:
+            raise HTTPError(400, "Missing parameter 'q'.")
+        k = _int_param(params, 'k', 10, minimum=1, maximum=MAX_K)
+        boosts = _boost_params(params)
+        try:
+            positions = await _in_executor(self.engine.text_search_positions, str(query), k, boosts)
+        except ValueError as exc:
+            raise HTTPError(400, str(exc))
+        return {'total': len(positions), 'results': self.records(positions)}
+
+    async def describe(self, params):
+        query = params.get('q')
+        if not query:
+            raise HTTPError(400, "Missing parameter 'q'.")
+        k = _int_param(params, 'k', self.engine.n_neighbors - 1, minimum=1, maximum=MAX_K)
+        positions = await _in_executor(self.engine.describe_positions, str(query), k)
+        return {'results': self.records(positions)}
+
+    async def recommend(self, params):
+        title = params.get('title')
+        if not title:
+            raise HTTPError(400, "Missing parameter 'title'.")
+        k = _int_param(params, 'k', self.engine.n_neighbors - 1, minimum=1, maximum=MAX_K)
+        pos = self.engine.title_position(str(title))
+        if pos is None:
+            raise HTTPError(404, f"Unknown title: {title}")
+        filters = _filter_params(params)
+        if any(filters[:4]):
+            # Filtered searches score their own candidate set; no batching.
+            positions = await _in_executor(self.engine.similar_positions, pos, k, *filters)
+        else:
+            positions = await self.batcher.similar(pos, k)
+        return {'title': self.engine.column('title')[pos], 'results': self.records(positions)}
+
+    # HTTP
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                headers, version = {}, 'HTTP/1.0'
+                try:
+                    request_line = await _read_line(reader, 414, "Request line too long.")
+                    if not request_line.strip():
+                        break
+                    while True:
+                        line = await _read_line(reader, 400, "Header line too long.")
+                        if line in (b'\r\n', b'\n', b''):
+                            break
+                        name, _, value = line.decode('latin-1').partition(':')
+                        headers[name.strip().lower()] = value.strip()
+
+                    parts = request_line.decode('latin-1').split()
+                    if len(parts) == 3:
+                        version = parts[2]
+                    else:
+                        raise HTTPError(400, "Malformed request line.")
+                    length = int(headers.get('content-length') or 0)
+                    if length > _MAX_BODY:
+                        raise HTTPError(413, "Request body too large.")
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = 200, await self.dispatch(parts[0], parts[1], body)
+                except HTTPError as exc:
+                    status, payload = exc.status, {'error': str(exc)}
+                except ValueError:
+                    status, payload = 400, {'error': "Invalid Content-Length."}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as exc:
+                    status, payload = 500, {'error': f"{type(exc).__name__}: {exc}"}
+
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                              and status not in (400, 413, 414))
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"{version} {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        endpoint = self.routes.get(url.path.rstrip('/') or '/')
+        if endpoint is None:
+            raise HTTPError(404, f"No such endpoint: {url.path}")
+        params = dict(parse_qsl(url.query))
+        if method == 'POST':
+            try:
+                payload = json.loads(body or b'{}')
+            except json.JSONDecodeError:
+                raise HTTPError(400, "Body is not valid JSON.")
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "Body must be a JSON object.")
+            params.update(payload)
+        elif method != 'GET':
+            raise HTTPError(405, f"Method {method} not allowed.")
+        return await endpoint(params)
+
+
+def _filter_params(params):
+    """
+    (genres, rating, year_from, year_to, match) from request parameters.
+    """
+    genres = params.get('genres') or []
+    if isinstance(genres, str):
+        genres = [g.strip() for g in genres.split(',') if g.strip()]
+    elif not isinstance(genres, list) or not all(isinstance(g, str) for g in genres):
+        raise HTTPError(400, "'genres' must be a list of strings or a comma-separated string.")
+    rating = params.get('rating') or None
+    if rating is not None and not isinstance(rating, str):
+        raise HTTPError(400, "'rating' must be a string.")
+    match = params.get('match', 'any')
+    if match not in ('any', 'all'):
+        raise HTTPError(400, "match must be 'any' or 'all'.")
+    return (genres, rating,
+            _int_param(params, 'year_from', None), _int_param(params, 'year_to', None), match)
+
+
+def _boost_params(params):
+    """
+    Field boosts for /text, or None for the defaults.
+    """
+    boosts = params.get('boosts')
+    if not boosts:
+        return None
+    if isinstance(boosts, str):
+        pairs = [item.partition(':')[::2] for item in boosts.split(',') if item.strip()]
+    elif isinstance(boosts, dict):
+        pairs = boosts.items()
+    else:
+        raise HTTPError(400, "'boosts' must be an object or 'field:weight' pairs.")
+    try:
+        return {field.strip(): float(weight) for field, weight in pairs}
+    except (TypeError, ValueError):
+        raise HTTPError(400, "Boost weights must be numbers.")
+
+
+def _int_param(params, name, default, minimum=None, maximum=None):
+    value = params.get(name)
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise HTTPError(400, f"'{name}' must be an integer.")
+    try:
+        value = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise HTTPError(400, f"'{name}' must be an integer.")
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise HTTPError(400, f"'{name}' is out of range.")
+    return value
+
+
+async def _read_line(reader, status, message):
+    """
+    Next line from `reader`; a line over the stream limit is answered with
+    `status` (the rest of it is not read, so the connection is closed).
+    """
+    try:
+        return await reader.readline()
+    except (asyncio.LimitOverrunError, ValueError):
+        raise HTTPError(status, message)
+
+
+async def _in_executor(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+def serve(engine, host='127.0.0.1', port=DEFAULT_PORT, batch_window_ms=2.0, max_batch=256, sock=None):
+    """
+    Serve `engine` until interrupted.
+    """
+    async def run():
+        server = await RecommendServer(engine, batch_window_ms, max_batch).start(host, port, sock)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def _serve_shared(handle, sock, batch_window_ms, max_batch):
+    from shared_model import SharedEngine
+
+    serve(SharedEngine(handle), batch_window_ms=batch_window_ms, max_batch=max_batch, sock=sock)
+
+
+def serve_prefork(engine, workers, host='127.0.0.1', port=DEFAULT_PORT, batch_window_ms=2.0, max_batch=256):
+    """
+    Serve from `workers` processes sharing one listening socket.
+
+    The engine is published to shared memory once (see shared_model.py);
+    workers attach to it instead of building their own copy.
+    """
+    from shared_model import publish
+
+    model = publish(engine, RECORD_COLUMNS)
+    # The parent only hands out the shared copy from here on.
+    engine.reload()
+    sock = socket.create_server((host, port), backlog=1024)
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_serve_shared, args=(model.handle, sock, batch_window_ms, max_batch),
+                                 daemon=True)
+                 for _ in range(workers)]
+    try:
+        for process in processes:
+            process.start()
+        print(f"Listening on http://{host}:{port} with {workers} workers "
+              f"({model.nbytes / 1024 ** 2:.1f} MB shared)")
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        sock.close()
+        model.close()
+
+
+def main():
+    from recommender_engine import DATA_PATH, RecommenderEngine
+
+    parser = argparse.ArgumentParser(description="Serve recommendations over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--data', default=DATA_PATH, help="catalogue CSV")
+    parser.add_argument('--backend', default='exact', help="similarity backend: exact or lsh")
+    parser.add_argument('--batch-window-ms', type=float, default=2.0,
+                        help="how long a recommend request waits for others to batch with (default 2)")
+    parser.add_argument('--max-batch', type=int, default=256,
+                        help="flush a batch early once this many requests wait (default 256)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="serving processes sharing one model in shared memory (default 1)")
+    args = parser.parse_args()
+
+    engine = RecommenderEngine(data_path=args.data, backend=args.backend)
+    timings = engine.build()
+    print(f"Engine ready: {len(engine.df)} titles in {sum(timings.values()):.2f}s")
+
+    if args.workers > 1:
+        serve_prefork(engine, args.workers, args.host, args.port, args.batch_window_ms, args.max_batch)
+    else:
+        print(f"Listening on http://{args.host}:{args.port}")
+        serve(engine, args.host, args.port, args.batch_window_ms, args.max_batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1160 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MultiLabelBinarizer, normalize
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils.extmath import row_norms
+from scipy.sparse import hstack, csr_matrix
+
+from model_snapshot import (
+    SNAPSHOT_DIR,
+    file_hash,
+    snapshot_key,
+    save_snapshot,
+    load_snapshot,
+    save_array,
+    load_array,
+)
+from ann_index import ExactIndex, make_index, rest_norms, top_k
+from catalogue_updates import AutoRefit, GrowableArray, GrowableCSR, genre_matrix, merge_neighbors
+from dataset_cache import dataset_key, load_dataset, save_dataset
+from filter_index import FilterIndex
+from query_cache import LRUCache
+from text_index import FIELDS as TEXT_FIELDS, TextIndex
+from streaming_ingest import REQUIRED_COLUMNS, clean_chunk
+from title_index import ARRAYS as TITLE_ARRAYS, TitleIndex
+from watchlist_profile import WatchlistProfile
+from neighbor_graph import DEFAULT_MAX_MEMORY_MB, block_rows, build_neighbor_graph
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'netflix_titles.csv')
+
+RESULT_COLUMNS = ['title', 'listed_in', 'release_year']
+# recommend_similar(with_rating=True), recommend_for_text and recommend_many.
+RATED_RESULT_COLUMNS = RESULT_COLUMNS + ['rating']
+
+# Free-text queries whose feature vectors are kept (see query_vector).
+QUERY_VECTOR_CACHE = 128
+# Norm of a free-text query's genre block, relative to its TF-IDF block.
+GENRE_QUERY_WEIGHT = 0.5
+# Backend results first re-ranked per free-text result (see describe_positions).
+DESCRIBE_CANDIDATES = 4
+
+
+class RecommenderEngine:
+    """
+    Lazily built recommendation model.
+
+    Every stage (dataframe, genre encoding, TF-IDF block, feature matrix,
+    neighbour index) is built the first time it is needed and the time it
+    took is recorded in `timings`, keyed by stage name.
+
+    When `snapshot_dir` is set, the fitted model is saved there after the
+    first build and memory-mapped back on later starts instead of refitting,
+    as long as the CSV and feature config are unchanged.
+
+    `backend` picks the similarity search used when no precomputed neighbour
+    graph covers a query: 'exact' (default) or 'lsh', tuned by
+    `backend_params` (see ann_index.py).
+
+    The row positions behind filter_movies, find_exact_titles and
+    recommend_similar are kept in an LRU cache of `cache_size` entries /
+    `cache_bytes` bytes, which is cleared whenever the model is rebuilt.
+    Cached position arrays are read-only and shared between callers.
+
+    `add_titles` and `remove_titles` change the catalogue in place, with the
+    fitted vocabulary frozen, and `refit` (or `start_auto_refit`) refits it
+    on the result (see catalogue_updates.py). Updates live in memory only:
+    `reload()` goes back to the CSV.
+    """
+
+    def __init__(self, data_path=DATA_PATH, max_features=500, n_neighbors=6,
+                 snapshot_dir=SNAPSHOT_DIR, backend='exact', backend_params=None,
+                 cache_size=256, cache_bytes=64 * 1024 * 1024):
+        self.data_path = data_path
+        self.max_features = max_features
+        self.n_neighbors = n_neighbors
+        self.snapshot_dir = snapshot_dir
+        self.backend = backend
+        self.backend_params = dict(backend_params or {})
+        self.timings = {}
+        self.cache = LRUCache(cache_size, cache_bytes)
+        self.query_vectors = LRUCache(QUERY_VECTOR_CACHE)
+        self.generation = 0
+        self._column_arrays = {}
+
+        self._lock = threading.RLock()
+        self._refit_lock = threading.Lock()
+        self._auto_refit = None
+        self._reset()
+
+    def _reset(self):
+        self._df = None
+        self._genre_rows = None
+        self._data_hash = None
+        self._mlb = None
+        self._genre_ohe = None
+        self._tfidf = None
+        self._desc_tfidf = None
+        self._X_rec = None
+        self._row_norms = None
+        self._content_norms = None
+        self._nn_model = None
+        self._index = None
+        self._exact_index = None
+        self._title_index = None
+        self._text_index = None
+        self._genre_terms = None
+        self._filter_index = None
+        self._show_id_positions = None
+        self._graph = None
+        self._graph_checked = False
+        self._snapshot_key = None
+        self._snapshot_checked = False
+        self._snapshot_restored = False
+        self._removed = np.empty(0, dtype=np.int64)
+        self._pending_rows = []
+        self._growable = {}
+        self._update_log = None
+        self._modified = False
+        self.pending_changes = 0
+
+    @contextmanager
+    def _timed(self, stage):
+        start = time.perf_counter()
+        yield
+        self.timings[stage] = time.perf_counter() - start
+
+    # Build stages
+
+    @property
+    def df(self):
+        """
+        The cleaned catalogue, from the columnar dataset cache when one
+        matches the CSV (see dataset_cache.py), else parsed and cached.
+        Rows from add_titles are concatenated on first access after them.
+
+        A loaded frame is never modified, only replaced, so it is returned
+        without taking the lock: a stage building under the lock does not
+        hold up readers such as the GUI thread.
+        """
+        df = self._df
+        if df is not None and not self._pending_rows:
+            return df
+        with self._lock:
+            if self._df is None and not self._load_dataset():
+                with self._timed('dataframe'):
+                    df = pd.read_csv(self.data_path)
+                    df = df.dropna(subset=list(REQUIRED_COLUMNS))
+                    df['genres_list'] = df['listed_in'].str.split(', ')
+                    self._df = df
+                self._write_dataset()
+            if self._pending_rows:
+                self._df = pd.concat([self._df] + self._pending_rows)
+                self._pending_rows = []
+            return self._df
+
+    @property
+    def mlb(self):
+        self._build_genres()
+        return self._mlb
+
+    @property
+    def genre_ohe(self):
+        self._build_genres()
+        return self._genre_ohe
+
+    def _build_genres(self):
+        with self._lock:
+            if self._genre_ohe is None and not self._restore_snapshot():
+                genres_list = self.df['genres_list']
+                with self._timed('genres'):
+                    if self._genre_rows is not None:
+                        # Pre-split codes from the dataset cache; the names are
+                        # sorted, as MultiLabelBinarizer orders its classes.
+                        codes, offsets, names = self._genre_rows
+                        self._mlb = MultiLabelBinarizer(classes=names, sparse_output=True).fit([])
+                        self._genre_ohe = csr_matrix((np.ones(len(codes), dtype=np.int64), codes, offsets),
+                                                     shape=(len(offsets) - 1, len(names)))
+                        self._genre_ohe.sort_indices()
+                    else:
+                        self._mlb = MultiLabelBinarizer(sparse_output=True)
+                        self._genre_ohe = self._mlb.fit_transform(genres_list).tocsr()
+
+    @property
+    def tfidf(self):
+        self._build_tfidf()
+        return self._tfidf
+
+    @property
+    def desc_tfidf(self):
+        self._build_tfidf()
+        with self._lock:
+            if self._desc_tfidf is not None:
+                return self._desc_tfidf
+            # Released once X_rec holds it; scale the rows back to recover it.
+            X_rec = self.X_rec
+            start = 1 + len(self.mlb.classes_)
+            return csr_matrix(X_rec[:, start:].multiply(self._row_norms[:, None]), dtype=np.float32)
+
+    def _build_tfidf(self):
+        with self._lock:
+            if self._tfidf is None and not self._restore_snapshot():
+                descriptions = self.df['description'].fillna('')
+                with self._timed('tfidf'):
+                    self._tfidf = TfidfVectorizer(max_features=self.max_features, dtype=np.float32)
+                    self._desc_tfidf = self._tfidf.fit_transform(descriptions)
+                    # The fitted dict keeps the hash table sized for every term
+                    # seen before pruning to max_features; copy it compactly.
+                    self._tfidf.vocabulary_ = {term: int(col) for term, col in self._tfidf.vocabulary_.items()}
+
+    @property
+    def X_rec(self):
+        with self._lock:
+            if self._X_rec is None and not self._restore_snapshot():
+                year_values = self.df['release_year'].to_numpy(np.float32).reshape(-1, 1)
+                genre_ohe = self.genre_ohe
+                desc_tfidf = self.desc_tfidf
+                with self._timed('features'):
+                    X_rec = hstack([csr_matrix(year_values), genre_ohe, desc_tfidf], format='csr', dtype=np.float32)
+                    # Only cosine similarity is ever taken, so rows are stored
+                    # unit-length and the index can use X_rec without a copy.
+                    # The norms let the genre and TF-IDF blocks be recovered.
+                    self._row_norms = row_norms(X_rec).astype(np.float32)
+                    self._X_rec = normalize(X_rec, norm='l2', copy=False)
+                    self._desc_tfidf = None
+                self._write_snapshot()
+            return self._X_rec
+
+    @property
+    def nn_model(self):
+        with self._lock:
+            if self._nn_model is None:
+                X_rec = self.X_rec
+                with self._timed('neighbors'):
+                    self._nn_model = NearestNeighbors(n_neighbors=self.n_neighbors, metric='cosine')
+                    self._nn_model.fit(X_rec)
+            return self._nn_model
+
+    @property
+    def index(self):
+        """
+        Similarity search backend fitted on X_rec.
+        """
+        with self._lock:
+            if self._index is None:
+                X_rec = self.X_rec
+                with self._timed('index'):
+                    self._index = self._without_removed(make_index(self.backend, **self.backend_params).fit(X_rec))
+            return self._index
+
+    @property
+    def exact_index(self):
+        """
+        Brute-force backend, shared with `index` when that is exact too.
+        """
+        with self._lock:
+            if self._exact_index is None:
+                if self.backend == 'exact':
+                    self._exact_index = self.index
+                else:
+                    X_rec = self.X_rec
+                    with self._timed('exact_index'):
+                        self._exact_index = self._without_removed(ExactIndex().fit(X_rec))
+            return self._exact_index
+
+    @property
+    def filter_index(self):
+        """
+        Genre/rating/year bitsets used by filter_movies.
+        """
+        with self._lock:
+            if self._filter_index is None:
+                df = self.df
+                genre_ohe = self.genre_ohe
+                with self._timed('filter_index'):
+                    index = FilterIndex(genre_ohe, self.mlb.classes_,
+                                        df['rating'].to_numpy(), df['release_year'].to_numpy())
+                    self._filter_index = self._without_removed(index)
+            return self._filter_index
+
+    @property
+    def title_index(self):
+        """
+        Exact and substring title lookups (see title_index.py), memory-mapped
+        from the snapshot when it holds them and saved there otherwise.
+        """
+        with self._lock:
+            if self._title_index is None:
+                titles = self.df['title'].to_numpy()
+                with self._timed('title_index'):
+                    index = self._load_title_index(titles)
+                    if index is None:
+                        index = TitleIndex(titles)
+                        self._save_title_index(index)
+                    self._title_index = self._without_removed(index)
+            return self._title_index
+
+    def _load_title_index(self, titles):
+        if not self.snapshot_dir or self._modified:
+            return None
+        arrays = {name: load_array(self.snapshot_dir, self.snapshot_key, 'title_' + name) for name in TITLE_ARRAYS}
+        if any(array is None for array in arrays.values()) or len(arrays['key_starts']) != len(titles) + 1:
+            return None
+        return TitleIndex.from_arrays(titles, arrays)
+
+    def _save_title_index(self, index):
+        if not self.snapshot_dir or self._modified:
+            return
+        try:
+            for name, array in index.arrays().items():
+                save_array(self.snapshot_dir, self.snapshot_key, 'title_' + name, array)
+        except OSError:
+            # No snapshot directory (e.g. a read-only install): rebuilt next start.
+            pass
+
+    @property
+    def text_index(self):
+        """
+        BM25 full-text index over description, cast, director and country
+        (see text_index.py), tokenised like the TF-IDF block.
+        """
+        with self._lock:
+            if self._text_index is None:
+                columns = {field: self.df[field].to_numpy() for field in TEXT_FIELDS}
+                analyzer = self.tfidf.build_analyzer()
+                with self._timed('text_index'):
+                    self._text_index = self._without_removed(TextIndex(columns, analyzer))
+            return self._text_index
+
+    @property
+    def content_norms(self):
+        """
+        Norm of every X_rec row without its year column, so free-text
+        queries (which have no year) are scored on content alone.
+        """
+        with self._lock:
+            if self._content_norms is None:
+                X_rec = self.X_rec
+                with self._timed('content_norms'):
+                    self._content_norms = rest_norms(X_rec)
+            return self._content_norms
+
+    @property
+    def show_id_positions(self):
+        """
+        show_id mapped to row position.
+        """
+        with self._lock:
+            if self._show_id_positions is None:
+                show_ids = self.df['show_id'].to_numpy()
+                with self._timed('show_ids'):
+                    positions = {show_id: pos for pos, show_id in enumerate(show_ids)}
+                    for pos in self._removed:
+                        if positions.get(show_ids[pos]) == pos:
+                            del positions[show_ids[pos]]
+                    self._show_id_positions = positions
+            return self._show_id_positions
+
+    def _without_removed(self, index):
+        return index.without(self._removed) if len(self._removed) else index
+
+    @property
+    def neighbor_graph(self):
+        """
+        Precomputed (indices, similarities) top-k arrays, or None if the graph
+        has not been built for this snapshot (see neighbor_graph.py).
+        """
+        with self._lock:
+            if not self._graph_checked:
+                self._graph_checked = True
+                if self.snapshot_dir:
+                    self.X_rec
+                    with self._timed('graph'):
+                        indices = load_array(self.snapshot_dir, self.snapshot_key, 'graph_indices')
+                        similarities = load_array(self.snapshot_dir, self.snapshot_key, 'graph_similarities')
+                    if indices is not None and similarities is not None and len(indices) == self.X_rec.shape[0]:
+                        self._graph = (indices, similarities)
+            return self._graph
+
+    def build_neighbor_graph(self, k, max_memory_mb=DEFAULT_MAX_MEMORY_MB, n_jobs=None):
+        """
+        Compute the top-k graph for every title and store it in the snapshot.
+        """
+        X_rec = self.X_rec
+        with self._timed('graph_build'):
+            graph = build_neighbor_graph(X_rec, k=k, max_memory_mb=max_memory_mb, n_jobs=n_jobs)
+        if self.snapshot_dir and not self._modified:
+            save_array(self.snapshot_dir, self.snapshot_key, 'graph_indices', graph[0])
+            save_array(self.snapshot_dir, self.snapshot_key, 'graph_similarities', graph[1])
+        with self._lock:
+            self._graph = graph
+            self._graph_checked = True
+            self._invalidate()
+        return graph
+
+    # Snapshot
+
+    def feature_config(self):
+        """
+        Everything besides the CSV contents that changes the fitted model.
+        """
+        return {'max_features': self.max_features, 'dtype': 'float32', 'normalized': True}
+
+    @property
+    def data_hash(self):
+        if self._data_hash is None:
+            with self._timed('hash'):
+                self._data_hash = file_hash(self.data_path)
+        return self._data_hash
+
+    @property
+    def snapshot_key(self):
+        if self._snapshot_key is None:
+            self._snapshot_key = snapshot_key(self.data_hash, self.feature_config())
+        return self._snapshot_key
+
+    def _load_dataset(self):
+        if not self.snapshot_dir:
+            return False
+        key = dataset_key(self.data_hash)
+        with self._timed('dataset'):
+            loaded = load_dataset(self.snapshot_dir, key)
+            if loaded is None:
+                return False
+            self._df, self._genre_rows = loaded
+        return True
+
+    def _write_dataset(self):
+        if not self.snapshot_dir:
+            return
+        with self._timed('dataset_save'):
+            try:
+                save_dataset(self.snapshot_dir, dataset_key(self.data_hash), self._df, self.data_path)
+            except OSError:
+                pass
+
+    def _restore_snapshot(self):
+        """
+        Try the snapshot once; True if the model was restored from it.
+        """
+        if not self._snapshot_checked and self.snapshot_dir:
+            self._snapshot_checked = True
+            self._snapshot_restored = self._load_snapshot()
+        return self._snapshot_restored
+
+    def _load_snapshot(self):
+        key = self.snapshot_key
+        with self._timed('snapshot'):
+            loaded = load_snapshot(self.snapshot_dir, key)
+            if loaded is None:
+                return False
+            arrays, meta = loaded
+            X_rec = csr_matrix((arrays['X_data'], arrays['X_indices'], arrays['X_indptr']),
+                               shape=tuple(meta['shape']), copy=False)
+
+            mlb = MultiLabelBinarizer(classes=meta['genres'], sparse_output=True)
+            mlb.fit([])
+            n_genres = len(meta['genres'])
+
+            tfidf = TfidfVectorizer(max_features=self.max_features, vocabulary=meta['vocabulary'], dtype=np.float32)
+            tfidf.idf_ = np.asarray(arrays['idf'])
+
+            row_norms = np.asarray(arrays['row_norms'])
+            self._X_rec = X_rec
+            self._row_norms = row_norms
+            self._mlb = mlb
+            self._genre_ohe = (X_rec[:, 1:1 + n_genres] != 0).astype(np.int64)
+            self._tfidf = tfidf
+        return True
+
+    def _write_snapshot(self):
+        if not self.snapshot_dir:
+            return
+        self._snapshot_checked = True
+        X_rec = self._X_rec
+        arrays = {
+            'X_data': X_rec.data,
+            'X_indices': X_rec.indices,
+            'X_indptr': X_rec.indptr,
+            'idf': self.tfidf.idf_,
+            'row_norms': self._row_norms,
+            'row_index': self.df.index.to_numpy(),
+        }
+        meta = {
+            'shape': list(X_rec.shape),
+            'genres': [str(g) for g in self.mlb.classes_],
+            'vocabulary': {term: int(col) for term, col in self.tfidf.vocabulary_.items()},
+            'config': self.feature_config(),
+        }
+        with self._timed('snapshot_save'):
+            try:
+                save_snapshot(self.snapshot_dir, self.snapshot_key, arrays, meta, self.data_path)
+            except OSError:
+                # A read-only install still works, it just refits every start.
+                pass
+
+    def memory_usage(self):
+        """
+        Approximate bytes held by the dataframe, the feature matrix and the
+        TF-IDF vocabulary (terms plus idf weights).
+        """
+        df = self.df
+        X_rec = self.X_rec
+        tfidf = self.tfidf
+        vocabulary = tfidf.vocabulary_
+        usage = {
+            'dataframe': int(df.memory_usage(index=True, deep=True).sum()),
+            'features': X_rec.data.nbytes + X_rec.indices.nbytes + X_rec.indptr.nbytes + self._row_norms.nbytes,
+            'vocabulary': (sys.getsizeof(vocabulary) + tfidf.idf_.nbytes
+                           + sum(sys.getsizeof(term) + sys.getsizeof(col) for term, col in vocabulary.items())),
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+    def build(self):
+        """
+        Build every stage now and return the per-stage timings.
+
+        Call it off the GUI thread: a stage built lazily by a first query
+        holds the engine lock while it builds (the full-text index takes
+        seconds on a large catalogue).
+        """
+        self.index
+        self.filter_index
+        self.title_index
+        self.text_index
+        self.content_norms
+        self.neighbor_graph
+        return dict(self.timings)
+
+    def reload(self):
+        """
+        Drop every built stage and cached result, e.g. after the CSV changed.
+        """
+        with self._lock:
+            self._reset()
+            self.timings.clear()
+            self._invalidate()
+
+    def _invalidate(self):
+        # Keys carry the generation, so results computed concurrently from the
+        # old model can still be stored but will never be served.
+        self.generation += 1
+        self.cache.clear()
+        self.query_vectors.clear()
+        self._column_arrays = {}
+
+    def _cached(self, key, compute):
+        def compute_frozen():
+            positions = np.asarray(compute())
+            positions.setflags(write=False)
+            return positions
+        return self.cache.get_or_compute((self.generation,) + key, compute_frozen)
+
+    # Catalogue updates
+
+    def add_titles(self, rows):
+        """
+        Append titles without refitting; returns their row positions.
+
+        `rows` is a DataFrame or an iterable of dicts with the CSV columns.
+        They are encoded with the fitted TF-IDF vocabulary and genre classes
+        (genres not seen at fit time stay out of the features and genre
+        filters until the next refit) and appended to the feature matrix
+        and to every index built so far, so the cost grows with the number
+        of new rows, not with the catalogue. A neighbour graph is updated
+        with one exact similarity pass per new row.
+        """
+        new = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+        with self._lock:
+            X_rec = self.X_rec
+            graph = self.neighbor_graph
+            show_id_positions = self.show_id_positions
+            base = self._df
+            columns = [name for name in base.columns if name != 'genres_list']
+            kept, _ = clean_chunk(new.reindex(columns=columns))
+            if len(kept) < len(new):
+                raise ValueError(f"{len(new) - len(kept)} row(s) lack {', '.join(REQUIRED_COLUMNS)} "
+                                 f"or a numeric release_year.")
+            show_ids = kept['show_id'].tolist()
+            taken = [i for i in show_ids if not isinstance(i, str) or i in show_id_positions]
+            if taken or len(set(show_ids)) < len(show_ids):
+                raise ValueError(f"show_id missing, repeated or already in the catalogue: {taken[:5] or show_ids}")
+
+            last = self._pending_rows[-1].index[-1] if self._pending_rows else base.index.max()
+            kept.index = pd.RangeIndex(last + 1, last + 1 + len(kept))
+            kept['genres_list'] = kept['listed_in'].str.split(', ')
+            start = X_rec.shape[0]
+            positions = np.arange(start, start + len(kept))
+
+            with self._timed('add_titles'):
+                genre_ohe = genre_matrix(kept['genres_list'], self.mlb.classes_)
+                year_values = kept['release_year'].to_numpy(np.float32).reshape(-1, 1)
+                features = hstack([csr_matrix(year_values), genre_ohe, self.tfidf.transform(kept['description'])],
+                                  format='csr', dtype=np.float32)
+                norms = row_norms(features).astype(np.float32)
+                features = normalize(features, norm='l2', copy=False)
+
+                self._X_rec = X_rec = self._append('X_rec', X_rec, features, GrowableCSR)
+                self._row_norms = self._append('row_norms', self._row_norms, norms, GrowableArray)
+                self._genre_ohe = self._append('genre_ohe', self._genre_ohe, genre_ohe, GrowableCSR)
+                if self._content_norms is not None:
+                    self._content_norms = self._append('content_norms', self._content_norms,
+                                                       rest_norms(features), GrowableArray)
+                self._pending_rows.append(kept)
+                self._nn_model = None
+                self._update_indexes({
+                    '_index': lambda index: index.extended(X_rec),
+                    '_exact_index': lambda index: index.extended(X_rec),
+                    '_filter_index': lambda index: index.extended(
+                        genre_ohe, kept['rating'].to_numpy(), kept['release_year'].to_numpy()),
+                    '_title_index': lambda index: index.extended(kept['title'].to_numpy()),
+                    '_text_index': lambda index: index.extended({f: kept[f].to_numpy() for f in TEXT_FIELDS}),
+                })
+                show_id_positions.update(zip(show_ids, positions.tolist()))
+                if graph is not None:
+                    self._graph = self._extend_graph(graph, start)
+
+            self._modified = True
+            self._record('add_titles', new, len(kept))
+            return positions
+
+    def remove_titles(self, show_ids):
+        """
+        Remove titles by show_id; returns how many were in the catalogue.
+
+        Their rows stay in place as tombstones, so no other row moves, and
+        every index leaves them out of its results from now on.
+        """
+        with self._lock:
+            show_id_positions = self.show_id_positions
+            positions = [show_id_positions.pop(i) for i in dict.fromkeys(show_ids) if i in show_id_positions]
+            if positions:
+                self._removed = np.union1d(self._removed, positions).astype(np.int64)
+                self._update_indexes({name: lambda index: index.without(positions)
+                                      for name in ('_index', '_exact_index', '_filter_index', '_title_index',
+                                                   '_text_index')})
+                self._record('remove_titles', list(show_ids), len(positions))
+            return len(positions)
+
+    def _append(self, name, current, rows, growable):
+        # Buffers are reused as long as `current` is what they last returned;
+        # after a rebuild or refit a new one is started from it.
+        entry = self._growable.get(name)
+        buffer = entry[0] if entry is not None and entry[1] is current else growable(current)
+        result = buffer.append(rows)
+        self._growable[name] = (buffer, result)
+        return result
+
+    def _update_indexes(self, change):
+        """
+        Replace every index built so far by `change[attribute](index)`,
+        keeping exact_index the same object as index when it was.
+        """
+        index, exact_index = self._index, self._exact_index
+        for name in ('_index', '_filter_index', '_title_index', '_text_index'):
+            if getattr(self, name) is not None:
+                setattr(self, name, change[name](getattr(self, name)))
+        if exact_index is not None:
+            self._exact_index = self._index if exact_index is index else change['_exact_index'](exact_index)
+
+    def _extend_graph(self, graph, start):
+        """
+        The neighbour graph with rows `start` onwards added, in blocks of
+        new rows scored against the whole catalogue.
+        """
+        X_rec = self.X_rec
+        index = self.exact_index
+        k = graph[0].shape[1]
+        empty = (np.empty((0, k), dtype=graph[0].dtype), np.empty((0, k), dtype=graph[1].dtype))
+        indices = self._append('graph_indices', graph[0], empty[0], GrowableArray)
+        similarities = self._append('graph_similarities', graph[1], empty[1], GrowableArray)
+        step = block_rows(X_rec.shape[0], DEFAULT_MAX_MEMORY_MB, 1)
+        for first in range(start, X_rec.shape[0], step):
+            scores = index.scores(X_rec[first:first + step])
+            top, top_scores = merge_neighbors(indices, similarities, scores, first)
+            indices = self._append('graph_indices', indices, top, GrowableArray)
+            similarities = self._append('graph_similarities', similarities, top_scores, GrowableArray)
+        return indices, similarities
+
+    def _record(self, method, argument, changes):
+        self.pending_changes += changes
+        if self._update_log is not None:
+            self._update_log.append((method, argument))
+        self._invalidate()
+
+    def refit(self):
+        """
+        Refit vocabulary, IDF weights, genre classes and every index on the
+        catalogue as updated so far, then swap the new model in.
+
+        The model is built without holding the lock, so queries and updates
+        go on meanwhile; updates made during the build are replayed onto it
+        before the swap. Removed titles stay tombstones, so row positions
+        are unchanged. Returns False if reload() intervened.
+
+        Because the old model keeps serving, it stays in memory until the
+        swap: peak memory is that of a full build plus the old feature
+        matrix and indexes (the DataFrame is shared). At 200k rows that is
+        1.8 GB against 1.6 GB for a build, 0.5 GB at rest.
+        """
+        with self._refit_lock, self._timed('refit'):
+            with self._lock:
+                df = self.df
+                graph = self.neighbor_graph
+                changes = self.pending_changes
+                fresh = RecommenderEngine(self.data_path, self.max_features, self.n_neighbors, snapshot_dir=None,
+                                          backend=self.backend, backend_params=self.backend_params, cache_size=0)
+                fresh._df = df
+                fresh._removed = self._removed
+                log = self._update_log = []
+            try:
+                fresh.build()
+                if graph is not None:
+                    fresh.build_neighbor_graph(graph[0].shape[1])
+                with self._lock:
+                    if self._update_log is not log:
+                        return False
+                    for method, argument in log:
+                        getattr(fresh, method)(argument)
+                    for name in ('_df', '_pending_rows', '_genre_rows', '_mlb', '_genre_ohe', '_tfidf', '_desc_tfidf',
+                                 '_X_rec', '_row_norms', '_content_norms', '_nn_model', '_index', '_exact_index',
+                                 '_title_index', '_text_index', '_genre_terms', '_filter_index', '_show_id_positions',
+                                 '_graph', '_removed', '_growable'):
+                        setattr(self, name, getattr(fresh, name))
+                    self.pending_changes -= changes
+                    self._invalidate()
+                return True
+            finally:
+                with self._lock:
+                    if self._update_log is log:
+                        self._update_log = None
+
+    def start_auto_refit(self, interval=600, min_changes=1):
+        """
+        Refit in a background thread every `interval` seconds, whenever at
+        least `min_changes` titles were added or removed since the last fit.
+        """
+        self.stop_auto_refit()
+        self._auto_refit = AutoRefit(self, interval, min_changes).start()
+        return self._auto_refit
+
+    def stop_auto_refit(self):
+        if self._auto_refit is not None:
+            self._auto_refit.stop()
+            self._auto_refit = None
+
+    # Queries
+
+    def filter_positions(self, genres, rating, year_from, year_to, match='any'):
+        """
+        Row positions matching the filters, straight from the bitset index.
+        """
+        key = ('filter', tuple(sorted(set(genres or ()))), rating or None, year_from, year_to, match)
+        return self._cached(
+            key, lambda: self.filter_index.positions(genres, rating, year_from, year_to, match=match))
+
+    def filter_movies(self, genres, rating, year_from, year_to, match='any'):
+        """
+        Filter by multi-genre list, rating, and year range.
+
+        With `match='any'` a title needs one of `genres`; with `match='all'`
+        it needs every one of them.
+        """
+        return self.df.iloc[self.filter_positions(genres, rating, year_from, year_to, match)]
+
+    def column(self, name):
+        """
+        Values of catalogue column `name` as an array indexed by row position.
+
+        Arrays are kept until the model changes: the categorical columns of
+        the dataset cache would otherwise be expanded to a new object array
+        on every call. Kept arrays are returned without taking the lock.
+        """
+        values = self._column_arrays.get(name)
+        if values is not None:
+            return values
+        with self._lock:
+            values = self._column_arrays.get(name)
+            if values is None:
+                values = self._column_arrays[name] = self.df[name].to_numpy()
+            return values
+
+    def title_position(self, title):
+        """
+        Row position of `title`, or None if it is not in the catalogue.
+        """
+        return self.title_index.first(title)
+
+    def show_id_position(self, show_id):
+        """
+        Row position of `show_id`, or None if it is not in the catalogue.
+        """
+        return self.show_id_positions.get(show_id)
+
+    def search_positions(self, partial_title):
+        """
+        Row positions of titles containing `partial_title`, ignoring case.
+        """
+        key = ('search', partial_title.casefold())
+        return self._cached(key, lambda: self.title_index.search(partial_title))
+
+    def find_exact_titles(self, partial_title):
+        return self.df.iloc[self.search_positions(partial_title)]
+
+    def fuzzy_positions(self, query, limit=10):
+        """
+        Row positions of the `limit` titles closest to `query`, best first,
+        tolerating misspellings.
+        """
+        key = ('fuzzy', query.casefold().strip(), limit)
+        return self._cached(key, lambda: self.title_index.fuzzy(query, limit))
+
+    def find_fuzzy_titles(self, query, limit=10):
+        return self.df.iloc[self.fuzzy_positions(query, limit)]
+
+    def text_search_positions(self, query, k=10, boosts=None):
+        """
+        Row positions of the k best BM25 matches for `query` in the
+        description, cast, director and country, best first. `boosts` maps
+        field name to weight, overriding text_index.DEFAULT_BOOSTS.
+        """
+        key = ('text', query, k, tuple(sorted((boosts or {}).items())))
+        return self._cached(key, lambda: self.text_index.search(query, k, boosts)[0])
+
+    def search_text(self, query, k=10, boosts=None):
+        return self.df.iloc[self.text_search_positions(query, k, boosts)]
+
+    def similar_positions(self, pos, k=None, genres=None, rating=None, year_from=None, year_to=None,
+                          match='any'):
+        """
+        Row positions of the k titles most similar to row `pos`.
+
+        Served from the precomputed neighbour graph when it holds at least k
+        neighbours, otherwise by querying the configured backend.
+
+        The genre/rating/year arguments of filter_movies restrict the results
+        to matching titles. They are applied as a candidate mask inside the
+        search, so k titles come back whenever k titles match, and a
+        selective filter means fewer rows to score.
+        """
+        k = k or self.n_neighbors - 1
+        if not (genres or rating or year_from is not None or year_to is not None):
+            return self._cached(('similar', int(pos), k), lambda: self._similar_positions(pos, k))
+        key = ('similar', int(pos), k, tuple(sorted(set(genres or ()))), rating or None, year_from, year_to, match)
+        return self._cached(key, lambda: self._similar_positions_within(
+            pos, k, self.filter_positions(genres, rating, year_from, year_to, match)))
+
+    def _graph_neighbors(self, seeds, k):
+        """
+        (indices, similarities) of the first k neighbours of `seeds` in the
+        graph that were not removed, or None unless the graph has k for
+        every seed.
+        """
+        graph = self.neighbor_graph
+        if graph is None or graph[0].shape[1] < k:
+            return None
+        indices, similarities = np.asarray(graph[0][seeds]), np.asarray(graph[1][seeds])
+        if len(self._removed):
+            live = ~np.isin(indices, self._removed)
+            if np.any(live.sum(axis=-1) < k):
+                return None
+            order = np.argsort(~live, axis=-1, kind='stable')
+            indices = np.take_along_axis(indices, order, axis=-1)
+            similarities = np.take_along_axis(similarities, order, axis=-1)
+        return indices[..., :k], similarities[..., :k]
+
+    def _similar_positions(self, pos, k):
+        found = self._graph_neighbors(pos, k)
+        if found is not None:
+            return found[0]
+        indices, _ = self.index.query(self.X_rec[pos], min(k + 1, self.X_rec.shape[0]))
+        indices = indices[0]
+        return indices[indices != pos][:k]
+
+    def _similar_positions_within(self, pos, k, candidates):
+        """
+        Top k of the ascending row positions `candidates` by similarity to `pos`.
+        """
+        candidates = candidates[candidates != pos]
+        if len(candidates) == 0:
+            return candidates
+        graph = self.neighbor_graph
+        if graph is not None:
+            # The graph row is the global ranking: if k of its neighbours pass
+            # the filter, they are the best k candidates.
+            row = np.asarray(graph[0][pos])
+            slots = np.minimum(np.searchsorted(candidates, row), len(candidates) - 1)
+            hits = row[candidates[slots] == row]
+            if len(hits) >= k:
+                return hits[:k]
+
+        index = self.exact_index
+        query = self.X_rec[pos]
+        if len(candidates) * 4 < self.X_rec.shape[0]:
+            top, _ = top_k(index.scores(query, candidates), k)
+            return candidates[top[0]]
+        if self.index is not index:
+            # Most rows pass: the backend's top results usually hold k of them.
+            indices, _ = self.index.query(query, min(4 * (k + 1), self.X_rec.shape[0]))
+            row = indices[0][indices[0] != pos]
+            hits = row[np.isin(row, candidates)]
+            if len(hits) >= k:
+                return hits[:k]
+        # Score every row and mask out the rest.
+        scores = index.scores(query)
+        excluded = np.ones(scores.shape[1], dtype=bool)
+        excluded[candidates] = False
+        scores[:, excluded] = -np.inf
+        top, _ = top_k(scores, min(k, len(candidates)))
+        return top[0]
+
+    def similar_positions_batch(self, positions, k=None):
+        """
+        `similar_positions` for several rows at once.
+
+        Rows that are not cached yet are answered by a single graph lookup or
+        backend query, then cached one by one.
+        """
+        k = k or self.n_neighbors - 1
+        generation = self.generation
+        results = [self.cache.get((generation, 'similar', int(pos), k)) for pos in positions]
+        missing = sorted({int(pos) for pos, rows in zip(positions, results) if rows is None})
+        if not missing:
+            return results
+        computed = dict(zip(missing, self._similar_positions_many(np.array(missing), k)))
+        for pos, rows in computed.items():
+            rows.setflags(write=False)
+            self.cache.put((generation, 'similar', pos, k), rows)
+        return [computed[int(pos)] if rows is None else rows for pos, rows in zip(positions, results)]
+
+    def _similar_positions_many(self, seeds, k):
+        found = self._graph_neighbors(seeds, k)
+        if found is not None:
+            return list(np.array(found[0]))
+        indices, _ = self.index.query(self.X_rec[seeds], min(k + 1, self.X_rec.shape[0]))
+        return [row[row != pos][:k] for row, pos in zip(indices, seeds)]
+
+    def recommend_similar(self, title, k=None, genres=None, rating=None, year_from=None, year_to=None,
+                          match='any', with_rating=False):
+        """
+        Titles most similar to `title`, optionally only those passing the
+        filter_movies constraints (see similar_positions).
+
+        The frame has the title, listed_in and release_year columns, plus
+        rating if `with_rating` is set.
+        """
+        pos = self.title_position(title)
+        if pos is None:
+            return pd.DataFrame()
+        rec_indices = self.similar_positions(pos, k, genres, rating, year_from, year_to, match)
+        columns = RATED_RESULT_COLUMNS if with_rating else RESULT_COLUMNS
+        return self.df.iloc[rec_indices][columns].reset_index(drop=True)
+
+    def query_vector(self, text):
+        """
+        `text` as a unit-length 1 x n_features row of X_rec's feature space.
+
+        The description block is the fitted TF-IDF transform of `text`. The
+        genre block marks the genres that `text` names (see _text_genres),
+        scaled to GENRE_QUERY_WEIGHT of the description block's norm so a
+        genre word cannot outweigh the rest of the query. The year is left
+        at 0; describe_positions re-ranks against the rows without their
+        year. Vectors of recent queries are kept in `query_vectors`, an LRU
+        of QUERY_VECTOR_CACHE entries.
+        """
+        key = (self.generation, text)
+        vector = self.query_vectors.get(key)
+        if vector is None:
+            genre_names = self.filter_index.genre_names
+            genres = self._text_genres(text)
+            weight = GENRE_QUERY_WEIGHT / np.sqrt(len(genres)) if genres else 0
+            genre_row = csr_matrix((np.full(len(genres), weight, dtype=np.float32), genres, [0, len(genres)]),
+                                   shape=(1, len(genre_names)))
+            vector = hstack([csr_matrix((1, 1), dtype=np.float32), genre_row, self.tfidf.transform([text])],
+                            format='csr', dtype=np.float32)
+            vector = normalize(vector, norm='l2', copy=False)
+            self.query_vectors.put(key, vector)
+        return vector
+
+    def _text_genres(self, text):
+        """
+        Genre columns named in `text`: a word marks the genres containing
+        it as a whole word, singular or plural ("thriller" -> "Thrillers",
+        "comedy" -> "Comedies", "Stand-Up Comedy"), unless it is in more
+        than four genres ("movies", "tv").
+        """
+        with self._lock:
+            if self._genre_terms is None:
+                analyzer = self.tfidf.build_analyzer()
+                self._genre_terms = [set(analyzer(name)) for name in self.filter_index.genre_names]
+        columns = set()
+        for term in self.tfidf.build_analyzer()(text):
+            forms = {term, term + 's', term + 'es'}
+            if term.endswith('y'):
+                forms.add(term[:-1] + 'ies')
+            hits = [i for i, words in enumerate(self._genre_terms) if forms & words]
+            if len(hits) <= 4:
+                columns.update(hits)
+        return sorted(columns)
+
+    def describe_positions(self, text, k=None):
+        """
+        Row positions of the k titles closest to the free-text description
+        `text`, best first.
+
+        `query_vector(text)` is searched with the configured backend like a
+        seed row. X_rec rows were normalised with their year included, so
+        the backend's similarity is the content cosine times the row's norm
+        without its year, which varies from row to row. The candidates are
+        therefore re-ranked by the content cosine; starting from
+        DESCRIBE_CANDIDATES times k, more are fetched until no row left out
+        could still rank in the top k. When no word of `text` is in the
+        TF-IDF vocabulary ("heist thriller"), the BM25 full-text search
+        answers instead.
+        """
+        k = k or self.n_neighbors - 1
+
+        def search():
+            vector = self.query_vector(text)
+            if not np.any(vector.indices > len(self.filter_index.genre_names)):
+                return self.text_index.search(text, k)[0]
+            norms = self.content_norms
+            smallest = norms[norms > 0].min()
+            n_rows = self.X_rec.shape[0]
+            n_candidates = min(k * DESCRIBE_CANDIDATES, n_rows)
+            while True:
+                indices, similarities = self.index.query(vector, n_candidates)
+                matched = similarities[0] > 0
+                indices, similarities = indices[0][matched], similarities[0][matched]
+                scores = similarities / norms[indices]
+                order = np.argsort(-scores, kind='stable')[:k]
+                # Rows not fetched score at most the last similarity over the
+                # smallest norm.
+                if (n_candidates == n_rows or len(indices) < n_candidates
+                        or (len(order) == k and scores[order[-1]] >= similarities[-1] / smallest)):
+                    return indices[order]
+                n_candidates = min(n_candidates * 4, n_rows)
+
+        return self._cached(('describe', text, k), search)
+
+    def recommend_for_text(self, text, k=None):
+        """
+        Titles matching a description such as "heist thriller set in Spain".
+        """
+        return self.df.iloc[self.describe_positions(text, k)][RATED_RESULT_COLUMNS].reset_index(drop=True)
+
+    def recommend_many(self, titles, k=None, max_memory_mb=DEFAULT_MAX_MEMORY_MB):
+        """
+        Recommendations for many seed titles in one pass.
+
+        Titles are resolved through the title index in one pass and scored
+        against the whole catalogue in blocks of one sparse product each
+        (bounded by `max_memory_mb`), unless the neighbour graph already
+        covers k. Returns a long-format frame with one row per
+        (seed_title, rank); unknown titles are skipped.
+        """
+        df = self.df
+        k = k or self.n_neighbors - 1
+        titles = np.array(list(titles), dtype=object)
+        positions = self.title_index.lookup_many(titles)
+        found = positions >= 0
+        seeds = positions[found]
+        seed_titles = titles[found]
+
+        found = self._graph_neighbors(seeds, k)
+        if found is not None:
+            neighbors = np.asarray(found[0], dtype=np.int64)
+            scores = np.asarray(found[1], dtype=np.float64)
+        else:
+            neighbors, scores = self._backend_neighbors(seeds, k, max_memory_mb)
+
+        k = neighbors.shape[1]
+        result = df.iloc[neighbors.ravel()][RATED_RESULT_COLUMNS].reset_index(drop=True)
+        result.insert(0, 'seed_title', np.repeat(seed_titles, k))
+        result.insert(1, 'rank', np.tile(np.arange(1, k + 1), len(seeds)))
+        result['similarity'] = scores.ravel()
+        return result
+
+    def profile(self, positions=()):
+        """
+        A WatchlistProfile over X_rec holding the rows at `positions`.
+        """
+        return WatchlistProfile(self.X_rec, positions)
+
+    def profile_positions(self, profile, k=None, exclude=()):
+        """
+        Row positions of the k titles closest to `profile` (a 1 x n_features
+        row, e.g. WatchlistProfile.centroid()), skipping `exclude`.
+        """
+        k = k or self.n_neighbors - 1
+        exclude = np.fromiter(exclude, dtype=np.int64)
+        indices, _ = self.index.query(profile, min(k + len(exclude), self.X_rec.shape[0]))
+        indices = indices[0]
+        return indices[~np.isin(indices, exclude)][:k]
+
+    def _backend_neighbors(self, seeds, k, max_memory_mb):
+        index = self.index
+        X_rec = self.X_rec
+        k = min(k, X_rec.shape[0] - 1)
+        step = block_rows(X_rec.shape[0], max_memory_mb, 1)
+        neighbors = np.empty((len(seeds), k), dtype=np.int64)
+        scores = np.empty((len(seeds), k))
+        for start in range(0, len(seeds), step):
+            block = seeds[start:start + step]
+            top, top_scores = index.query(X_rec[block], k + 1)
+            # Drop the seed itself; stable sort keeps the remaining order.
+            keep = np.argsort(top == block[:, None], axis=1, kind='stable')[:, :k]
+            neighbors[start:start + len(block)] = np.take_along_axis(top, keep, axis=1)
+            scores[start:start + len(block)] = np.take_along_axis(top_scores, keep, axis=1)
+        return neighbors, scores
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Return the process-wide engine shared by the GUI and other callers.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RecommenderEngine()
+        return _engine
+
+
+def filter_movies(genres, rating, year_from, year_to, match='any'):
+    return get_engine().filter_movies(genres, rating, year_from, year_to, match)
+
+
+def find_exact_titles(partial_title):
+    return get_engine().find_exact_titles(partial_title)
+
+
+def find_fuzzy_titles(query, limit=10):
+    return get_engine().find_fuzzy_titles(query, limit)
+
+
+def search_text(query, k=10, boosts=None):
+    return get_engine().search_text(query, k, boosts)
+
+
+def recommend_similar(title, k=None, genres=None, rating=None, year_from=None, year_to=None, match='any',
+                      with_rating=False):
+    return get_engine().recommend_similar(title, k, genres, rating, year_from, year_to, match, with_rating)
+
+
+def recommend_for_text(text, k=None):
+    return get_engine().recommend_for_text(text, k)
+
+
+def recommend_many(titles, k=None):
+    return get_engine().recommend_many(titles, k)
@@ -0,0 +1,281 @@
+"""
+A built engine published in shared memory for worker processes.
+
+The parent builds a `RecommenderEngine` once and calls `publish()`, which
+copies every array behind the query path into a single
+`multiprocessing.shared_memory` block:
+
+- the CSR arrays (data/indices/indptr) of X_rec and of the search index;
+- the filter bitsets, title hash/trigram arrays, full-text postings, the
+  neighbour graph and the positions of removed titles;
+- the content norms used to re-rank free-text matches;
+- the metadata columns results are built from (SHARED_COLUMNS by
+  default), with text stored as UTF-8 bytes plus offsets.
+
+Workers pass the picklable `handle` to `SharedEngine`, which maps numpy
+views onto that block instead of rebuilding or copying anything.
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from ann_index import ExactIndex, LSHIndex
+from filter_index import FilterIndex
+from recommender_engine import RATED_RESULT_COLUMNS, RecommenderEngine
+from text_index import TextIndex
+from title_index import TitleIndex
+
+# Classes whose instances are rebuilt attribute by attribute in workers.
+SHAREABLE = (ExactIndex, LSHIndex, FilterIndex, TitleIndex, TextIndex)
+
+_ALIGN = 64
+# Metadata columns published by default: what query results are built from.
+SHARED_COLUMNS = ['show_id'] + RATED_RESULT_COLUMNS
+
+
+class StringColumn:
+    """
+    Read-only column of strings stored as UTF-8 bytes plus offsets.
+
+    Indexing with an int returns a str (None for missing values); indexing
+    with an array or slice returns an object array.
+    """
+
+    def __init__(self, data, offsets, missing):
+        self.data = data
+        self.offsets = offsets
+        self.missing = missing
+
+    @classmethod
+    def from_values(cls, values):
+        encoded = [v.encode('utf-8', 'surrogatepass') if isinstance(v, str) else b'' for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        missing = np.array([not isinstance(v, str) for v in values], dtype=bool)
+        return cls(data, offsets, missing)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _get(self, i):
+        if self.missing[i]:
+            return None
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8', 'surrogatepass')
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            return self._get(key)
+        if isinstance(key, slice):
+            positions = range(*key.indices(len(self)))
+        else:
+            # Only the requested rows are touched, never the whole column.
+            positions = np.asarray(key)
+            if positions.dtype == bool:
+                positions = np.flatnonzero(positions)
+            positions = positions.astype(np.int64, copy=False)
+            positions = np.where(positions < 0, positions + len(self), positions)
+        out = np.empty(len(positions), dtype=object)
+        out[:] = [self._get(i) for i in positions]
+        return out
+
+    def __iter__(self):
+        return (self._get(i) for i in range(len(self)))
+
+    def tolist(self):
+        return list(self)
+
+
+class SharedModel:
+    """
+    Owner of a published engine's shared memory block.
+
+    Keep it alive for as long as workers use the model, then `close()` it,
+    which also unlinks the block.
+    """
+
+    def __init__(self, state):
+        arrays = []
+        tree = _encode(state, arrays)
+        layout, size = [], 0
+        for array in arrays:
+            size = -(-size // _ALIGN) * _ALIGN
+            layout.append((size, array.dtype.str, array.shape))
+            size += array.nbytes
+        self._shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for array, (offset, dtype, shape) in zip(arrays, layout):
+            np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)[...] = array
+        self.nbytes = size
+        self.handle = {'name': self._shm.name, 'layout': layout, 'tree': tree}
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+
+def publish(engine, columns=SHARED_COLUMNS):
+    """
+    Build `engine` and copy its query-time state into shared memory.
+
+    Of the metadata, only `columns` are published (show_id and listed_in
+    always are); the indexes never read the others.
+    """
+    engine.build()
+    df = engine.df
+    index = engine.index
+    names = list(dict.fromkeys(['show_id', 'listed_in'] + list(columns)))
+    state = {
+        'config': {'n_neighbors': engine.n_neighbors, 'backend': engine.backend,
+                   'max_features': engine.max_features},
+        'columns': {name: df[name].to_numpy() for name in names},
+        'X_rec': engine.X_rec,
+        'content_norms': engine.content_norms,
+        'index': index,
+        'exact_index': engine.exact_index if engine.exact_index is not index else None,
+        'filter_index': engine.filter_index,
+        'title_index': engine.title_index,
+        'text_index': engine.text_index,
+        # Small; pickled into the handle for free-text queries.
+        'tfidf': engine.tfidf,
+        'graph': engine.neighbor_graph,
+        'removed': engine._removed,
+    }
+    return SharedModel(state)
+
+
+def attach(handle):
+    """
+    (shared_memory, state) for a handle from `SharedModel.handle`; arrays
+    in `state` are views into the block, so keep the block open.
+    """
+    shm = shared_memory.SharedMemory(name=handle['name'])
+    arrays = []
+    for offset, dtype, shape in handle['layout']:
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        array.flags.writeable = False
+        arrays.append(array)
+    return shm, _decode(handle['tree'], arrays)
+
+
+class SharedEngine(RecommenderEngine):
+    """
+    Read-only engine serving from a model published by another process.
+
+    Every query-time stage is attached from shared memory, so `build()`
+    does no work. `df` holds only the published columns and is assembled
+    on first access, which copies them; query paths use `column()` instead.
+    """
+
+    def __init__(self, handle, cache_size=256, cache_bytes=64 * 1024 * 1024):
+        self._shm, state = attach(handle)
+        config = state['config']
+        super().__init__(data_path=None, max_features=config['max_features'],
+                         n_neighbors=config['n_neighbors'], snapshot_dir=None, backend=config['backend'],
+                         cache_size=cache_size, cache_bytes=cache_bytes)
+        self._columns = state['columns']
+        self._X_rec = state['X_rec']
+        self._content_norms = state['content_norms']
+        self._index = state['index']
+        self._exact_index = self._index if state['exact_index'] is None else state['exact_index']
+        self._filter_index = state['filter_index']
+        self._title_index = state['title_index']
+        self._text_index = state['text_index']
+        self._tfidf = state['tfidf']
+        self._graph = state['graph']
+        self._graph_checked = True
+        self._removed = state['removed']
+
+    @property
+    def df(self):
+        with self._lock:
+            if self._df is None:
+                df = pd.DataFrame({name: values[:] for name, values in self._columns.items()})
+                df['genres_list'] = df['listed_in'].str.split(', ')
+                self._df = df
+            return self._df
+
+    def column(self, name):
+        return self._columns[name]
+
+    @property
+    def show_id_positions(self):
+        with self._lock:
+            if self._show_id_positions is None:
+                removed = set(self._removed.tolist())
+                self._show_id_positions = {show_id: pos for pos, show_id in enumerate(self._columns['show_id'])
+                                           if pos not in removed}
+            return self._show_id_positions
+
+    def reload(self):
+        raise RuntimeError("A shared engine is read-only; rebuild in the publishing process.")
+
+    def build_neighbor_graph(self, *args, **kwargs):
+        raise RuntimeError("A shared engine is read-only; rebuild in the publishing process.")
+
+    def add_titles(self, rows):
+        raise RuntimeError("A shared engine is read-only; update the publishing process and publish again.")
+
+    def remove_titles(self, show_ids):
+        raise RuntimeError("A shared engine is read-only; update the publishing process and publish again.")
+
+    def refit(self):
+        raise RuntimeError("A shared engine is read-only; rebuild in the publishing process.")
+
+    def close(self):
+        self._shm.close()
+
+
+def _encode(value, arrays):
+    """
+    Picklable description of `value` with its arrays moved to `arrays`.
+    """
+    def ref(array):
+        array = np.ascontiguousarray(array)
+        for i, seen in enumerate(arrays):
+            # X_rec and the exact index share their CSR arrays.
+            if seen is array:
+                return i
+        arrays.append(array)
+        return len(arrays) - 1
+
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            column = StringColumn.from_values(value)
+            return ('strings', ref(column.data), ref(column.offsets), ref(column.missing))
+        return ('array', ref(value))
+    if isinstance(value, csr_matrix) or getattr(value, 'format', None) == 'csr':
+        return ('csr', value.shape, ref(value.data), ref(value.indices), ref(value.indptr))
+    if isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+        return _encode(np.array(value, dtype=object), arrays)
+    if isinstance(value, SHAREABLE):
+        return ('object', type(value), {k: _encode(v, arrays) for k, v in vars(value).items()})
+    if isinstance(value, tuple):
+        return ('tuple', [_encode(v, arrays) for v in value])
+    if isinstance(value, dict):
+        return ('dict', {k: _encode(v, arrays) for k, v in value.items()})
+    return ('value', value)
+
+
+def _decode(node, arrays):
+    kind = node[0]
+    if kind == 'array':
+        return arrays[node[1]]
+    if kind == 'strings':
+        return StringColumn(arrays[node[1]], arrays[node[2]], arrays[node[3]])
+    if kind == 'csr':
+        matrix = csr_matrix(node[1])
+        matrix.data, matrix.indices, matrix.indptr = arrays[node[2]], arrays[node[3]], arrays[node[4]]
+        return matrix
+    if kind == 'object':
+        obj = node[1].__new__(node[1])
+        obj.__dict__.update({k: _decode(v, arrays) for k, v in node[2].items()})
+        return obj
+    if kind == 'tuple':
+        return tuple(_decode(v, arrays) for v in node[1])
+    if kind == 'dict':
+        return {k: _decode(v, arrays) for k, v in node[1].items()}
+    return node[1]
@@ -0,0 +1,291 @@
+"""
+Chunked feature extraction for catalogues too large to load at once.
+
+`ingest()` reads a netflix_titles.csv-shaped file `chunk_rows` rows at a
+time and writes the feature matrix, plus the show_id and title columns,
+straight to disk, so the ingest's memory use depends on the chunk size
+rather than the catalogue size. It runs in two passes:
+
+1. Each chunk is cleaned like `RecommenderEngine.df` (rows missing
+   listed_in, description or rating are dropped, as are rows whose
+   release_year is not a number). The survivors' years, genre codes,
+   rating codes, show_id/title text and hashed term counts of the
+   description are appended to raw files, and document frequencies are
+   summed.
+2. A second pass over those files builds the rows of the feature matrix in
+   the engine's layout (year, genre one-hot, TF-IDF) and appends its CSR
+   arrays to disk. Terms are hashed (`HashingVectorizer`) instead of
+   fitted, so no vocabulary has to be held in memory.
+
+The output directory holds raw arrays plus `meta.json`. `load_features()`
+memory-maps them back as a CSR matrix that ExactIndex, LSHIndex and
+`build_neighbor_graph` accept as is. Those are its only consumers:
+`RecommenderEngine` does not read it and still holds the whole catalogue as
+a DataFrame and fits its model in memory, so serving is not out-of-core;
+the streamed matrix is for building indexes and neighbour graphs offline.
+
+Usage:
+    python streaming_ingest.py --data big.csv --output big_features --chunk-rows 100000
+    python streaming_ingest.py --data big.csv --output big_features --graph-k 20 --max-memory-mb 512
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, hstack
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import row_norms
+
+REQUIRED_COLUMNS = ('listed_in', 'description', 'rating')
+DEFAULT_CHUNK_ROWS = 100000
+DEFAULT_N_FEATURES = 2 ** 18
+META_FILE = 'meta.json'
+
+# Pass-one files that are only needed to build the feature matrix.
+_SCRATCH = ('tf_data', 'tf_indices', 'tf_counts', 'genre_codes', 'genre_counts')
+
+
+class ArrayWriter:
+    """
+    Raw arrays in a directory, each grown by appending chunks.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.arrays = {}
+        self._files = {}
+
+    def append(self, name, values, dtype):
+        values = np.ascontiguousarray(values, dtype=dtype)
+        f = self._files.get(name)
+        if f is None:
+            f = self._files[name] = open(os.path.join(self.directory, f"{name}.bin"), 'wb')
+            self.arrays[name] = [np.dtype(dtype).str, 0]
+        f.write(values.tobytes())
+        self.arrays[name][1] += len(values)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+
+def load_array(directory, name, meta):
+    """
+    Read-only memory map of raw array `name` described in `meta`.
+    """
+    dtype, length = meta['arrays'][name]
+    if length == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(os.path.join(directory, f"{name}.bin"), dtype=dtype, mode='r', shape=(length,))
+
+
+def load_meta(directory):
+    with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_features(directory):
+    """
+    (X, meta): the memory-mapped feature matrix written by ingest().
+    """
+    meta = load_meta(directory)
+    arrays = [load_array(directory, name, meta) for name in ('X_data', 'X_indices', 'X_indptr')]
+    return csr_matrix(tuple(arrays), shape=tuple(meta['shape']), copy=False), meta
+
+
+def load_text(directory, name, meta, positions):
+    """
+    Strings of text column `name` (show_id or title) at row `positions`.
+    """
+    data = load_array(directory, f"{name}_data", meta)
+    offsets = load_array(directory, f"{name}_offsets", meta)
+    missing = load_array(directory, f"{name}_missing", meta)
+    return [None if missing[p] else data[offsets[p]:offsets[p + 1]].tobytes().decode('utf-8', 'surrogatepass')
+            for p in positions]
+
+
+def clean_chunk(chunk):
+    """
+    (kept rows, {reason: rows dropped}) for one chunk of the CSV.
+    """
+    missing = chunk[list(REQUIRED_COLUMNS)].isna().any(axis=1)
+    year = pd.to_numeric(chunk['release_year'], errors='coerce')
+    bad_year = year.isna() & ~missing
+    kept = chunk[~missing & ~bad_year].copy()
+    kept['release_year'] = year[kept.index].astype(np.int16)
+    return kept, {'missing_required': int(missing.sum()), 'bad_release_year': int(bad_year.sum())}
+
+
+def ingest(data_path, directory, chunk_rows=DEFAULT_CHUNK_ROWS, n_features=DEFAULT_N_FEATURES):
+    """
+    Stream `data_path` into a feature matrix (and the show_id and title
+    columns) under `directory`; returns the metadata written to meta.json.
+    """
+    os.makedirs(directory, exist_ok=True)
+    writer = ArrayWriter(directory)
+    hasher = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None, dtype=np.float32)
+    genre_codes, rating_codes = {}, {}
+    doc_freq = np.zeros(n_features, dtype=np.int64)
+    counts = {'rows_read': 0, 'rows_kept': 0, 'missing_required': 0, 'bad_release_year': 0}
+    timings = {}
+
+    start = time.perf_counter()
+    text_ends = {'show_id': 0, 'title': 0}
+    for name in text_ends:
+        writer.append(f"{name}_offsets", [0], np.int64)
+    reader = pd.read_csv(data_path, chunksize=chunk_rows, dtype=str, keep_default_na=True)
+    try:
+        for chunk in reader:
+            counts['rows_read'] += len(chunk)
+            kept, dropped = clean_chunk(chunk)
+            for reason, n in dropped.items():
+                counts[reason] += n
+            counts['rows_kept'] += len(kept)
+            if kept.empty:
+                continue
+
+            # Chunks keep the reader's running index: the row number in the CSV.
+            writer.append('source_rows', kept.index.to_numpy(), np.int64)
+            writer.append('release_year', kept['release_year'].to_numpy(), np.int16)
+            writer.append('rating', [rating_codes.setdefault(r, len(rating_codes)) for r in kept['rating']], np.int16)
+
+            genres = kept['listed_in'].str.split(', ').tolist()
+            writer.append('genre_counts', [len(g) for g in genres], np.int32)
+            writer.append('genre_codes', [genre_codes.setdefault(g, len(genre_codes)) for row in genres for g in row],
+                          np.int32)
+
+            tf = hasher.transform(kept['description'].tolist())
+            tf.sum_duplicates()
+            doc_freq += np.bincount(tf.indices, minlength=n_features)
+            writer.append('tf_data', tf.data, np.float32)
+            writer.append('tf_indices', tf.indices, np.int32)
+            writer.append('tf_counts', np.diff(tf.indptr), np.int32)
+
+            for name in text_ends:
+                values = kept[name].tolist()
+                encoded = [v.encode('utf-8', 'surrogatepass') if isinstance(v, str) else b'' for v in values]
+                ends = text_ends[name] + np.cumsum([len(b) for b in encoded], dtype=np.int64)
+                writer.append(f"{name}_offsets", ends, np.int64)
+                writer.append(f"{name}_data", np.frombuffer(b''.join(encoded), dtype=np.uint8), np.uint8)
+                writer.append(f"{name}_missing", [not isinstance(v, str) for v in values], bool)
+                text_ends[name] = int(ends[-1])
+    finally:
+        writer.close()
+    timings['read'] = time.perf_counter() - start
+
+    n_rows = counts['rows_kept']
+    genre_names = sorted(genre_codes)
+    meta = {'arrays': writer.arrays}
+
+    start = time.perf_counter()
+    # Smoothed idf, as TfidfVectorizer computes it.
+    idf = (np.log((1 + n_rows) / (1 + doc_freq)) + 1).astype(np.float32)
+    # Genre codes were handed out in order of appearance; the engine's
+    # columns follow the sorted names, as MultiLabelBinarizer orders them.
+    remap = np.empty(len(genre_names), dtype=np.int32)
+    for new, name in enumerate(genre_names):
+        remap[genre_codes[name]] = new
+    n_columns = 1 + len(genre_names) + n_features
+    _write_features(directory, meta, writer, n_rows, chunk_rows, idf, remap, n_columns)
+    timings['features'] = time.perf_counter() - start
+
+    for name in _SCRATCH:
+        meta['arrays'].pop(name, None)
+        path = os.path.join(directory, f"{name}.bin")
+        if os.path.exists(path):
+            os.remove(path)
+
+    meta.update({
+        'source': os.path.abspath(data_path),
+        'shape': [n_rows, n_columns],
+        'n_features': n_features,
+        'genres': genre_names,
+        'ratings': sorted(rating_codes, key=rating_codes.get),
+        'counts': counts,
+        'timings': timings,
+    })
+    with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return meta
+
+
+def _write_features(directory, meta, writer, n_rows, chunk_rows, idf, remap, n_columns):
+    """
+    Second pass: feature-matrix rows from the pass-one files, chunk by chunk.
+    """
+    years = load_array(directory, 'release_year', meta)
+    tf_counts = load_array(directory, 'tf_counts', meta)
+    tf_data = load_array(directory, 'tf_data', meta)
+    tf_indices = load_array(directory, 'tf_indices', meta)
+    genre_counts = load_array(directory, 'genre_counts', meta)
+    genre_codes = load_array(directory, 'genre_codes', meta)
+    n_genres = len(remap)
+
+    writer.append('X_indptr', [0], np.int64)
+    nnz = tf_at = genre_at = 0
+    for start in range(0, n_rows, chunk_rows):
+        stop = min(start + chunk_rows, n_rows)
+        tf_indptr = np.r_[0, np.cumsum(tf_counts[start:stop], dtype=np.int64)]
+        tf = csr_matrix((tf_data[tf_at:tf_at + tf_indptr[-1]], tf_indices[tf_at:tf_at + tf_indptr[-1]], tf_indptr),
+                        shape=(stop - start, len(idf)))
+        tf_at += int(tf_indptr[-1])
+        tfidf = normalize(tf.multiply(idf).tocsr(), norm='l2', copy=False)
+
+        genre_indptr = np.r_[0, np.cumsum(genre_counts[start:stop], dtype=np.int64)]
+        codes = remap[genre_codes[genre_at:genre_at + genre_indptr[-1]]]
+        genre_at += int(genre_indptr[-1])
+        genres = csr_matrix((np.ones(len(codes), dtype=np.float32), codes, genre_indptr),
+                            shape=(stop - start, n_genres))
+        genres.sum_duplicates()
+        genres.data[:] = 1
+
+        year = csr_matrix(np.asarray(years[start:stop], dtype=np.float32).reshape(-1, 1))
+        X = hstack([year, genres, tfidf], format='csr', dtype=np.float32)
+        writer.append('row_norms', row_norms(X), np.float32)
+        X = normalize(X, norm='l2', copy=False)
+        writer.append('X_data', X.data, np.float32)
+        writer.append('X_indices', X.indices, np.int32)
+        writer.append('X_indptr', nnz + X.indptr[1:], np.int64)
+        nnz += X.nnz
+    writer.close()
+
+
+def main():
+    from neighbor_graph import DEFAULT_MAX_MEMORY_MB, build_neighbor_graph
+    from recommender_engine import DATA_PATH
+
+    parser = argparse.ArgumentParser(description="Stream a catalogue CSV into an on-disk feature matrix.")
+    parser.add_argument('--data', default=DATA_PATH, help="catalogue CSV (default: the bundled one)")
+    parser.add_argument('--output', required=True, help="directory for the feature files")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="rows read and encoded at a time (default %(default)s)")
+    parser.add_argument('--n-features', type=int, default=DEFAULT_N_FEATURES,
+                        help="hashed description features (default %(default)s)")
+    parser.add_argument('--graph-k', type=int, help="also store each row's top-k neighbours")
+    parser.add_argument('--max-memory-mb', type=int, default=DEFAULT_MAX_MEMORY_MB,
+                        help="scratch memory for the neighbour graph (default %(default)s)")
+    args = parser.parse_args()
+
+    meta = ingest(args.data, args.output, args.chunk_rows, args.n_features)
+    counts = meta['counts']
+    print(f"Kept {counts['rows_kept']} of {counts['rows_read']} rows "
+          f"({counts['missing_required']} missing listed_in/description/rating, "
+          f"{counts['bad_release_year']} with an invalid release_year); "
+          f"feature matrix {meta['shape'][0]} x {meta['shape'][1]} in {args.output}")
+
+    if args.graph_k:
+        X, _ = load_features(args.output)
+        start = time.perf_counter()
+        indices, similarities = build_neighbor_graph(X, args.graph_k, args.max_memory_mb)
+        np.save(os.path.join(args.output, 'graph_indices.npy'), indices)
+        np.save(os.path.join(args.output, 'graph_similarities.npy'), similarities)
+        print(f"Neighbour graph (k={indices.shape[1]}) built in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Synthetic catalogues shaped like netflix_titles.csv, at any size.
+
+`CatalogueModel.fit()` learns the empirical distributions of the real
+file:
+
+- `type`, and per type the `listed_in` genre combinations, `rating`,
+  `release_year`, `duration`, director (or none) and the number of cast
+  members;
+- `country` and `date_added`, and the pools of cast and director names;
+- title and description lengths in words, the title vocabulary, and the
+  description vocabulary overall and per primary (first listed) genre, so
+  descriptions of the same genre share words the way real ones do.
+
+`generate()` streams rows in chunks of column lists, so memory stays
+bounded by the chunk size however many rows are written. Chunk `i` is
+drawn from its own generator seeded with (seed, i): the same seed always
+gives the same catalogue, and shards can be written independently.
+
+Usage:
+    python synthetic_catalogue.py --rows 1000000 --output catalogue_1m.csv
+    python synthetic_catalogue.py --rows 10000000 --shard-rows 1000000 --output shards/catalogue.csv
+"""
+import argparse
+import csv
+import os
+from collections import Counter
+
+import numpy as np
+
+COLUMNS = ['show_id', 'type', 'title', 'director', 'cast', 'country', 'date_added',
+           'release_year', 'rating', 'duration', 'listed_in', 'description']
+CHUNK_ROWS = 100000
+
+# Share of description words drawn from the row's primary genre vocabulary.
+GENRE_WORD_SHARE = 0.5
+
+
+class Empirical:
+    """
+    Distribution of observed values, sampled in proportion to their counts.
+    """
+
+    def __init__(self, values):
+        counts = Counter(values)
+        self.values = np.empty(len(counts), dtype=object)
+        self.values[:] = list(counts)
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        self.cdf = np.cumsum(weights) / weights.sum()
+
+    def sample_index(self, rng, n):
+        return np.minimum(np.searchsorted(self.cdf, rng.random(n), side='right'), len(self.cdf) - 1)
+
+    def sample(self, rng, n):
+        return self.values[self.sample_index(rng, n)]
+
+
+class Conditional:
+    """
+    One Empirical per value of a conditioning column.
+    """
+
+    def __init__(self, keys, values):
+        groups = {}
+        for key, value in zip(keys, values):
+            groups.setdefault(key, []).append(value)
+        self.by_key = {key: Empirical(group) for key, group in groups.items()}
+
+    def sample(self, rng, keys):
+        out = np.empty(len(keys), dtype=object)
+        for key, dist in self.by_key.items():
+            rows = np.flatnonzero(keys == key)
+            if len(rows):
+                out[rows] = dist.sample(rng, len(rows))
+        return out
+
+
+class CatalogueModel:
+    """
+    Column distributions of a catalogue CSV (see the module docstring).
+    """
+
+    @classmethod
+    def fit(cls, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = [row for row in csv.DictReader(f) if row['listed_in'] and row['description']]
+        model = cls()
+        types = [row['type'] for row in rows]
+        model.type = Empirical(types)
+        model.listed_in = Conditional(types, [row['listed_in'] for row in rows])
+        model.rating = Conditional(types, [row['rating'] or None for row in rows])
+        model.release_year = Conditional(types, [int(row['release_year']) for row in rows])
+        model.duration = Conditional(types, [row['duration'] or None for row in rows])
+        model.director = Conditional(types, [row['director'] or None for row in rows])
+        model.cast_size = Conditional(types, [len(_names(row['cast'])) for row in rows])
+        model.country = Empirical([row['country'] or None for row in rows])
+        model.date_added = Empirical([row['date_added'].strip() or None for row in rows])
+        model.cast_names = Empirical([name for row in rows for name in _names(row['cast'])])
+
+        titles = [row['title'].split() for row in rows]
+        model.title_length = Empirical([max(1, len(words)) for words in titles])
+        model.title_words = Empirical([word for words in titles for word in words])
+
+        descriptions = [row['description'].split() for row in rows]
+        model.description_length = Empirical([len(words) for words in descriptions])
+        model.description_words = Empirical([word for words in descriptions for word in words])
+        word_ids = {word: i for i, word in enumerate(model.description_words.values)}
+        by_genre = {}
+        for row, words in zip(rows, descriptions):
+            genre = row['listed_in'].split(', ')[0]
+            by_genre.setdefault(genre, []).extend(word_ids[word] for word in words)
+        model.genre_words = {genre: Empirical(ids) for genre, ids in by_genre.items()}
+        return model
+
+    def sample(self, rng, start, n):
+        """
+        Columns (dict of lists) of `n` rows numbered from `start`.
+        """
+        types = self.type.sample(rng, n)
+        listed_in = self.listed_in.sample(rng, types)
+        cast_size = self.cast_size.sample(rng, types).astype(np.int64)
+        return {
+            'show_id': [f"g{i}" for i in range(start + 1, start + n + 1)],
+            'type': types.tolist(),
+            'title': self._titles(rng, n),
+            'director': self.director.sample(rng, types).tolist(),
+            'cast': self._cast(rng, cast_size),
+            'country': self.country.sample(rng, n).tolist(),
+            'date_added': self.date_added.sample(rng, n).tolist(),
+            'release_year': self.release_year.sample(rng, types).tolist(),
+            'rating': self.rating.sample(rng, types).tolist(),
+            'duration': self.duration.sample(rng, types).tolist(),
+            'listed_in': listed_in.tolist(),
+            'description': self._descriptions(rng, listed_in),
+        }
+
+    def _titles(self, rng, n):
+        lengths = self.title_length.sample(rng, n).astype(np.int64)
+        words = self.title_words.sample(rng, int(lengths.sum()))
+        return _join(words, lengths)
+
+    def _cast(self, rng, sizes):
+        names = self.cast_names.sample(rng, int(sizes.sum()))
+        return [text or None for text in _join(names, sizes, ', ')]
+
+    def _descriptions(self, rng, listed_in):
+        lengths = self.description_length.sample(rng, len(listed_in)).astype(np.int64)
+        ids = self.description_words.sample_index(rng, int(lengths.sum()))
+        # Replace a share of the words with ones from the primary genre.
+        row_of = np.repeat(np.arange(len(listed_in)), lengths)
+        from_genre = rng.random(len(ids)) < GENRE_WORD_SHARE
+        genres = list(self.genre_words)
+        codes = {genre: i for i, genre in enumerate(genres)}
+        primary = np.array([codes.get(combo.split(', ')[0], -1) for combo in listed_in], dtype=np.int64)
+        slots = np.flatnonzero(from_genre)
+        slot_genres = primary[row_of[slots]]
+        order = np.argsort(slot_genres, kind='stable')
+        bounds = np.searchsorted(slot_genres[order], np.arange(len(genres) + 1))
+        for i, genre in enumerate(genres):
+            chosen = slots[order[bounds[i]:bounds[i + 1]]]
+            if len(chosen):
+                ids[chosen] = self.genre_words[genre].sample(rng, len(chosen))
+        texts = _join(self.description_words.values[ids], lengths)
+        return [text[:1].upper() + text[1:] + ('' if text.endswith(('.', '!', '?')) else '.') for text in texts]
+
+
+def _names(cast):
+    return [name.strip() for name in cast.split(',') if name.strip()]
+
+
+def _join(words, lengths, sep=' '):
+    ends = np.cumsum(lengths)
+    words = words.tolist()
+    return [sep.join(words[end - length:end]) for end, length in zip(ends.tolist(), lengths.tolist())]
+
+
+def generate(model, rows, seed=0, chunk_rows=CHUNK_ROWS, first_chunk=0):
+    """
+    Yield `rows` rows as column dicts of at most `chunk_rows` rows each.
+
+    `first_chunk` skips that many chunks' worth of rows, so shards of one
+    catalogue can be generated separately.
+    """
+    for chunk, start in enumerate(range(0, rows, chunk_rows), first_chunk):
+        rng = np.random.default_rng([seed, chunk])
+        yield model.sample(rng, chunk * chunk_rows, min(chunk_rows, rows - start))
+
+
+def write_csv(path, chunks):
+    """
+    Write streamed column chunks to `path` via a temporary file.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for columns in chunks:
+            writer.writerows(zip(*(columns[name] for name in COLUMNS)))
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_catalogue(path, rows, seed=0, source=None, shard_rows=None, chunk_rows=CHUNK_ROWS):
+    """
+    Generate a `rows`-row catalogue learned from `source` into `path`, or
+    into `path` shards of `shard_rows` rows (a multiple of `chunk_rows`)
+    named like `name_00000.csv`. Returns the written paths.
+    """
+    from recommender_engine import DATA_PATH
+
+    model = CatalogueModel.fit(source or DATA_PATH)
+    if not shard_rows:
+        return [write_csv(path, generate(model, rows, seed, chunk_rows))]
+    if shard_rows % chunk_rows:
+        raise ValueError("shard_rows must be a multiple of chunk_rows.")
+    stem, ext = os.path.splitext(path)
+    paths = []
+    for shard, start in enumerate(range(0, rows, shard_rows)):
+        chunks = generate(model, min(shard_rows, rows - start), seed, chunk_rows, start // chunk_rows)
+        paths.append(write_csv(f"{stem}_{shard:05d}{ext or '.csv'}", chunks))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic catalogue learned from netflix_titles.csv.")
+    parser.add_argument('--rows', type=int, required=True, help="rows to generate")
+    parser.add_argument('--output', required=True, help="CSV path (the name pattern with --shard-rows)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--source', help="catalogue CSV to learn from (default: the bundled one)")
+    parser.add_argument('--shard-rows', type=int, help="split the output into files of this many rows")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS,
+                        help="rows generated at a time; bounds memory (default %(default)s)")
+    args = parser.parse_args()
+
+    directory = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(directory, exist_ok=True)
+    paths = write_catalogue(args.output, args.rows, args.seed, args.source, args.shard_rows, args.chunk_rows)
+    print(f"Wrote {args.rows} rows to {len(paths)} file(s): {', '.join(paths)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix, hstack, random as sparse_random
+from sklearn.preprocessing import normalize
+
+import ann_index
+from ann_index import ExactIndex, LSHIndex, cosine_scores, leading_column, make_index, recall_at_k, rest_norms, top_k
+
+
+def catalogue(n_rows, seed, dtype=np.float32):
+    """
+    Unit rows shaped like X_rec: a raw release year in column 0 next to
+    small genre and TF-IDF weights.
+    """
+    rng = np.random.default_rng(seed)
+    years = rng.integers(1950, 2022, size=n_rows).astype(np.float64)
+    features = sparse_random(n_rows, 40, density=0.2, random_state=seed, format='csr')
+    X = hstack([csr_matrix(years[:, None]), features], format='csr')
+    return normalize(X).astype(dtype)
+
+
+def clustered(n_rows, seed):
+    """
+    Sparse unit rows scattered around 20 centres, where neighbours are
+    well separated from the rest as in a real catalogue.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.random((20, 60)) * (rng.random((20, 60)) < 0.3)
+    noise = 0.3 * rng.random((n_rows, 60)) * (rng.random((n_rows, 60)) < 0.1)
+    return normalize(csr_matrix(centres[rng.integers(0, 20, n_rows)] + noise)).astype(np.float32)
+
+
+def test_exact_query_matches_brute_force():
+    X = catalogue(300, seed=0)
+    query = catalogue(4, seed=1)
+    positions, scores = ExactIndex().fit(X).query(query, 10)
+    expected = (query.astype(np.float64) @ X.astype(np.float64).T).toarray()
+    for row in range(4):
+        np.testing.assert_allclose(scores[row], np.sort(expected[row])[::-1][:10], rtol=1e-6)
+        np.testing.assert_allclose(expected[row, positions[row]], scores[row], rtol=1e-6)
+
+
+def test_pair_scores_equal_scores():
+    X = catalogue(300, seed=2)
+    query = catalogue(3, seed=3)
+    index = ExactIndex().fit(X)
+    query_of = np.repeat(np.arange(3), 50)
+    positions = np.random.default_rng(0).integers(0, 300, size=150)
+    np.testing.assert_allclose(index.pair_scores(query, query_of, positions),
+                               index.scores(query)[query_of, positions], rtol=1e-12)
+
+
+def test_lsh_recall_and_exact_scores():
+    X = clustered(3000, seed=4)
+    query = X[:100]
+    exact = ExactIndex().fit(X)
+    lsh = LSHIndex().fit(X)
+    assert recall_at_k(lsh, exact, query, 10) > 0.9
+    positions, scores = lsh.query(query, 10)
+    np.testing.assert_allclose(scores, exact.scores(query)[np.arange(100)[:, None], positions], rtol=1e-6)
+    assert np.all(np.diff(scores, axis=1) <= 0)
+    assert len(lsh.candidates(query[:1])) < X.shape[0]
+
+
+def test_lsh_blocks_match_one_pass(monkeypatch):
+    X = clustered(1000, seed=5)
+    lsh = LSHIndex(n_tables=8).fit(X)
+    whole = lsh.query(X[:40], 5)
+    monkeypatch.setattr('ann_index.QUERY_BLOCK_BYTES', 4096)
+    blocked = lsh.query(X[:40], 5)
+    np.testing.assert_array_equal(blocked[0], whole[0])
+    np.testing.assert_allclose(blocked[1], whole[1])
+
+
+def test_lsh_leaves_out_removed_rows_and_fills_k():
+    X = clustered(500, seed=6)
+    lsh = LSHIndex(n_tables=2, n_bits=12, probe_radius=0).fit(X)
+    pruned = lsh.without([0, 1, 2])
+    positions, _ = pruned.query(X[:5], 20)
+    assert not np.isin(positions, [0, 1, 2]).any()
+    # Far more than any bucket holds: answered by exact search.
+    positions, _ = lsh.query(X[:2], 400)
+    assert all(len(set(row)) == 400 for row in positions.tolist())
+
+
+def test_default_bits_follow_the_catalogue_size():
+    assert ann_index.default_bits(8800) == 12
+    assert ann_index.default_bits(200000) == 17
+    assert ann_index.default_bits(10) == 8
+    assert LSHIndex(n_bits=10).fit(clustered(200, seed=7))._bits == 10
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        make_index('annoy')
+
+
+def test_leading_column_recovers_float64_precision():
+    X64 = catalogue(500, seed=0, dtype=np.float64)
+    X32 = X64.astype(np.float32)
+    head = leading_column(X32)
+    assert head is not None and head.dtype == np.float64
+    # float32 rounding of the raw column is ~1e-8; the recomputed one is
+    # exact up to the (float32) rest of the row.
+    assert np.max(np.abs(head - X64[:, 0].toarray().ravel())) < 1e-12
+
+    query = X64[:5]
+    exact = (query @ X64.T).toarray()
+    corrected = cosine_scores(query.astype(np.float32), X32, head)
+    plain = cosine_scores(query.astype(np.float32), X32)
+    assert np.max(np.abs(corrected - exact)) < 1e-9
+    assert np.max(np.abs(corrected - exact)) < np.max(np.abs(plain - exact)) / 100
+    for row in range(len(exact)):
+        order = np.argsort(-exact[row], kind='stable')[:20]
+        np.testing.assert_array_equal(top_k(corrected[row:row + 1], 20)[0][0], order)
+
+
+def test_leading_column_requires_a_dominant_column():
+    assert leading_column(normalize(sparse_random(50, 10, density=0.5, random_state=1, format='csr'))) is None
+
+
+def test_leading_column_blocks_match_one_pass(monkeypatch):
+    X = catalogue(300, seed=2)
+    whole = leading_column(X)
+    monkeypatch.setattr('ann_index.LEADING_BLOCK_ROWS', 7)
+    np.testing.assert_array_equal(leading_column(X), whole)
+
+
+def test_rest_norms_leave_out_column_zero():
+    X = catalogue(200, seed=3)
+    rest = X[:, 1:].astype(np.float64)
+    expected = np.sqrt(np.asarray(rest.multiply(rest).sum(axis=1)).ravel())
+    np.testing.assert_allclose(rest_norms(X), expected, rtol=1e-12)
+
+
+def test_extended_matches_a_fresh_fit_and_without_scores_minus_inf():
+    X = catalogue(300, seed=4)
+    query = catalogue(3, seed=5)
+    extended = ExactIndex().fit(X[:200]).extended(X)
+    fresh = ExactIndex().fit(X)
+    np.testing.assert_array_equal(extended.scores(query), fresh.scores(query))
+
+    pruned = fresh.without([0, 250])
+    scores = pruned.scores(query)
+    assert np.all(scores[:, [0, 250]] == -np.inf)
+    assert np.isfinite(fresh.scores(query)).all()
+    assert not np.isin(pruned.query(query, 298)[0], [0, 250]).any()
+    subset = pruned.scores(query, np.array([0, 1, 250]))
+    assert np.all(subset[:, [0, 2]] == -np.inf) and np.isfinite(subset[:, 1]).all()
+    # Tombstones survive later extensions.
+    assert np.all(pruned.extended(catalogue(310, seed=4)).scores(query)[:, [0, 250]] == -np.inf)
@@ -0,0 +1,32 @@
+import copy
+
+from benchmark import compare, metrics, run_size
+
+
+def result(cold=1.0, p99_ms=2.0, rss=500.0):
+    latency = {'p50_ms': 1.0, 'p99_ms': p99_ms, 'n': 10}
+    return {
+        'cold_start_s': cold, 'warm_start_s': 0.2, 'peak_rss_mb': rss,
+        'stages_s': {'tfidf': 0.5},
+        'latency': {'filter_movies': dict(latency), 'recommend_similar': dict(latency)},
+    }
+
+
+def test_compare_reports_only_regressions_beyond_the_threshold():
+    baseline = {'sizes': {'8807': result(), '100000': result()}}
+    current = copy.deepcopy(baseline)
+    current['sizes']['8807'] = result(cold=1.5, p99_ms=2.1, rss=510.0)
+    current['sizes']['500'] = result(cold=99.0)
+    assert compare(baseline, current, 0.2) == [('8807', 'cold_start_s', 1.0, 1.5)]
+    # Faster is never a regression; tiny absolute changes are noise.
+    current['sizes']['8807'] = result(cold=0.5, p99_ms=2.9)
+    assert compare(baseline, current, 0.2) == []
+    assert set(metrics(result())) >= {'cold_start_s', 'stage.tfidf_s', 'recommend_similar.p99_s'}
+
+
+def test_run_size_reports_every_operation(catalogue_csv):
+    measured = run_size(catalogue_csv, queries=5, seed=0)
+    assert measured['rows'] == 300
+    assert set(measured['latency']) == {'filter_movies', 'find_exact_titles', 'recommend_similar'}
+    assert all(summary['n'] == 5 for summary in measured['latency'].values())
+    assert 'snapshot' in measured['warm_stages_s'] and measured['peak_rss_mb'] > 0
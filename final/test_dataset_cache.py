@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from dataset_cache import decode_text, encode_text, genre_rows
+from recommender_engine import RecommenderEngine
+
+
+def values(column):
+    return [None if not isinstance(v, list) and pd.isna(v) else v for v in column.astype(object)]
+
+
+def test_text_round_trip_keeps_missing_values():
+    values = np.array(['plain', None, 'naïve café', '', np.nan, '日本'], dtype=object)
+    decoded = decode_text(*encode_text(values))
+    assert decoded[[0, 2, 3, 5]].tolist() == ['plain', 'naïve café', '', '日本']
+    assert pd.isna(decoded[1]) and pd.isna(decoded[4])
+
+
+def test_genre_rows_keep_order_and_drop_duplicates():
+    codes, offsets, names = genre_rows([['Dramas', 'Comedies'], [], ['Dramas', 'Dramas']])
+    assert names == ['Comedies', 'Dramas']
+    assert codes.tolist() == [1, 0, 1] and offsets.tolist() == [0, 2, 2, 3]
+
+
+def test_cached_dataset_matches_the_parsed_csv(catalogue_csv, tmp_path):
+    root = str(tmp_path / 'cache')
+    parsed = RecommenderEngine(catalogue_csv, snapshot_dir=root)
+    parsed.build()
+    cached = RecommenderEngine(catalogue_csv, snapshot_dir=root)
+    df = cached.df
+    assert 'dataset' in cached.timings and 'dataset_save' not in cached.timings
+    expected = parsed.df
+    assert df.index.tolist() == expected.index.tolist() and list(df.columns) == list(expected.columns)
+    for name in expected.columns:
+        assert values(df[name]) == values(expected[name]), name
+    assert df['release_year'].dtype == np.int16 and isinstance(df['rating'].dtype, pd.CategoricalDtype)
+    title = expected['title'].iloc[5]
+    assert cached.recommend_similar(title)['title'].tolist() == parsed.recommend_similar(title)['title'].tolist()
@@ -0,0 +1,71 @@
+import itertools
+
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+
+from filter_index import FilterIndex
+
+GENRES = ['Dramas', 'Comedies', 'Documentaries', 'Thrillers']
+RATINGS = ['TV-MA', 'PG', 'R']
+
+
+def make_catalogue(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    genre_ohe = rng.random((n_rows, len(GENRES))) < 0.3
+    ratings = rng.choice(RATINGS + [None], size=n_rows).astype(object)
+    years = rng.integers(1990, 2021, size=n_rows)
+    return genre_ohe, ratings, years
+
+
+def reference(genre_ohe, ratings, years, genres, rating, year_from, year_to, match):
+    keep = np.ones(len(years), dtype=bool)
+    if genres:
+        known = [GENRES.index(g) for g in genres if g in GENRES]
+        if match == 'all':
+            keep &= genre_ohe[:, known].all(axis=1) & (len(known) == len(set(genres)))
+        else:
+            keep &= genre_ohe[:, known].any(axis=1)
+    if rating:
+        keep &= ratings == rating
+    if year_from is not None:
+        keep &= years >= year_from
+    if year_to is not None:
+        keep &= years <= year_to
+    return np.flatnonzero(keep)
+
+
+def test_filters_match_a_row_scan():
+    # 1001 rows, so the last packed byte is partly padding.
+    genre_ohe, ratings, years = make_catalogue(1001, seed=0)
+    index = FilterIndex(csr_matrix(genre_ohe), GENRES, ratings, years)
+    genre_sets = [None, ['Dramas'], ['Dramas', 'Comedies'], ['Thrillers', 'Unknown'], ['Unknown']]
+    for genres, rating, (year_from, year_to), match in itertools.product(
+            genre_sets, [None, 'PG', 'NC-17'], [(None, None), (2000, 2010), (1950, 1989), (2020, None), (None, 1990)],
+            ['any', 'all']):
+        expected = reference(genre_ohe, ratings, years, genres, rating, year_from, year_to, match)
+        actual = index.positions(genres, rating, year_from, year_to, match=match)
+        assert actual.tolist() == expected.tolist(), (genres, rating, year_from, year_to, match)
+
+
+def test_dense_genre_matrix_and_bad_match():
+    genre_ohe, ratings, years = make_catalogue(64, seed=1)
+    dense = FilterIndex(genre_ohe.astype(np.uint8), GENRES, ratings, years)
+    sparse = FilterIndex(csr_matrix(genre_ohe), GENRES, ratings, years)
+    assert np.array_equal(dense.mask(['Comedies']), sparse.mask(['Comedies']))
+    with pytest.raises(ValueError):
+        dense.mask(['Comedies'], match='some')
+
+
+def test_extended_and_without_match_a_fresh_index():
+    genre_ohe, ratings, years = make_catalogue(300, seed=2)
+    ratings[250:] = 'NC-17'
+    base = FilterIndex(csr_matrix(genre_ohe[:203]), GENRES, ratings[:203], years[:203])
+    extended = base.extended(csr_matrix(genre_ohe[203:]), ratings[203:], years[203:])
+    fresh = FilterIndex(csr_matrix(genre_ohe), GENRES, ratings, years)
+    for args in [(['Dramas'], None, None, None), (None, 'NC-17', None, None), (None, None, 2000, 2005),
+                 (['Comedies', 'Thrillers'], 'PG', 1995, None)]:
+        assert extended.positions(*args).tolist() == fresh.positions(*args).tolist()
+    pruned = extended.without([0, 210, 299])
+    assert not {0, 210, 299} & set(pruned.positions().tolist())
+    assert len(pruned.positions()) == 297 and len(extended.positions()) == 300
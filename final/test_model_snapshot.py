@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+
+from model_snapshot import file_hash, load_snapshot, save_snapshot, snapshot_key
+from recommender_engine import RecommenderEngine
+from title_index import TitleIndex
+
+
+def test_round_trip_is_memory_mapped(tmp_path):
+    root = str(tmp_path)
+    arrays = {'a': np.arange(10, dtype=np.int32), 'b': np.ones((3, 2))}
+    save_snapshot(root, 'key', arrays, {'shape': [3, 2]})
+    loaded, meta = load_snapshot(root, 'key')
+    assert meta['shape'] == [3, 2]
+    assert isinstance(loaded['a'], np.memmap) and not loaded['a'].flags.writeable
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(loaded[name], array)
+    assert load_snapshot(root, 'missing') is None
+
+
+def test_key_follows_contents_and_config(tmp_path):
+    path = tmp_path / 'a.csv'
+    path.write_text('x\n1\n')
+    first = snapshot_key(file_hash(str(path)), {'max_features': 500})
+    assert snapshot_key(file_hash(str(path)), {'max_features': 500}) == first
+    assert snapshot_key(file_hash(str(path)), {'max_features': 400}) != first
+    path.write_text('x\n2\n')
+    assert snapshot_key(file_hash(str(path)), {'max_features': 500}) != first
+
+
+def test_warm_start_restores_the_fitted_model(catalogue_csv, tmp_path):
+    root = str(tmp_path / 'snapshots')
+    cold = RecommenderEngine(catalogue_csv, snapshot_dir=root)
+    cold.build()
+    warm = RecommenderEngine(catalogue_csv, snapshot_dir=root)
+    timings = warm.build()
+    assert 'snapshot' in timings and 'tfidf' not in timings and 'features' not in timings
+    assert (warm.X_rec != cold.X_rec).nnz == 0
+    assert list(warm.mlb.classes_) == list(cold.mlb.classes_)
+    assert warm.tfidf.vocabulary_ == cold.tfidf.vocabulary_
+
+    # The title index is mapped from the snapshot, not rebuilt.
+    assert isinstance(warm.title_index._gram_rows, np.memmap)
+    fresh = TitleIndex(cold.df['title'].to_numpy())
+    for query in ['a', 'lo', 'love', 'the']:
+        np.testing.assert_array_equal(warm.title_index.search(query), fresh.search(query))
+    title = cold.df['title'].iloc[7]
+    assert warm.title_position(title) == cold.title_position(title) == 7
+    assert warm.recommend_similar(title)['title'].tolist() == cold.recommend_similar(title)['title'].tolist()
+
+
+def test_changed_csv_rebuilds_and_prunes_the_old_snapshot(catalogue_csv, tmp_path):
+    root = str(tmp_path / 'snapshots')
+    RecommenderEngine(catalogue_csv, snapshot_dir=root).build()
+    before = set(os.listdir(root))
+    with open(catalogue_csv, 'a', encoding='utf-8') as f:
+        f.write('s99999,Movie,Zzz New Title,,,,,2021,PG,90 min,Dramas,A brand new title.\n')
+    engine = RecommenderEngine(catalogue_csv, snapshot_dir=root)
+    timings = engine.build()
+    assert 'tfidf' in timings
+    assert engine.title_position('Zzz New Title') == len(engine.df) - 1
+    after = set(os.listdir(root))
+    assert not before & after and len(after) == len(before)
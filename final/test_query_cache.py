@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from query_cache import LRUCache
+from recommender_engine import RecommenderEngine
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (3, 1, 1, 2)
+    assert stats['hit_rate'] == 0.75
+
+
+def test_byte_limit_and_oversized_values():
+    cache = LRUCache(max_entries=10, max_bytes=1000)
+    cache.put('a', np.zeros(100, dtype=np.int32))
+    cache.put('b', np.zeros(100, dtype=np.int32))
+    assert len(cache) == 2 and cache.stats()['bytes'] == 800
+    cache.put('c', np.zeros(100, dtype=np.int32))
+    assert cache.get('a') is None and len(cache) == 2
+    # Too large on its own: computed and returned, but not kept.
+    big = cache.get_or_compute('big', lambda: np.zeros(1000))
+    assert len(big) == 1000 and cache.get('big') is None and len(cache) == 2
+
+
+def test_disabled_cache_keeps_nothing():
+    cache = LRUCache(max_entries=0)
+    assert cache.get_or_compute('a', lambda: 1) == 1
+    assert len(cache) == 0
+
+
+@pytest.fixture
+def engine(catalogue_csv):
+    return RecommenderEngine(catalogue_csv, snapshot_dir=None)
+
+
+def test_engine_results_are_cached_read_only_and_invalidated(engine):
+    first = engine.filter_positions(['Dramas'], None, None, None)
+    assert engine.filter_positions(['Dramas'], None, None, None) is first
+    assert not first.flags.writeable
+    # Genre order does not make a separate entry.
+    assert engine.filter_positions(['Dramas', 'Comedies'], None, None, None) is \
+        engine.filter_positions(['Comedies', 'Dramas'], None, None, None)
+
+    generation = engine.generation
+    [pos] = engine.add_titles([{'show_id': 's99999', 'type': 'Movie', 'title': 'Zzz New Drama',
+                                'release_year': 2021, 'rating': 'PG', 'duration': '90 min',
+                                'listed_in': 'Dramas', 'description': 'A brand new drama.'}])
+    assert engine.generation > generation
+    assert pos in engine.filter_positions(['Dramas'], None, None, None)
+    assert pos not in first
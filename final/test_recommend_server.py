@@ -0,0 +1,72 @@
+import asyncio
+import json
+from urllib.parse import quote_plus
+
+import pytest
+
+from recommend_server import RecommendServer
+from recommender_engine import RecommenderEngine
+
+
+@pytest.fixture
+def engine(catalogue_csv):
+    engine = RecommenderEngine(catalogue_csv, snapshot_dir=None)
+    engine.build()
+    return engine
+
+
+async def request(port, raw):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+def serve_and(engine, client, **kwargs):
+    async def run():
+        server = RecommendServer(engine, **kwargs)
+        listener = await server.start('127.0.0.1', 0)
+        try:
+            return server, await client(server, listener.sockets[0].getsockname()[1])
+        finally:
+            listener.close()
+            await listener.wait_closed()
+    return asyncio.run(run())
+
+
+def get(port, target):
+    return request(port, f'GET {target} HTTP/1.1\r\nConnection: close\r\n\r\n'.encode('latin-1'))
+
+
+def test_bad_requests_get_4xx(engine):
+    async def client(server, port):
+        return await asyncio.gather(
+            get(port, '/recommend'),
+            get(port, '/recommend?title=No+Such+Title'),
+            get(port, '/recommend?title=x&k=0'),
+            get(port, '/nowhere'),
+            request(port, b'POST /filter HTTP/1.1\r\nContent-Length: 5\r\nConnection: close\r\n\r\n{oops'),
+            request(port, b'GARBAGE\r\n\r\n'),
+            request(port, b'GET /health?' + b'x' * 100000 + b' HTTP/1.1\r\n\r\n'),
+            request(port, b'GET /health HTTP/1.1\r\nX-Big: ' + b'x' * 100000 + b'\r\n\r\n'))
+
+    _, responses = serve_and(engine, client)
+    assert [status for status, _ in responses] == [400, 404, 400, 404, 400, 400, 414, 400]
+    assert all('error' in body for _, body in responses)
+
+
+def test_concurrent_recommendations_are_batched(engine):
+    titles = engine.df['title'].iloc[:12].tolist()
+
+    async def client(server, port):
+        return await asyncio.gather(*[get(port, f'/recommend?title={quote_plus(t)}&k=4') for t in titles])
+
+    server, responses = serve_and(engine, client, batch_window_ms=200)
+    for title, (status, body) in zip(titles, responses):
+        assert status == 200 and body['title'] == title
+        expected = engine.recommend_similar(title, k=4)['title'].tolist()
+        assert [record['title'] for record in body['results']] == expected
+    assert server.batcher.requests == len(titles) and server.batcher.batches < len(titles)
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from recommender_engine import RESULT_COLUMNS, RecommenderEngine
+
+
+@pytest.fixture
+def engine(catalogue_csv):
+    return RecommenderEngine(catalogue_csv, snapshot_dir=None)
+
+
+def test_nothing_is_built_before_first_use(engine):
+    assert engine._df is None and engine._X_rec is None and engine.timings == {}
+    engine.filter_movies(['Dramas'], None, None, None)
+    assert engine._df is not None and engine._X_rec is None
+    timings = engine.build()
+    assert engine._X_rec is not None and {'tfidf', 'features'} <= set(timings)
+    engine.reload()
+    assert engine._df is None and engine.timings == {}
+
+
+def test_recommend_similar_keeps_the_baseline_columns(engine):
+    title = engine.df['title'].iloc[10]
+    recs = engine.recommend_similar(title)
+    assert list(recs.columns) == RESULT_COLUMNS == ['title', 'listed_in', 'release_year']
+    assert len(recs) == engine.n_neighbors - 1 and title not in recs['title'].tolist()
+    rated = engine.recommend_similar(title, with_rating=True)
+    assert list(rated.columns) == RESULT_COLUMNS + ['rating']
+    assert rated['title'].tolist() == recs['title'].tolist()
+    assert engine.recommend_similar('No Such Title').equals(pd.DataFrame())
+
+
+def test_recommendations_are_the_nearest_by_cosine(engine):
+    X = engine.X_rec.astype(np.float64)
+    for pos in (0, 42, 199):
+        positions = engine.similar_positions(pos, 5)
+        scores = (X @ X[pos].T).toarray().ravel()
+        scores[pos] = -np.inf
+        np.testing.assert_allclose(scores[positions], np.sort(scores)[::-1][:5], rtol=1e-5)
+
+
+def test_filter_movies_matches_a_dataframe_scan(engine):
+    df = engine.df
+    result = engine.filter_movies(['Dramas', 'Comedies'], 'TV-MA', 2010, 2020)
+    mask = (df['genres_list'].apply(lambda g: bool({'Dramas', 'Comedies'} & set(g)))
+            & (df['rating'] == 'TV-MA') & df['release_year'].between(2010, 2020))
+    assert result.index.tolist() == df.index[mask].tolist()
+
+
+def test_deprecated_watchlist_functions(tmp_path, monkeypatch):
+    pytest.importorskip('tkinter')
+    import movie_recommendation
+
+    monkeypatch.chdir(tmp_path)
+    with pytest.deprecated_call():
+        movie_recommendation.save_watchlist(['s3', 's1', 's3'])
+    with pytest.deprecated_call():
+        assert movie_recommendation.load_watchlist() == ['s3', 's1']
+
+
+def test_recommend_many_matches_single_queries(engine):
+    titles = engine.df['title'].iloc[[3, 50, 3, 120]].tolist() + ['No Such Title']
+    batch = engine.recommend_many(titles, k=4)
+    assert list(batch.columns) == ['seed_title', 'rank', 'title', 'listed_in', 'release_year', 'rating', 'similarity']
+    assert batch['seed_title'].tolist() == [t for t in titles[:4] for _ in range(4)]
+    assert batch['rank'].tolist() == [1, 2, 3, 4] * 4
+    for title in titles[:4]:
+        rows = batch[batch['seed_title'] == title].head(4)
+        assert rows['title'].tolist() == engine.recommend_similar(title, k=4)['title'].tolist()
+    # Small blocks give the same result.
+    assert engine.recommend_many(titles, k=4, max_memory_mb=0.001).equals(batch)
+
+
+def test_feature_matrix_is_compact_float32(engine):
+    X = engine.X_rec
+    assert X.dtype == np.float32 and X.indices.dtype == np.int32
+    usage = engine.memory_usage()
+    assert usage['features'] == X.data.nbytes + X.indices.nbytes + X.indptr.nbytes + engine._row_norms.nbytes
+    assert usage['total'] == usage['dataframe'] + usage['features'] + usage['vocabulary']
+
+
+@pytest.mark.parametrize('backend', ['exact', 'lsh'])
+def test_filtered_recommendations_are_the_nearest_passing_titles(catalogue_csv, backend):
+    engine = RecommenderEngine(catalogue_csv, snapshot_dir=None, backend=backend)
+    X = engine.X_rec.astype(np.float64)
+    for filters in [dict(genres=['Dramas']), dict(year_from=2000), dict(rating='TV-MA', year_to=2015)]:
+        allowed = set(engine.filter_positions(filters.get('genres'), filters.get('rating'),
+                                              filters.get('year_from'), filters.get('year_to')).tolist())
+        for pos in (1, 60):
+            positions = engine.similar_positions(pos, 5, **filters)
+            expected = sorted(((X[p] @ X[pos].T).toarray().item() for p in allowed - {pos}), reverse=True)[:5]
+            assert set(positions.tolist()) <= allowed - {pos}
+            scores = (X[positions] @ X[pos].T).toarray().ravel()
+            np.testing.assert_allclose(np.sort(scores)[::-1], expected, rtol=1e-5)
+
+
+def test_describe_matches_a_full_content_cosine_ranking(engine):
+    norms = engine.content_norms
+    for text in ['a detective investigates a murder in a small town', 'documentary about music and love']:
+        scores = engine.exact_index.scores(engine.query_vector(text)).ravel()
+        scores = np.where(scores > 0, scores / np.where(norms > 0, norms, 1), -np.inf)
+        positions = engine.describe_positions(text, 5)
+        np.testing.assert_allclose(scores[positions], np.sort(scores)[::-1][:5], rtol=1e-6)
+
+
+def test_genre_words_match_whole_genre_words_only(engine):
+    names = engine.filter_index.genre_names
+    genres = {names[i] for i in engine._text_genres('a serial killer comedy')}
+    assert 'Comedies' in genres and not any('Series' in name for name in genres)
+
+
+def test_added_and_removed_titles_without_refitting(engine):
+    engine.build()
+    seed = engine.df.iloc[20]
+    [pos] = engine.add_titles([{**seed.drop('genres_list').to_dict(), 'show_id': 's99999', 'title': 'Zzz Twin'}])
+    assert pos == 300 and engine.title_position('zzz twin') == pos
+    assert pos in engine.similar_positions(20, 5) and pos in engine.search_positions('twin')
+    assert pos in engine.filter_positions(seed['genres_list'][:1], None, None, None)
+
+    engine.remove_titles([seed['show_id']])
+    assert engine.title_position(seed['title']) is None
+    assert 20 not in engine.similar_positions(pos, 5)
+    assert engine.pending_changes == 2
+
+    before = engine.similar_positions(pos, 5).tolist()
+    assert engine.refit() and engine.pending_changes == 0
+    assert engine.title_position('Zzz Twin') == pos and 20 not in engine.similar_positions(pos, 5)
+    assert len(set(before) & set(engine.similar_positions(pos, 5).tolist())) >= 3
@@ -0,0 +1,71 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from recommender_engine import RecommenderEngine
+from shared_model import SHARED_COLUMNS, SharedEngine, StringColumn, publish
+
+
+@pytest.fixture
+def published(catalogue_csv):
+    engine = RecommenderEngine(catalogue_csv, snapshot_dir=None)
+    model = publish(engine)
+    shared = SharedEngine(model.handle)
+    yield engine, model, shared
+    shared.close()
+    model.close()
+
+
+def test_string_column_round_trip():
+    values = ['a', None, 'Über', '', 'ß' * 3]
+    column = StringColumn.from_values(values)
+    assert len(column) == 5 and column.tolist() == values
+    assert column[2] == 'Über' and column[-1] == 'ßßß'
+    assert column[np.array([4, 1])].tolist() == ['ßßß', None]
+    assert column[np.array([True, False, True, False, False])].tolist() == ['a', 'Über']
+    assert column[1:3].tolist() == [None, 'Über']
+
+
+def test_shared_engine_answers_like_the_original(published):
+    engine, _, shared = published
+    assert (shared.X_rec != engine.X_rec).nnz == 0
+    assert not shared.X_rec.data.flags.writeable
+    np.testing.assert_array_equal(shared.content_norms, engine.content_norms)
+    for pos in (0, 17, 250):
+        title = engine.df['title'].iloc[pos]
+        assert shared.title_position(title) == engine.title_position(title)
+        assert shared.similar_positions(pos, 5).tolist() == engine.similar_positions(pos, 5).tolist()
+    assert (shared.filter_positions(['Dramas'], 'TV-MA', 2000, None).tolist()
+            == engine.filter_positions(['Dramas'], 'TV-MA', 2000, None).tolist())
+    assert shared.search_positions('love').tolist() == engine.search_positions('love').tolist()
+    query = 'a detective solving murders'
+    assert shared.describe_positions(query, 5).tolist() == engine.describe_positions(query, 5).tolist()
+    assert shared.text_search_positions(query, 5).tolist() == engine.text_search_positions(query, 5).tolist()
+
+
+def test_shared_engine_exposes_only_published_columns(published):
+    engine, _, shared = published
+    assert set(shared.df.columns) == set(SHARED_COLUMNS) | {'genres_list'}
+    title = engine.df['title'].iloc[3]
+    assert shared.recommend_similar(title).equals(engine.recommend_similar(title))
+    with pytest.raises(RuntimeError):
+        shared.add_titles([])
+
+
+def _worker_titles(handle, positions, queue):
+    shared = SharedEngine(handle)
+    queue.put([shared.column('title')[pos] for pos in positions])
+    shared.close()
+
+
+def test_worker_process_attaches_to_the_block(published):
+    engine, model, _ = published
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_worker_titles, args=(model.handle, [0, 5], queue))
+    process.start()
+    titles = queue.get(timeout=60)
+    process.join(60)
+    assert process.exitcode == 0
+    assert titles == engine.df['title'].iloc[[0, 5]].tolist()
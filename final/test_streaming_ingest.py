@@ -0,0 +1,37 @@
+import numpy as np
+
+from recommender_engine import RecommenderEngine
+from streaming_ingest import ingest, load_features, load_text
+
+
+def test_chunking_does_not_change_the_matrix(catalogue_csv, tmp_path):
+    one = ingest(catalogue_csv, str(tmp_path / 'one'), chunk_rows=1000, n_features=2 ** 12)
+    many = ingest(catalogue_csv, str(tmp_path / 'many'), chunk_rows=37, n_features=2 ** 12)
+    X_one, _ = load_features(str(tmp_path / 'one'))
+    X_many, _ = load_features(str(tmp_path / 'many'))
+    assert one['shape'] == many['shape'] and one['genres'] == many['genres']
+    # Mapped read-only from disk, not loaded.
+    assert not X_many.data.flags.writeable and not X_many.data.flags.owndata
+    np.testing.assert_array_equal(X_one.indptr, X_many.indptr)
+    np.testing.assert_array_equal(X_one.indices, X_many.indices)
+    np.testing.assert_allclose(X_one.data, X_many.data, rtol=1e-6)
+
+
+def test_rows_are_cleaned_like_the_engine(catalogue_csv, tmp_path):
+    with open(catalogue_csv, 'a', encoding='utf-8') as f:
+        f.write('s99998,Movie,Bad Year,,,,,soon,PG,90 min,Dramas,No year.\n')
+        f.write('s99999,Movie,No Genre,,,,,2020,PG,90 min,,No genre.\n')
+    directory = str(tmp_path / 'features')
+    meta = ingest(catalogue_csv, directory, chunk_rows=50, n_features=2 ** 12)
+    engine = RecommenderEngine(catalogue_csv, snapshot_dir=None)
+    df = engine.df[engine.df['release_year'].astype(str).str.isdigit()]
+    assert meta['counts']['bad_release_year'] == 1 and meta['counts']['missing_required'] >= 1
+    assert meta['shape'][0] == len(df) == meta['counts']['rows_kept']
+    assert meta['genres'] == list(engine.mlb.classes_)
+
+    X, _ = load_features(directory)
+    np.testing.assert_allclose(np.sqrt(X.multiply(X).sum(axis=1)).A1, 1, rtol=1e-5)
+    assert load_text(directory, 'title', meta, range(len(df))) == df['title'].tolist()
+    # Genre columns follow the engine's genre classes.
+    genres = (X[:, 1:1 + len(meta['genres'])] > 0).toarray()
+    np.testing.assert_array_equal(genres, engine.mlb.transform(df['genres_list']).toarray() > 0)
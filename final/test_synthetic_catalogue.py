@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from recommender_engine import RecommenderEngine
+from synthetic_catalogue import COLUMNS, write_catalogue
+
+
+def test_same_seed_gives_the_same_rows(catalogue_csv, tmp_path):
+    [a] = write_catalogue(str(tmp_path / 'a.csv'), 500, seed=3, source=catalogue_csv, chunk_rows=128)
+    [b] = write_catalogue(str(tmp_path / 'b.csv'), 500, seed=3, source=catalogue_csv, chunk_rows=128)
+    [c] = write_catalogue(str(tmp_path / 'c.csv'), 500, seed=4, source=catalogue_csv, chunk_rows=128)
+    with open(a, 'rb') as fa, open(b, 'rb') as fb, open(c, 'rb') as fc:
+        first = fa.read()
+        assert first == fb.read() and first != fc.read()
+
+
+def test_shards_concatenate_to_the_whole_catalogue(catalogue_csv, tmp_path):
+    [whole] = write_catalogue(str(tmp_path / 'whole.csv'), 600, seed=1, source=catalogue_csv, chunk_rows=100)
+    shards = write_catalogue(str(tmp_path / 'part.csv'), 600, seed=1, source=catalogue_csv, shard_rows=200,
+                             chunk_rows=100)
+    assert [p.rsplit('/', 1)[-1] for p in shards] == ['part_00000.csv', 'part_00001.csv', 'part_00002.csv']
+    joined = pd.concat([pd.read_csv(p, dtype=str) for p in shards], ignore_index=True)
+    pd.testing.assert_frame_equal(joined, pd.read_csv(whole, dtype=str))
+    with pytest.raises(ValueError):
+        write_catalogue(str(tmp_path / 'bad.csv'), 600, source=catalogue_csv, shard_rows=150, chunk_rows=100)
+
+
+def test_generated_catalogue_loads_in_the_engine(catalogue_csv, tmp_path):
+    [path] = write_catalogue(str(tmp_path / 'synthetic.csv'), 400, seed=0, source=catalogue_csv)
+    df = pd.read_csv(path)
+    assert list(df.columns) == COLUMNS and len(df) == 400 and df['show_id'].is_unique
+    source = pd.read_csv(catalogue_csv)
+    assert set(df['type']) <= set(source['type'])
+    engine = RecommenderEngine(path, snapshot_dir=None)
+    assert len(engine.recommend_similar(engine.df['title'].iloc[0])) == engine.n_neighbors - 1
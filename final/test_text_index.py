@@ -0,0 +1,116 @@
+import numpy as np
+
+from text_index import TextIndex
+
+VOCABULARY = [f'w{i}' for i in range(60)]
+
+
+def analyzer(text):
+    return text.split()
+
+
+def make_columns(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    # Zipf-like term frequencies, so posting lists differ widely in length.
+    p = 1 / np.arange(1, len(VOCABULARY) + 1)
+    p /= p.sum()
+
+    def text(max_terms):
+        return ' '.join(rng.choice(VOCABULARY, size=rng.integers(0, max_terms), p=p))
+
+    return {
+        'description': [text(30) for _ in range(n_rows)],
+        'cast': [text(6) if rng.random() < 0.8 else None for _ in range(n_rows)],
+        'director': [text(3) for _ in range(n_rows)],
+        'country': [text(2) for _ in range(n_rows)],
+    }
+
+
+def exhaustive_scores(columns, query, weights, k1=1.2, b=0.75, removed=()):
+    """
+    BM25F score of every row, computed directly from the text.
+    """
+    n_rows = len(columns['description'])
+    terms = [[analyzer(t) if isinstance(t, str) else [] for t in values] for values in columns.values()]
+    averages = [np.mean([len(t) for t in field]) or 1.0 for field in terms]
+    scores = np.zeros(n_rows)
+    for term in dict.fromkeys(analyzer(query)):
+        doc_freq = sum(any(term in field[row] for field in terms) for row in range(n_rows))
+        if doc_freq == 0:
+            continue
+        idf = np.log1p((n_rows - doc_freq + 0.5) / (doc_freq + 0.5))
+        for row in range(n_rows):
+            tf = sum(w * field[row].count(term) / (1 - b + b * len(field[row]) / avg)
+                     for w, field, avg in zip(weights, terms, averages))
+            scores[row] += idf * tf * (k1 + 1) / (tf + k1)
+    scores[list(removed)] = 0
+    return scores
+
+
+def check_against_exhaustive(index, columns, query, k, boosts=None, removed=()):
+    positions, scores = index.search(query, k, boosts)
+    expected = exhaustive_scores(columns, query, index.field_weights(boosts), removed=removed)
+    best = np.sort(expected[expected > 0])[::-1][:k]
+    np.testing.assert_allclose(scores, best, rtol=1e-4)
+    np.testing.assert_allclose(expected[positions], scores, rtol=1e-4)
+
+
+def test_pruned_search_matches_exhaustive_scoring():
+    columns = make_columns(400, seed=0)
+    index = TextIndex(columns, analyzer)
+    for query in ['w0 w1 w2', 'w40 w3 w0 w55', 'w59', 'w7 w7 w20 w0 w1 w33', 'missing w12']:
+        for k in (1, 5, 25):
+            check_against_exhaustive(index, columns, query, k)
+
+
+def test_boosts_change_the_ranking_consistently():
+    columns = make_columns(300, seed=1)
+    index = TextIndex(columns, analyzer)
+    for boosts in ({'cast': 0.0}, {'description': 3.0, 'country': 0.0}):
+        check_against_exhaustive(index, columns, 'w0 w4 w9 w30', 10, boosts)
+
+
+def test_engine_builds_the_index_up_front_and_reads_df_without_the_lock(catalogue_csv):
+    import threading
+
+    from recommender_engine import RecommenderEngine
+
+    engine = RecommenderEngine(catalogue_csv, snapshot_dir=None)
+    timings = engine.build()
+    assert engine._text_index is not None and engine._content_norms is not None
+    assert 'text_index' in timings
+    engine.column('title')
+    # A query on another thread must not wait for a lock held by a rebuild.
+    engine._lock.acquire()
+    try:
+        result = []
+        reader = threading.Thread(target=lambda: result.append(len(engine.df) + len(engine.column('title'))))
+        reader.start()
+        reader.join(5)
+        assert result == [600]
+    finally:
+        engine._lock.release()
+
+
+def test_without_leaves_tombstones_out():
+    columns = make_columns(300, seed=2)
+    index = TextIndex(columns, analyzer)
+    positions, _ = index.search('w0 w5 w17', 10)
+    removed = positions[:3]
+    pruned = index.without(removed)
+    check_against_exhaustive(pruned, columns, 'w0 w5 w17', 10, removed=removed)
+    assert not np.isin(pruned.search('w0 w5 w17', 300)[0], removed).any()
+    assert np.array_equal(index.search('w0 w5 w17', 10)[0], positions)
+
+
+def test_extended_rows_are_found_and_the_original_is_untouched():
+    columns = make_columns(200, seed=3)
+    index = TextIndex(columns, analyzer)
+    before = index.search('w2 w8', 10)
+    new = {'description': ['brandnew w2 w2 w8'], 'cast': [None], 'director': ['w1'], 'country': ['w0']}
+    extended = index.extended(new)
+    assert len(extended) == 201 and len(index) == 200
+    assert extended.search('brandnew', 5)[0].tolist() == [200]
+    assert index.search('brandnew', 5)[0].tolist() == []
+    assert all(np.array_equal(a, b) for a, b in zip(index.search('w2 w8', 10), before))
+    assert extended.without([200]).search('brandnew', 5)[0].tolist() == []
@@ -0,0 +1,102 @@
+import random
+
+import numpy as np
+
+from title_index import EditDistance, TitleIndex, edit_distance
+
+TITLES = ['The Office', 'the office', 'Office Space', 'Ozark', 'Narcos', 'Narcos: Mexico',
+          'Dark', 'Über Alles', 'ß', None, 'Dark Tourist', 'An Office']
+
+
+def reference_distance(a, b):
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+    return row[-1]
+
+
+def reference_search(index, partial):
+    query = partial.casefold()
+    removed = set(index._removed.tolist())
+    return [pos for pos, key in enumerate(index.keys) if query in key and pos not in removed]
+
+
+def test_search_matches_substring_scan():
+    index = TitleIndex(TITLES)
+    for partial in ['', 'o', 'Of', 'office', 'NARCOS', 'rk', 'ss', 'über', 'zzz']:
+        assert index.search(partial).tolist() == reference_search(index, partial)
+
+
+def test_lookup_ignores_case_and_first_prefers_exact_case():
+    index = TitleIndex(TITLES)
+    assert index.lookup('THE OFFICE').tolist() == [0, 1]
+    assert index.lookup('Missing').tolist() == []
+    assert index.first('the office') == 1 and index.first('THE OFFICE') == 0
+    assert index.first('SS') == 8
+
+
+def test_lookup_many_prefers_exact_case_like_first():
+    index = TitleIndex(TITLES)
+    titles = ['the office', 'The Office', 'THE OFFICE', 'Missing', 'ozark', 'Dark']
+    expected = [-1 if index.first(t) is None else index.first(t) for t in titles]
+    assert index.lookup_many(titles).tolist() == expected == [1, 0, 0, -1, 3, 6]
+    assert index.lookup_many([]).tolist() == []
+
+
+def test_arrays_round_trip():
+    index = TitleIndex(TITLES)
+    restored = TitleIndex.from_arrays(TITLES, index.arrays())
+    for partial in ['o', 'narcos', 'dark']:
+        assert restored.search(partial).tolist() == index.search(partial).tolist()
+    assert np.array_equal(restored.lookup_many(TITLES[:4]), index.lookup_many(TITLES[:4]))
+
+
+def test_edit_distance_matches_dynamic_programming():
+    rng = random.Random(0)
+    for _ in range(500):
+        a = ''.join(rng.choice('abcé ') for _ in range(rng.randint(0, 12)))
+        b = ''.join(rng.choice('abcé ') for _ in range(rng.randint(0, 12)))
+        assert edit_distance(a, b) == reference_distance(a, b)
+
+
+def test_edit_distance_beyond_one_machine_word():
+    a = 'x' * 70 + 'abc'
+    distance = EditDistance(a)
+    assert distance(a) == 0
+    assert distance('x' * 70 + 'abd') == 1
+    assert distance('') == len(a)
+
+
+def test_fuzzy_ranks_typos_by_edit_distance():
+    index = TitleIndex(TITLES)
+    assert index.fuzzy('narcs')[0] == 4
+    assert index.fuzzy('ofice space')[0] == 2
+    assert index.fuzzy('zq').tolist() == []
+    positions = index.fuzzy('the offise', limit=3)
+    distances = [reference_distance('the offise', index.keys[pos]) for pos in positions]
+    assert distances == sorted(distances) and distances[0] == 1
+
+
+def test_extended_matches_a_fresh_index():
+    extended = TitleIndex(TITLES[:5]).extended(TITLES[5:])
+    fresh = TitleIndex(TITLES)
+    for partial in ['', 'a', 'ar', 'dark', 'narcos', 'office']:
+        assert extended.search(partial).tolist() == fresh.search(partial).tolist()
+    for title in ['dark', 'Narcos: Mexico', 'An Office']:
+        assert extended.lookup(title).tolist() == fresh.lookup(title).tolist()
+    assert extended.fuzzy('narcs').tolist() == fresh.fuzzy('narcs').tolist()
+
+
+def test_without_leaves_tombstones_out_and_the_original_intact():
+    index = TitleIndex(TITLES)
+    pruned = index.without([0, 6])
+    assert pruned.lookup('The Office').tolist() == [1]
+    assert pruned.first('The Office') == 1
+    assert 6 not in pruned.search('dar').tolist()
+    assert 6 not in pruned.search('k').tolist()
+    assert 6 not in pruned.fuzzy('dark').tolist()
+    assert index.lookup('The Office').tolist() == [0, 1]
+    assert 6 in index.search('dar').tolist()
+    assert np.array_equal(pruned.extended(['Dark']).search('dark'), [10, len(TITLES)])
@@ -0,0 +1,66 @@
+import json
+import os
+
+from watchlist_store import WatchlistStore, table_name
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    db = str(tmp_path / 'watchlist.db')
+    legacy = tmp_path / 'watchlist.json'
+    legacy.write_text(json.dumps(['s3', 'Stranger Things', 's3', 7, 's1']), encoding='utf-8')
+
+    store = WatchlistStore(db, 'alice', str(legacy))
+    assert store.show_ids() == ['s3', 'Stranger Things', 's1']
+    assert not legacy.exists() and os.path.exists(str(legacy) + '.migrated')
+    store.close()
+
+    # A new file is not imported into an existing table.
+    legacy.write_text(json.dumps(['s9']), encoding='utf-8')
+    store = WatchlistStore(db, 'alice', str(legacy))
+    assert store.show_ids() == ['s3', 'Stranger Things', 's1']
+    assert legacy.exists()
+    store.close()
+
+
+def test_unreadable_legacy_file_gives_an_empty_list(tmp_path):
+    legacy = tmp_path / 'watchlist.json'
+    legacy.write_text('{not json', encoding='utf-8')
+    store = WatchlistStore(str(tmp_path / 'watchlist.db'), 'bob', str(legacy))
+    assert store.show_ids() == [] and len(store) == 0
+    store.close()
+
+
+def test_add_remove_and_users_are_separate(tmp_path):
+    db = str(tmp_path / 'watchlist.db')
+    alice = WatchlistStore(db, 'alice', None)
+    other = WatchlistStore(db, 'a.lice', None)
+    assert table_name('alice') != table_name('a.lice')
+    assert alice.add('s1') and not alice.add('s1')
+    assert 's1' in alice and 's1' not in other
+    assert alice.remove('s1') and not alice.remove('s1')
+    alice.close()
+    other.close()
+
+
+def test_rename_keeps_order_and_rows_added_elsewhere(tmp_path):
+    db = str(tmp_path / 'watchlist.db')
+    store = WatchlistStore(db, 'alice', None)
+    for entry in ['Title A', 's2', 'Title B', 's9']:
+        store.add(entry)
+    # Another app instance adds a title after this one read the list.
+    other = WatchlistStore(db, 'alice', None)
+    other.add('s7')
+
+    store.rename({'Title A': 's1', 'Title B': 's9'})
+    assert store.show_ids() == ['s1', 's2', 's9', 's7']
+    assert other.show_ids() == ['s1', 's2', 's9', 's7']
+    store.close()
+    other.close()
+
+
+def test_replace_sets_the_whole_list(tmp_path):
+    store = WatchlistStore(str(tmp_path / 'watchlist.db'), 'alice', None)
+    store.add('s1')
+    store.replace(['s5', 's2', 's5', 7])
+    assert store.show_ids() == ['s5', 's2']
+    store.close()
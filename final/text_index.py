@@ -0,0 +1,272 @@
+"""
+Full-text search over the description, cast, director and country columns.
+
+`TextIndex` is an inverted index ranked with BM25F: a term's frequency in
+each field is length-normalised per field, weighted by the field's boost
+and summed before BM25's saturation, so boosts can change per query.
+
+Like TitleIndex, every structure is a flat numpy array, so the index can be
+placed in shared memory as is (see shared_model.py):
+
+- terms are looked up by binary search in a sorted array of 64-bit term
+  hashes;
+- each term's postings are its ascending row positions, stored back to
+  back with an offsets array, plus one normalised frequency per field;
+- each term keeps the largest normalised frequency per field, which bounds
+  the score any row can get from it.
+
+Queries are answered term at a time, highest upper bound first. Once the
+k-th best score so far exceeds what every remaining term could add, rows
+not seen yet cannot enter the top k, so the remaining postings are only
+probed for the rows already collected.
+"""
+import copy
+
+import numpy as np
+
+from title_index import key_hash
+
+FIELDS = ('description', 'cast', 'director', 'country')
+DEFAULT_BOOSTS = {'description': 1.0, 'cast': 2.0, 'director': 2.0, 'country': 0.5}
+
+
+class TextIndex:
+    """
+    BM25F-ranked search over several text columns.
+
+    `columns` maps field name to a sequence of strings (None/NaN for
+    missing values) and `analyzer` turns a string into a list of terms,
+    e.g. `TfidfVectorizer.build_analyzer()`.
+    """
+
+    def __init__(self, columns, analyzer, k1=1.2, b=0.75, boosts=None):
+        self.fields = tuple(columns)
+        self.analyzer = analyzer
+        self.k1 = k1
+        self.b = b
+        self.boosts = dict(DEFAULT_BOOSTS if boosts is None else boosts)
+
+        term_list, term_of, rows, fields, counts, lengths = _tokenise(columns.values(), analyzer)
+        self.n_rows = len(lengths[0]) if lengths else 0
+        self._averages = np.array([field_lengths.mean() if len(field_lengths) and field_lengths.mean() > 0 else 1.0
+                                   for field_lengths in lengths])
+        weights = counts / _norms(rows, fields, lengths, self._averages, b)
+
+        self._term_hashes, self._rows, self._tf, doc_freq = _group(term_list, term_of, rows, fields, weights,
+                                                                   len(self.fields))
+        self._offsets = np.zeros(len(term_list) + 1, dtype=np.int64)
+        np.cumsum(doc_freq, out=self._offsets[1:])
+        self._idf = self._term_idf(doc_freq)
+        self._max_tf = _max_tf(self._tf, self._offsets, doc_freq)
+        self._removed = np.empty(0, dtype=np.int32)
+
+    def _term_idf(self, doc_freq):
+        return np.log1p((self.n_rows - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+    def extended(self, columns):
+        """
+        Copy of the index with the rows of `columns` (same fields) appended.
+
+        The new rows are length-normalised with the field averages of the
+        fitted rows and existing terms keep their idf, like the frozen
+        TF-IDF vocabulary; terms first seen here get an idf from their
+        count so far. Only the new rows are tokenised.
+        """
+        index = copy.copy(self)
+        start = self.n_rows
+        term_list, term_of, rows, fields, counts, lengths = _tokenise(
+            (columns[field] for field in self.fields), self.analyzer, start)
+        index.n_rows = start + (len(lengths[0]) if lengths else 0)
+        weights = counts / _norms(rows - start, fields, lengths, self._averages, self.b)
+        hashes, new_rows, new_tf, doc_freq = _group(term_list, term_of, rows, fields, weights, len(self.fields))
+
+        # New rows come last, so each posting goes at the end of its term's
+        # list (or where the list of a new term would start).
+        slot = np.searchsorted(self._term_hashes, hashes)
+        known = np.zeros(len(hashes), dtype=bool)
+        inside = slot < len(self._term_hashes)
+        known[inside] = self._term_hashes[slot[inside]] == hashes[inside]
+        at = np.repeat(self._offsets[slot + known], doc_freq)
+        index._rows = np.insert(self._rows, at, new_rows)
+        index._tf = np.insert(self._tf, at, new_tf, axis=0)
+
+        index._term_hashes = np.union1d(self._term_hashes, hashes)
+        old = np.searchsorted(index._term_hashes, self._term_hashes)
+        new = np.searchsorted(index._term_hashes, hashes)
+        sizes = np.zeros(len(index._term_hashes), dtype=np.int64)
+        sizes[old] = np.diff(self._offsets)
+        sizes[new] += doc_freq
+        index._offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=index._offsets[1:])
+
+        index._idf = np.zeros(len(sizes), dtype=np.float32)
+        index._idf[new[~known]] = index._term_idf(doc_freq[~known])
+        index._idf[old] = self._idf
+        new_offsets = np.zeros(len(hashes) + 1, dtype=np.int64)
+        np.cumsum(doc_freq, out=new_offsets[1:])
+        index._max_tf = np.zeros((len(sizes), len(self.fields)), dtype=np.float32)
+        index._max_tf[old] = self._max_tf
+        index._max_tf[new] = np.maximum(index._max_tf[new], _max_tf(new_tf, new_offsets, doc_freq))
+        return index
+
+    def without(self, positions):
+        """
+        Copy of the index that leaves out the rows at `positions`.
+        """
+        index = copy.copy(self)
+        index._removed = np.union1d(self._removed, positions).astype(np.int32)
+        return index
+
+    def __len__(self):
+        return self.n_rows
+
+    def _term(self, term):
+        """
+        Index of `term` in the sorted term arrays, or None.
+        """
+        h = key_hash(term)
+        i = int(np.searchsorted(self._term_hashes, h))
+        if i == len(self._term_hashes) or self._term_hashes[i] != h:
+            return None
+        return i
+
+    def field_weights(self, boosts=None):
+        """
+        Boost per field, in field order; `boosts` overrides the defaults.
+        """
+        unknown = set(boosts or {}) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Unknown search fields: {', '.join(sorted(unknown))}")
+        merged = dict(self.boosts, **(boosts or {}))
+        weights = np.array([merged.get(field, 1.0) for field in self.fields], dtype=np.float32)
+        if (weights < 0).any():
+            # Score bounds used for pruning assume non-negative weights.
+            raise ValueError("Field boosts must not be negative.")
+        return weights
+
+    def search(self, query, k=10, boosts=None):
+        """
+        (positions, scores) of the `k` best-matching rows, best first.
+        """
+        weights = self.field_weights(boosts)
+        terms = [t for t in map(self._term, dict.fromkeys(self.analyzer(query))) if t is not None]
+        if not terms or k <= 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        bounds = [(self._idf[t] * self._saturate(self._max_tf[t] @ weights), t) for t in terms]
+        bounds.sort(reverse=True)
+        remaining = sum(bound for bound, _ in bounds)
+
+        candidates = np.empty(0, dtype=np.int32)
+        scores = np.empty(0, dtype=np.float64)
+        for bound, t in bounds:
+            remaining -= bound
+            rows = self._rows[self._offsets[t]:self._offsets[t + 1]]
+            tf = self._tf[self._offsets[t]:self._offsets[t + 1]]
+            if len(candidates) >= k and np.partition(scores, -k)[-k] > remaining + bound:
+                # Unseen rows can no longer reach the top k: probe only the
+                # collected candidates in this posting list.
+                at = np.searchsorted(rows, candidates)
+                hit = at < len(rows)
+                hit[hit] = rows[at[hit]] == candidates[hit]
+                scores[hit] += self._idf[t] * self._saturate(tf[at[hit]] @ weights)
+                continue
+            if len(self._removed):
+                live = ~np.isin(rows, self._removed)
+                rows, tf = rows[live], tf[live]
+            contribution = self._idf[t] * self._saturate(tf @ weights)
+            merged = np.union1d(candidates, rows)
+            merged_scores = np.zeros(len(merged))
+            merged_scores[np.searchsorted(merged, candidates)] = scores
+            merged_scores[np.searchsorted(merged, rows)] += contribution
+            candidates, scores = merged.astype(np.int32), merged_scores
+
+        # A zero boost leaves rows that matched only in that field.
+        matched = scores > 0
+        candidates, scores = candidates[matched], scores[matched]
+        if len(candidates) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[best], scores[best]
+        order = np.lexsort((candidates, -scores))
+        return candidates[order], scores[order].astype(np.float32)
+
+    def _saturate(self, tf):
+        return tf * (self.k1 + 1) / (tf + self.k1)
+
+
+def _tokenise(columns, analyzer, start=0):
+    """
+    Term counts of every field of rows numbered from `start`:
+    (term_list, term_of, rows, fields, counts, lengths), one entry per
+    (term, row, field) in the flat arrays, and the field lengths in terms.
+    """
+    term_ids, term_list = {}, []
+    term_of, rows, fields, counts, lengths = [], [], [], [], []
+    for f, values in enumerate(columns):
+        field_lengths = []
+        for pos, text in enumerate(values, start):
+            terms = analyzer(text) if isinstance(text, str) else []
+            field_lengths.append(len(terms))
+            tf = {}
+            for term in terms:
+                tf[term] = tf.get(term, 0) + 1
+            for term, count in tf.items():
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    term_id = term_ids[term] = len(term_list)
+                    term_list.append(term)
+                term_of.append(term_id)
+                rows.append(pos)
+                fields.append(f)
+                counts.append(count)
+        lengths.append(np.array(field_lengths, dtype=np.float64))
+    return (term_list, np.array(term_of, dtype=np.int64), np.array(rows, dtype=np.int64),
+            np.array(fields, dtype=np.int64), np.array(counts, dtype=np.float64), lengths)
+
+
+def _norms(rows, fields, lengths, averages, b):
+    """
+    BM25 length normalisation of each (row, field) entry; `rows` index
+    into `lengths`.
+    """
+    norms = np.empty(len(rows))
+    for f, field_lengths in enumerate(lengths):
+        mask = fields == f
+        norms[mask] = 1 - b + b * field_lengths[rows[mask]] / averages[f]
+    return norms
+
+
+def _group(term_list, term_of, rows, fields, weights, n_fields):
+    """
+    (term_hashes, rows, tf, doc_freq): one posting per (term, row) with a
+    weight column per field, terms sorted by hash and each term's postings
+    by row.
+    """
+    order = np.lexsort((rows, term_of))
+    term_of, rows, fields, weights = term_of[order], rows[order], fields[order], weights[order]
+    pair = term_of * (int(rows.max()) + 1 if len(rows) else 1) + rows
+    starts = np.flatnonzero(np.r_[True, pair[1:] != pair[:-1]]) if len(pair) else np.empty(0, dtype=np.int64)
+    posting_of = np.cumsum(np.r_[False, pair[1:] != pair[:-1]]) if len(pair) else pair
+    tf = np.zeros((len(starts), n_fields), dtype=np.float32)
+    tf[posting_of, fields] = weights
+    posting_terms = term_of[starts]
+    posting_rows = rows[starts].astype(np.int32)
+
+    hashes = np.fromiter((key_hash(t) for t in term_list), dtype=np.int64, count=len(term_list))
+    by_hash = np.argsort(hashes, kind='stable')
+    rank = np.empty_like(by_hash)
+    rank[by_hash] = np.arange(len(by_hash))
+    order = np.lexsort((posting_rows, rank[posting_terms]))
+    doc_freq = np.bincount(rank[posting_terms], minlength=len(term_list))
+    return hashes[by_hash], posting_rows[order], tf[order], doc_freq
+
+
+def _max_tf(tf, offsets, doc_freq):
+    """
+    Largest normalised frequency per field of each term's postings.
+    """
+    max_tf = np.zeros((len(doc_freq), tf.shape[1]), dtype=np.float32)
+    present = doc_freq > 0
+    if present.any():
+        max_tf[present] = np.maximum.reduceat(tf, offsets[:-1][present])
+    return max_tf
@@ -0,0 +1,371 @@
+"""
+Title lookups without scanning the title column.
+
+`TitleIndex` keeps every structure as flat numpy arrays, so it can be placed
+in shared memory as is (see shared_model.py):
+
+- exact lookups binary-search a sorted array of 64-bit hashes of the
+  casefolded titles, then confirm the candidates against the titles;
+- substring search uses trigram posting lists: every three-character
+  substring is packed into one int64 code, and the sorted row positions of
+  each code are stored back to back with an offsets array. A query only
+  verifies the rows that contain every trigram of the query;
+- queries too short for a trigram are matched against all keys at once,
+  stored back to back as one array of code points.
+"""
+import copy
+import hashlib
+
+import numpy as np
+
+GRAM = 3
+_CODE_BITS = 21  # enough for any Unicode code point
+# Between keys in the code point buffer; not a code point, so never matched.
+_KEY_SEPARATOR = np.uint32(0xFFFFFFFF)
+# Everything a TitleIndex derives from its titles (see arrays/from_arrays).
+ARRAYS = ('hashes', 'hash_rows', 'gram_codes', 'gram_offsets', 'gram_rows', 'gram_counts', 'key_chars', 'key_starts')
+
+
+def trigrams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def gram_code(gram):
+    code = 0
+    for char in gram:
+        code = (code << _CODE_BITS) | ord(char)
+    return code
+
+
+def edit_distance(a, b):
+    """
+    Levenshtein distance between two strings.
+    """
+    return EditDistance(a)(b)
+
+
+class EditDistance:
+    """
+    Levenshtein distance from a fixed string, bit-parallel (Myers/Hyyro).
+
+    Each column of the dynamic-programming table is kept as two bit
+    vectors in Python ints, so one comparison costs O(len(other)) integer
+    operations instead of O(len(pattern) * len(other)).
+    """
+
+    def __init__(self, pattern):
+        self.length = len(pattern)
+        self._peq = {}
+        for i, char in enumerate(pattern):
+            self._peq[char] = self._peq.get(char, 0) | (1 << i)
+        self._mask = (1 << self.length) - 1
+        self._last = 1 << (self.length - 1) if self.length else 0
+
+    def __call__(self, other):
+        if not self.length:
+            return len(other)
+        peq, mask, last = self._peq, self._mask, self._last
+        pv, mv, score = mask, 0, self.length
+        for char in other:
+            eq = peq.get(char, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | (~(xh | pv) & mask)
+            mh = pv & xh
+            if ph & last:
+                score += 1
+            elif mh & last:
+                score -= 1
+            ph = ((ph << 1) | 1) & mask
+            mh = (mh << 1) & mask
+            pv = mh | (~(xv | ph) & mask)
+            mv = ph & xv
+        return score
+
+
+def key_hash(key):
+    """
+    Stable 64-bit hash of a casefolded title (Python's hash() is salted
+    per process).
+    """
+    digest = hashlib.blake2b(key.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+class TitleIndex:
+    """
+    Exact and substring title lookups returning row positions.
+    """
+
+    def __init__(self, titles):
+        self._set_titles(titles)
+
+        hashes = np.fromiter((key_hash(key) for key in self.keys), dtype=np.int64, count=len(self.keys))
+        self._hash_rows = np.argsort(hashes, kind='stable').astype(np.int32)
+        self._hashes = hashes[self._hash_rows]
+
+        codes, rows, self._gram_counts = _postings(self.keys)
+        self._gram_codes, starts = np.unique(codes, return_index=True)
+        self._gram_offsets = np.append(starts, len(codes)).astype(np.int64)
+        self._gram_rows = rows
+        self._key_chars, self._key_starts = _key_buffer(self.keys)
+        self._removed = np.empty(0, dtype=np.int32)
+
+    def _set_titles(self, titles):
+        self.titles = [t if isinstance(t, str) else '' for t in titles]
+        self.keys = [t.casefold() for t in self.titles]
+
+    def arrays(self):
+        """
+        The index's arrays by name (see ARRAYS), e.g. to save in a snapshot.
+        """
+        return {name: getattr(self, '_' + name) for name in ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, titles, arrays):
+        """
+        Index over `titles` from the `arrays()` of an index over the same
+        titles, without hashing or tokenising them again. The arrays are
+        used as given, so memory-mapped ones stay mapped.
+        """
+        index = cls.__new__(cls)
+        index._set_titles(titles)
+        for name in ARRAYS:
+            setattr(index, '_' + name, arrays[name])
+        index._removed = np.empty(0, dtype=np.int32)
+        return index
+
+    def __len__(self):
+        return len(self.titles)
+
+    def extended(self, titles):
+        """
+        Copy of the index with `titles` appended as the next rows.
+
+        New hashes and postings are inserted into the sorted arrays, which
+        costs a copy of them but no pass over the existing titles.
+        """
+        index = copy.copy(self)
+        start = len(self.titles)
+        titles = [t if isinstance(t, str) else '' for t in titles]
+        keys = [t.casefold() for t in titles]
+        index.titles = list(self.titles) + titles
+        index.keys = list(self.keys) + keys
+
+        hashes = np.fromiter((key_hash(key) for key in keys), dtype=np.int64, count=len(keys))
+        by_hash = np.argsort(hashes, kind='stable')
+        at = np.searchsorted(self._hashes, hashes[by_hash], side='right')
+        index._hashes = np.insert(self._hashes, at, hashes[by_hash])
+        index._hash_rows = np.insert(self._hash_rows, at, (start + by_hash).astype(np.int32))
+
+        codes, rows, counts = _postings(keys, start)
+        index._gram_counts = np.concatenate([self._gram_counts, counts])
+        # New rows come last, so each posting goes at the end of its list
+        # (or where the list of a new trigram would start).
+        slot = np.searchsorted(self._gram_codes, codes)
+        known = np.zeros(len(codes), dtype=bool)
+        inside = slot < len(self._gram_codes)
+        known[inside] = self._gram_codes[slot[inside]] == codes[inside]
+        index._gram_rows = np.insert(self._gram_rows, self._gram_offsets[slot + known], rows)
+        index._gram_codes = np.union1d(self._gram_codes, codes)
+        sizes = np.zeros(len(index._gram_codes), dtype=np.int64)
+        sizes[np.searchsorted(index._gram_codes, self._gram_codes)] = np.diff(self._gram_offsets)
+        np.add.at(sizes, np.searchsorted(index._gram_codes, codes), 1)
+        index._gram_offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=index._gram_offsets[1:])
+
+        chars, starts = _key_buffer(keys)
+        index._key_chars = np.concatenate([self._key_chars, chars])
+        index._key_starts = np.concatenate([self._key_starts[:-1], starts + self._key_starts[-1]])
+        return index
+
+    def without(self, positions):
+        """
+        Copy of the index that leaves out the rows at `positions`.
+        """
+        index = copy.copy(self)
+        index._removed = np.union1d(self._removed, positions).astype(np.int32)
+        return index
+
+    def _live(self, rows):
+        if len(self._removed) == 0:
+            return rows
+        return rows[~np.isin(rows, self._removed)]
+
+    def lookup(self, title):
+        """
+        Positions of every row whose title equals `title`, ignoring case.
+        """
+        key = title.casefold()
+        h = key_hash(key)
+        hashes = self._hashes
+        lo = hi = int(np.searchsorted(hashes, h))
+        while hi < len(hashes) and hashes[hi] == h:
+            hi += 1
+        rows = self._live(self._hash_rows[lo:hi])
+        if len(rows) == 1 and self.keys[rows[0]] == key:
+            return rows
+        # Duplicate titles, or a 64-bit collision to weed out.
+        return np.array([pos for pos in rows if self.keys[pos] == key], dtype=np.int32)
+
+    def first(self, title):
+        """
+        Position of the row titled `title`, or None.
+
+        An exact-case match wins over rows that only match ignoring case.
+        """
+        rows = self.lookup(title)
+        if len(rows) == 0:
+            return None
+        for pos in rows:
+            if self.titles[pos] == title:
+                return int(pos)
+        return int(rows[0])
+
+    def lookup_many(self, titles):
+        """
+        Position of each title as chosen by `first`, -1 where there is none.
+
+        All hashes are looked up with one binary search; only titles whose
+        hash matches several rows (duplicates or collisions) go through
+        `first`.
+        """
+        titles = list(titles)
+        keys = [title.casefold() for title in titles]
+        hashes = np.fromiter((key_hash(key) for key in keys), dtype=np.int64, count=len(keys))
+        lo = np.searchsorted(self._hashes, hashes)
+        counts = np.searchsorted(self._hashes, hashes, side='right') - lo
+        positions = np.full(len(keys), -1, dtype=np.int64)
+
+        single = np.flatnonzero(counts == 1)
+        rows = self._hash_rows[lo[single]].astype(np.int64)
+        # A single match can still be a collision with a title not in the index.
+        found = np.fromiter((self.keys[row] == keys[i] for i, row in zip(single.tolist(), rows.tolist())),
+                            dtype=bool, count=len(single))
+        found &= ~np.isin(rows, self._removed)
+        positions[single[found]] = rows[found]
+        for i in np.flatnonzero(counts > 1).tolist():
+            pos = self.first(titles[i])
+            positions[i] = -1 if pos is None else pos
+        return positions
+
+    def postings(self, gram):
+        """
+        Ascending positions of the titles containing trigram `gram`, or None.
+        """
+        code = gram_code(gram)
+        i = np.searchsorted(self._gram_codes, code)
+        if i == len(self._gram_codes) or self._gram_codes[i] != code:
+            return None
+        return self._gram_rows[self._gram_offsets[i]:self._gram_offsets[i + 1]]
+
+    def search(self, partial):
+        """
+        Positions (ascending) of titles containing `partial`, ignoring case.
+        """
+        query = partial.casefold()
+        grams = trigrams(query)
+        if not grams:
+            # Shorter than a trigram: nothing to narrow down with.
+            return self._live(self._scan(query))
+
+        lists = sorted((self.postings(gram) for gram in grams), key=lambda rows: -1 if rows is None else len(rows))
+        if lists[0] is None:
+            return np.empty(0, dtype=np.int32)
+        candidates = lists[0]
+        for rows in lists[1:]:
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+            if len(candidates) == 0:
+                return candidates
+        candidates = self._live(candidates)
+        if len(query) == GRAM:
+            return candidates
+        keys = self.keys
+        return np.array([pos for pos in candidates if query in keys[pos]], dtype=np.int32)
+
+    def _scan(self, query):
+        """
+        Positions (ascending) of keys containing `query`, comparing it with
+        the key buffer at every offset.
+        """
+        if not query:
+            return np.arange(len(self.keys), dtype=np.int32)
+        chars = self._key_chars
+        codes = np.frombuffer(query.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        n = len(chars) - len(codes) + 1
+        if n <= 0:
+            return np.empty(0, dtype=np.int32)
+        hit = chars[:n] == codes[0]
+        for i in range(1, len(codes)):
+            hit &= chars[i:i + n] == codes[i]
+        rows = np.searchsorted(self._key_starts, np.flatnonzero(hit), side='right') - 1
+        return np.unique(rows).astype(np.int32)
+
+    def fuzzy(self, query, limit=10, shortlist=64, max_postings=50000):
+        """
+        Positions of the `limit` titles closest to `query`, best first,
+        tolerating typos.
+
+        Titles sharing trigrams with the query are counted from the posting
+        lists, rarest trigrams first until `max_postings` rows have been
+        read. The `shortlist` with the highest trigram overlap are then
+        ranked by edit distance, so the cost does not grow with the number
+        of titles.
+        """
+        query = query.casefold().strip()
+        grams = sorted((rows for rows in map(self.postings, trigrams(query)) if rows is not None), key=len)
+        if not grams:
+            return np.empty(0, dtype=np.int32)
+        lists, read = [], 0
+        for rows in grams:
+            if lists and read + len(rows) > max_postings:
+                break
+            lists.append(rows)
+            read += len(rows)
+
+        candidates, shared = np.unique(np.concatenate(lists), return_counts=True)
+        if len(self._removed):
+            live = ~np.isin(candidates, self._removed)
+            candidates, shared = candidates[live], shared[live]
+        overlap = shared / (len(trigrams(query)) + self._gram_counts[candidates] - shared)
+        if len(candidates) > shortlist:
+            best = np.argpartition(-overlap, shortlist - 1)[:shortlist]
+            candidates, overlap = candidates[best], overlap[best]
+
+        keys = self.keys
+        distance = EditDistance(query)
+        distances = np.array([distance(keys[pos]) for pos in candidates])
+        # Fewest edits first, then most shared trigrams, then row order.
+        order = np.lexsort((candidates, -overlap, distances))[:limit]
+        return candidates[order].astype(np.int32)
+
+
+def _key_buffer(keys):
+    """
+    (chars, starts) for `keys`: their code points back to back, each key
+    followed by _KEY_SEPARATOR, and the offset of every key plus the total.
+    """
+    starts = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(key) + 1 for key in keys], out=starts[1:])
+    text = ''.join(key + '\0' for key in keys)
+    chars = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32).copy()
+    chars[starts[1:] - 1] = _KEY_SEPARATOR
+    return chars, starts
+
+
+def _postings(keys, start=0):
+    """
+    (codes, rows, counts) for titles `keys` numbered from `start`: every
+    (trigram code, row) pair sorted by code then row, and the number of
+    distinct trigrams of each title.
+    """
+    codes, rows = [], []
+    for pos, key in enumerate(keys, start):
+        grams = trigrams(key)
+        codes.extend(gram_code(gram) for gram in grams)
+        rows.extend([pos] * len(grams))
+    codes = np.array(codes, dtype=np.int64)
+    rows = np.array(rows, dtype=np.int32)
+    counts = np.bincount(rows - start, minlength=len(keys)).astype(np.int32)
+    order = np.lexsort((rows, codes))
+    return codes[order], rows[order], counts
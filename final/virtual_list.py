@@ -0,0 +1,223 @@
+"""
+Virtualised, sortable result list for Tk.
+
+Only the rows that fit on screen exist as Treeview items. Scrolling rewrites
+the values of those few items from the result arrays instead of inserting
+one item per result, so showing 100 or 1,000,000 results costs the same.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+
+
+class ResultWindow:
+    """
+    Sort order, scroll offset and selection over column arrays.
+
+    Kept free of Tk so the bookkeeping can be reasoned about on its own.
+    Row indices handed out are indices into the arrays given to `set_data`,
+    whatever the current sort order.
+    """
+
+    def __init__(self):
+        self.set_data({})
+
+    def set_data(self, columns):
+        self.columns = {key: np.asarray(values) for key, values in columns.items()}
+        self.n_rows = len(next(iter(self.columns.values()))) if self.columns else 0
+        self.order = np.arange(self.n_rows)
+        self.sort_key = None
+        self.descending = False
+        self.top = 0
+        self.selected = None
+
+    def sort(self, key):
+        """
+        Sort by column `key`; sorting by the same key again reverses it.
+        """
+        if self.n_rows == 0:
+            return
+        if key == self.sort_key:
+            self.descending = not self.descending
+            self.order = self.order[::-1]
+        else:
+            self.sort_key = key
+            self.descending = False
+            self.order = np.argsort(self.columns[key], kind='stable')
+        self.top = 0
+
+    def scroll_to(self, top, visible):
+        self.top = int(max(0, min(top, self.n_rows - visible)))
+
+    def window(self, visible):
+        """
+        Row indices currently on screen, top to bottom.
+        """
+        return self.order[self.top:self.top + visible]
+
+    def move_selection(self, delta, visible):
+        """
+        Move the selection `delta` rows in display order and keep it on screen.
+        """
+        if self.n_rows == 0:
+            return
+        if self.selected is None:
+            slot = 0
+        else:
+            slot = int(np.flatnonzero(self.order == self.selected)[0]) + delta
+        slot = max(0, min(slot, self.n_rows - 1))
+        self.selected = int(self.order[slot])
+        if slot < self.top:
+            self.scroll_to(slot, visible)
+        elif slot >= self.top + visible:
+            self.scroll_to(slot - visible + 1, visible)
+
+
+class VirtualList(ttk.Frame):
+    """
+    Treeview-backed list showing a window of a large result set.
+
+    `columns` is a list of (key, heading, width) tuples naming the arrays
+    passed to `set_data`. Clicking a heading sorts by that column.
+    `on_select(row)` is called with the selected row index.
+    """
+
+    def __init__(self, parent, columns, on_select=None):
+        super().__init__(parent)
+        self.column_specs = columns
+        self.on_select = on_select
+        self.model = ResultWindow()
+        self._visible = 1
+        self._rendering = False
+
+        keys = [key for key, _, _ in columns]
+        self.tree = ttk.Treeview(self, columns=keys, show='headings', selectmode='browse', height=1)
+        for key, heading, width in columns:
+            self.tree.heading(key, text=heading, command=lambda k=key: self.sort(k))
+            self.tree.column(key, width=width, stretch=(key == keys[0]),
+                             anchor='w' if key == keys[0] else 'center')
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self._on_scrollbar)
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.scrollbar.grid(row=0, column=1, sticky='ns')
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        self.tree.bind('<MouseWheel>', lambda e: self._scroll_by(-3 if e.delta > 0 else 3))
+        self.tree.bind('<Button-4>', lambda e: self._scroll_by(-3))
+        self.tree.bind('<Button-5>', lambda e: self._scroll_by(3))
+        self.tree.bind('<Up>', lambda e: self._move(-1))
+        self.tree.bind('<Down>', lambda e: self._move(1))
+        self.tree.bind('<Prior>', lambda e: self._move(-self._visible))
+        self.tree.bind('<Next>', lambda e: self._move(self._visible))
+
+    def __len__(self):
+        return self.model.n_rows
+
+    def set_data(self, columns):
+        """
+        Show new results; `columns` maps column key to an array of values.
+        """
+        self.model.set_data(columns)
+        self._update_headings()
+        self._render()
+
+    def clear(self):
+        self.set_data({})
+
+    def selection(self):
+        """
+        Index of the selected row in the arrays given to `set_data`, or None.
+        """
+        return self.model.selected
+
+    def row(self, index):
+        return {key: values[index] for key, values in self.model.columns.items()}
+
+    def sort(self, key):
+        self.model.sort(key)
+        self._update_headings()
+        self._render()
+
+    def _update_headings(self):
+        for key, heading, _ in self.column_specs:
+            if key == self.model.sort_key:
+                heading += " ▼" if self.model.descending else " ▲"
+            self.tree.heading(key, text=heading)
+
+    def _on_resize(self, event):
+        row_height = int(ttk.Style(self).lookup('Treeview', 'rowheight') or 20)
+        # Leave room for the heading row.
+        visible = max(1, event.height // row_height - 1)
+        if visible != self._visible:
+            self._visible = visible
+            self.model.scroll_to(self.model.top, visible)
+            self._render()
+
+    def _render(self):
+        model = self.model
+        window = model.window(self._visible)
+        items = self.tree.get_children()
+
+        self._rendering = True
+        try:
+            if len(items) > len(window):
+                self.tree.delete(*items[len(window):])
+                items = items[:len(window)]
+            for _ in range(len(items), len(window)):
+                items += (self.tree.insert('', tk.END),)
+            selected_item = None
+            for item, index in zip(items, window):
+                self.tree.item(item, values=[model.columns[key][index] for key, _, _ in self.column_specs])
+                if index == model.selected:
+                    selected_item = item
+            if selected_item is None:
+                self.tree.selection_remove(self.tree.selection())
+            else:
+                self.tree.selection_set(selected_item)
+        finally:
+            self.after_idle(self._end_render)
+
+        if model.n_rows:
+            self.scrollbar.set(model.top / model.n_rows, (model.top + len(window)) / model.n_rows)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _end_render(self):
+        self._rendering = False
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.model.scroll_to(round(float(amount) * self.model.n_rows), self._visible)
+            self._render()
+        elif action == 'scroll':
+            step = self._visible if unit == 'pages' else 1
+            self._scroll_by(int(amount) * step)
+
+    def _scroll_by(self, rows):
+        self.model.scroll_to(self.model.top + rows, self._visible)
+        self._render()
+        return 'break'
+
+    def _move(self, delta):
+        self.model.move_selection(delta, self._visible)
+        self._render()
+        self._notify()
+        return 'break'
+
+    def _on_tree_select(self, event):
+        if self._rendering:
+            return
+        items = self.tree.get_children()
+        chosen = self.tree.selection()
+        if not chosen:
+            return
+        slot = items.index(chosen[0])
+        self.model.selected = int(self.model.window(self._visible)[slot])
+        self._notify()
+
+    def _notify(self):
+        if self.on_select is not None and self.model.selected is not None:
+            self.on_select(self.model.selected)
@@ -0,0 +1,66 @@
+"""
+Running profile vector of a watchlist, for "recommend for my watchlist".
+
+The profile is the sum of the watchlist's rows in X_rec. Adding or removing
+a title adds or subtracts that one row, touching only its non-zero entries,
+so the profile never has to be rebuilt from the whole list.
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class WatchlistProfile:
+    """
+    Sum and centroid of the X_rec rows at a set of row positions.
+    """
+
+    def __init__(self, X, positions=()):
+        self._X = X
+        self.total = np.zeros(X.shape[1])
+        self.positions = set()
+        for pos in positions:
+            self.add(pos)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _row(self, pos):
+        start, stop = self._X.indptr[pos], self._X.indptr[pos + 1]
+        return self._X.indices[start:stop], self._X.data[start:stop]
+
+    def add(self, pos):
+        """
+        Add row `pos`; False if it was already part of the profile.
+        """
+        pos = int(pos)
+        if pos in self.positions:
+            return False
+        columns, values = self._row(pos)
+        self.total[columns] += values
+        self.positions.add(pos)
+        return True
+
+    def remove(self, pos):
+        """
+        Remove row `pos`; False if it was not part of the profile.
+        """
+        pos = int(pos)
+        if pos not in self.positions:
+            return False
+        columns, values = self._row(pos)
+        self.total[columns] -= values
+        self.positions.discard(pos)
+        if not self.positions:
+            # Drop the rounding residue so an empty profile is exactly zero.
+            self.total[:] = 0
+        return True
+
+    def centroid(self):
+        """
+        Mean of the rows as a 1 x n_features CSR matrix, or None when empty.
+        """
+        if not self.positions:
+            return None
+        columns = np.flatnonzero(self.total)
+        values = self.total[columns] / len(self.positions)
+        return csr_matrix((values, columns, [0, len(columns)]), shape=(1, len(self.total)))
@@ -0,0 +1,174 @@
+"""
+SQLite-backed watchlist storage.
+
+Each user gets their own table keyed by show_id, so adding, removing and
+checking a title touch a single indexed row instead of rewriting the whole
+list. The database runs in WAL mode, letting several app instances read and
+write the same file without overwriting each other's changes.
+"""
+import getpass
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DB_PATH = 'watchlist.db'
+LEGACY_PATH = 'watchlist.json'
+
+
+def default_user():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return 'default'
+
+
+def table_name(user):
+    """
+    SQL table holding `user`'s watchlist.
+
+    Characters outside [A-Za-z0-9_] are replaced, with a short hash of the
+    original name appended so distinct users never share a table.
+    """
+    safe = re.sub(r'\W', '_', user, flags=re.ASCII)
+    if safe != user:
+        safe += '_' + hashlib.sha1(user.encode('utf-8')).hexdigest()[:8]
+    return f'watchlist_{safe}'
+
+
+class WatchlistStore:
+    """
+    One user's watchlist in a shared SQLite database.
+
+    Entries keep the order they were added in. On first use the table is
+    filled from `legacy_path` (the old JSON watchlist) if that file exists;
+    the file is then renamed with a `.migrated` suffix so it is imported once.
+    """
+
+    def __init__(self, path=DB_PATH, user=None, legacy_path=LEGACY_PATH):
+        self.path = path
+        self.user = user if user is not None else default_user()
+        self.table = table_name(self.user)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._transaction() as cur:
+            created = cur.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table,)).fetchone() is None
+            cur.execute(f'CREATE TABLE IF NOT EXISTS "{self.table}" ('
+                        'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                        'show_id TEXT NOT NULL UNIQUE, '
+                        'added_at REAL NOT NULL)')
+            if created and legacy_path and os.path.exists(legacy_path):
+                self._insert(cur, _read_legacy(legacy_path))
+                migrated = True
+            else:
+                migrated = False
+        if migrated:
+            os.replace(legacy_path, legacy_path + '.migrated')
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    def _insert(self, cur, show_ids):
+        now = time.time()
+        cur.executemany(f'INSERT OR IGNORE INTO "{self.table}" (show_id, added_at) VALUES (?, ?)',
+                        [(show_id, now) for show_id in show_ids])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f'SELECT COUNT(*) FROM "{self.table}"').fetchone()[0]
+
+    def __contains__(self, show_id):
+        with self._lock:
+            return self._conn.execute(
+                f'SELECT 1 FROM "{self.table}" WHERE show_id = ?', (show_id,)).fetchone() is not None
+
+    def show_ids(self):
+        """
+        Every entry, oldest first.
+        """
+        with self._lock:
+            return [row[0] for row in self._conn.execute(f'SELECT show_id FROM "{self.table}" ORDER BY id')]
+
+    def add(self, show_id):
+        """
+        Append `show_id`; returns False if it was already there.
+        """
+        with self._transaction() as cur:
+            cur.execute(f'INSERT OR IGNORE INTO "{self.table}" (show_id, added_at) VALUES (?, ?)',
+                        (show_id, time.time()))
+            return cur.rowcount == 1
+
+    def remove(self, show_id):
+        """
+        Delete `show_id`; returns False if it was not there.
+        """
+        with self._transaction() as cur:
+            cur.execute(f'DELETE FROM "{self.table}" WHERE show_id = ?', (show_id,))
+            return cur.rowcount == 1
+
+    def replace(self, show_ids):
+        """
+        Make `show_ids` the whole list, in that order, in one transaction.
+        """
+        with self._transaction() as cur:
+            cur.execute(f'DELETE FROM "{self.table}"')
+            self._insert(cur, [show_id for show_id in show_ids if isinstance(show_id, str)])
+
+    def rename(self, renames):
+        """
+        Swap entries for new keys, as {old: new}, in one transaction.
+
+        Each entry keeps its place in the list; one whose new key is already
+        there is dropped. Rows added meanwhile by other instances are left
+        alone.
+        """
+        with self._transaction() as cur:
+            for old, new in renames.items():
+                cur.execute(f'UPDATE OR IGNORE "{self.table}" SET show_id = ? WHERE show_id = ?', (new, old))
+                cur.execute(f'DELETE FROM "{self.table}" WHERE show_id = ?', (old,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    """
+    `with` block running its statements in one immediate transaction.
+    """
+
+    def __init__(self, conn, lock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            self._cursor = self._conn.cursor()
+            self._cursor.execute('BEGIN IMMEDIATE')
+        except BaseException:
+            self._lock.release()
+            raise
+        return self._cursor
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self._lock.release()
+        return False
+
+
+def _read_legacy(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return []
+    return [entry for entry in entries if isinstance(entry, str)] if isinstance(entries, list) else []